@@ -0,0 +1,586 @@
+"""
+In-process benchmark of every route registered in ``api/v1/urls.py``.
+
+Each route and method is requested through the test client against the
+current database, normally a synthetic catalog built by ``generate_catalog``.
+Write requests run in a transaction that is rolled back, so every repetition
+sees the same data. The results are plain dicts ready to be dumped as JSON
+and compared with a previous run.
+"""
+import asyncio
+import json
+import logging
+import platform
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.v1.renderers import FastJSONRenderer
+from api.v1.urls import async_urlpatterns, router
+from api.v1.values import get_values_fields
+from api.v1.views import AlbumSongViewSet, AlbumViewSet, ArtistViewSet
+from musical_catalog.jobs import enqueue
+from musical_catalog.models import Album, AlbumSong, Artist, Job, Song
+from musical_catalog.stats import build_snapshot
+from musical_catalog.synthetic import generate_catalog
+
+METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+
+@contextmanager
+def benchmark_environment(existing=False, cache=False, **catalog):
+    """
+    Sets up the test environment and, unless ``existing``, a throwaway test
+    database filled by generate_catalog(**catalog). The response cache is
+    replaced by a dummy cache unless ``cache`` is true.
+    """
+    setup_test_environment()
+    # Slow queries are expected under benchmark load, only the results matter.
+    timing_logger = logging.getLogger('api.timing')
+    level = timing_logger.level
+    timing_logger.setLevel(logging.ERROR)
+    databases = None
+    try:
+        if not existing:
+            databases = setup_databases(verbosity=0, interactive=False)
+            generate_catalog(**catalog)
+            # A job for the status route to read.
+            enqueue('repair_counters')
+        caches = settings.CACHES
+        if not cache:
+            caches = {**caches, settings.RESPONSE_CACHE_ALIAS: {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            }}
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        if databases is not None:
+            teardown_databases(databases, verbosity=0)
+        teardown_test_environment()
+        timing_logger.setLevel(level)
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of the sorted ``values``."""
+    return values[min(len(values) - 1, max(0, round(share * len(values)) - 1))]
+
+
+def median_pk(queryset):
+    count = queryset.count()
+    return queryset.order_by('pk').values_list('pk', flat=True)[count // 2] if count else None
+
+
+def get_samples(using):
+    """Deterministic rows the detail and write requests are made on."""
+    album_id = median_pk(Album.objects.using(using).filter(track_count__gt=1))
+    if album_id is None:
+        raise ValueError('The catalog needs an album with at least two tracks.')
+    album = Album.objects.using(using).get(pk=album_id)
+    tracklist = list(AlbumSong.objects.using(using).filter(album=album).order_by(
+        '_track_number'
+    ).values_list('pk', 'song_id'))
+    free_song_id = Song.objects.using(using).exclude(albumsong__album=album).order_by(
+        'pk'
+    ).values_list('pk', flat=True).first()
+    return {
+        'artist': album.artist_id,
+        'album': album.pk,
+        'song': tracklist[0][1],
+        'album_song': tracklist[0][0],
+        'song_ids': [song_id for _, song_id in tracklist],
+        'free_song': free_song_id,
+        'query': Song.objects.using(using).get(pk=tracklist[0][1]).title.split()[0],
+        'job': Job.objects.using(using).order_by('pk').values_list('pk', flat=True).first(),
+    }
+
+
+def editor_operations(name, songs):
+    """
+    The calls an editor makes to add an artist with an album of ``songs``
+    tracks, as batch operations: one per artist, album, song and album-song.
+    """
+    operations = [
+        {'method': 'POST', 'path': '/api/artists/', 'body': {'name': name}, 'ref': 'artist'},
+        {'method': 'POST', 'path': '/api/albums/', 'ref': 'album',
+         'body': {'title': name, 'artist': '$artist.id', 'release_year': 2000}},
+    ]
+    for number in range(songs):
+        operations += [
+            {'method': 'POST', 'path': '/api/songs/', 'body': {'title': f'{name} {number}'},
+             'ref': f'song{number}'},
+            {'method': 'POST', 'path': '/api/album-songs/',
+             'body': {'album': '$album.id', 'song': f'$song{number}.id'}},
+        ]
+    return operations
+
+
+def get_cases(samples, page_size):
+    """
+    Returns ``(name, method, url, data)`` for every route and method of the
+    router. ``data`` is the query string of GET requests and the JSON body of
+    the others. Routes the benchmark does not know yet get ``data=None`` and
+    are reported as skipped.
+    """
+    list_params = {'page_size': page_size} if page_size else {}
+    pks = {
+        'artists': samples['artist'],
+        'albums': samples['album'],
+        'songs': samples['song'],
+        'album-songs': samples['album_song'],
+        'jobs': samples['job'],
+    }
+    bodies = {
+        'artists': {'name': 'Benchmark Artist'},
+        'albums': {'title': 'Benchmark Album', 'artist': samples['artist'], 'release_year': 2000},
+        'songs': {'title': 'Benchmark Song'},
+        'album-songs': {'album': samples['album'], 'song': samples['free_song']},
+    }
+    data = {
+        ('api-root', 'get'): {},
+        ('search-list', 'get'): {'q': samples['query']},
+        ('export-list', 'get'): {},
+        ('albums-tracks', 'get'): {},
+        ('albums-tracks', 'post'): {'songs': [samples['free_song']]},
+        ('albums-tracks', 'put'): {'songs': samples['song_ids'][::-1]},
+        ('artists-discography', 'get'): {},
+        ('batch-list', 'post'): {'operations': editor_operations('Benchmark', 2)},
+        ('changes-list', 'get'): {},
+        ('songs-related', 'get'): {},
+        ('jobs-detail', 'get'): {} if samples['job'] else None,
+        ('stats-list', 'get'): {},
+        ('stats-albums-per-year', 'get'): {},
+        ('stats-tracks-per-album', 'get'): {},
+        ('stats-top-artists', 'get'): {},
+    }
+    for basename, body in bodies.items():
+        data.update({
+            (f'{basename}-list', 'get'): list_params,
+            (f'{basename}-list', 'post'): body,
+            (f'{basename}-detail', 'get'): {},
+            (f'{basename}-detail', 'put'): body,
+            (f'{basename}-detail', 'patch'): body,
+            (f'{basename}-detail', 'delete'): {},
+        })
+
+    cases, seen = [], set()
+    for pattern in [*router.urls, *async_urlpatterns]:
+        if pattern.name in seen:
+            # Format suffix variant of a route that is already listed.
+            continue
+        seen.add(pattern.name)
+        # The async read endpoints take the requests of their viewset twins.
+        viewset_name = pattern.name.removeprefix('async-')
+        basename = viewset_name.rsplit('-', 1)[0]
+        kwargs = {'pk': pks.get(basename)} if 'pk' in pattern.pattern.regex.groupindex else {}
+        url = reverse(f'api_v1:{pattern.name}', kwargs=kwargs)
+        actions = getattr(pattern.callback, 'actions', None) or {'get': None}
+        for method in METHODS:
+            if method in actions:
+                cases.append((pattern.name, method, url, data.get((viewset_name, method))))
+    return cases
+
+
+def measure(client, method, url, data, using):
+    """Makes one request and returns ``(status, seconds, queries)``."""
+    connection = connections[using]
+    request = getattr(client, method)
+    if method == 'get':
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = request(url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+    else:
+        with transaction.atomic(using=using):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = request(url, data, format='json')
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True, using=using)
+    return response.status_code, elapsed, len(queries)
+
+
+def run_benchmark(requests=50, warmup=5, page_size=100, using='default', progress=None):
+    """
+    Requests every case ``warmup`` times unmeasured and ``requests`` times
+    measured. Returns ``{'meta': ..., 'results': {'GET albums-list': ...}}``
+    with latencies in milliseconds and throughput in requests per second.
+    """
+    client = APIClient()
+    samples = get_samples(using)
+    results = {}
+    for name, method, url, data in get_cases(samples, page_size):
+        key = f'{method.upper()} {name}'
+        if data is None:
+            results[key] = {'url': url, 'skipped': True}
+            if progress is not None:
+                progress(key, results[key])
+            continue
+        for _ in range(warmup):
+            measure(client, method, url, data, using)
+        timings, statuses, query_counts = [], set(), set()
+        for _ in range(requests):
+            status_code, elapsed, queries = measure(client, method, url, data, using)
+            timings.append(elapsed)
+            statuses.add(status_code)
+            query_counts.add(queries)
+        timings.sort()
+        results[key] = {
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+            'throughput_rps': round(len(timings) / sum(timings), 1),
+            'queries': max(query_counts),
+        }
+        if progress is not None:
+            progress(key, results[key])
+    return {
+        'meta': {
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'database': connections[using].vendor,
+            'requests': requests,
+            'page_size': page_size,
+            'catalog': {
+                'artists': Artist.objects.using(using).count(),
+                'albums': Album.objects.using(using).count(),
+                'songs': Song.objects.using(using).count(),
+                'album_songs': AlbumSong.objects.using(using).count(),
+            },
+        },
+        'results': results,
+    }
+
+
+def find_regressions(baseline, current, tolerance=0.2):
+    """
+    Compares two runs and returns a message for every endpoint whose p95
+    latency grew by more than ``tolerance`` or which makes more queries.
+    """
+    regressions = []
+    for key, result in current['results'].items():
+        previous = baseline['results'].get(key)
+        if previous is None or previous.get('skipped') or result.get('skipped'):
+            continue
+        if result['queries'] > previous['queries']:
+            regressions.append(f'{key}: {previous["queries"]} -> {result["queries"]} queries')
+        if result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{key}: p95 {previous["p95_ms"]} -> {result["p95_ms"]} ms')
+    return regressions
+
+
+# Read endpoints served both by a viewset and by an async view.
+CONCURRENCY_CASES = ('artists-list', 'albums-detail', 'albums-tracks', 'songs-list', 'album-songs-list')
+
+
+def split(total, parts):
+    return [total // parts + (index < total % parts) for index in range(parts)]
+
+
+def summarize(timings, elapsed):
+    timings.sort()
+    return {
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'throughput_rps': round(len(timings) / elapsed, 1),
+    }
+
+
+def wsgi_throughput(url, params, concurrency, requests):
+    """``requests`` GETs through the WSGI handler from ``concurrency`` threads."""
+    def worker(count):
+        client, timings = Client(), []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                client.get(url, params)
+                timings.append(time.perf_counter() - started)
+        finally:
+            connections.close_all()
+        return timings
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        timings = [timing for chunk in executor.map(worker, split(requests, concurrency)) for timing in chunk]
+    return summarize(timings, time.perf_counter() - started)
+
+
+def asgi_throughput(url, params, concurrency, requests):
+    """``requests`` GETs through the ASGI handler from ``concurrency`` coroutines."""
+    async def worker(client, count, timings):
+        for _ in range(count):
+            started = time.perf_counter()
+            await client.get(url, params)
+            timings.append(time.perf_counter() - started)
+
+    async def run():
+        client, timings = AsyncClient(), []
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, count, timings) for count in split(requests, concurrency)))
+        elapsed = time.perf_counter() - started
+        # The connection of the thread that ran the ORM calls.
+        await sync_to_async(connections.close_all)()
+        return summarize(timings, elapsed)
+
+    return asyncio.run(run())
+
+
+def run_concurrency_benchmark(concurrency=20, requests=500, page_size=100, using='default', progress=None):
+    """
+    Compares the throughput of the read endpoints served by the viewsets
+    under WSGI and under ASGI with the throughput of their async twins.
+    """
+    samples = get_samples(using)
+    cases = {(name, method): (url, data) for name, method, url, data in get_cases(samples, page_size)}
+    results = {}
+    for name in CONCURRENCY_CASES:
+        url, params = cases[name, 'get']
+        async_url = cases[f'async-{name}', 'get'][0]
+        results[name] = {
+            'wsgi': wsgi_throughput(url, params, concurrency, requests),
+            'asgi': asgi_throughput(url, params, concurrency, requests),
+            'asgi_async': asgi_throughput(async_url, params, concurrency, requests),
+        }
+        if progress is not None:
+            progress(name, results[name])
+    return {
+        'meta': {
+            'django': django.get_version(),
+            'database': connections[using].vendor,
+            'concurrency': concurrency,
+            'requests': requests,
+            'page_size': page_size,
+        },
+        'results': results,
+    }
+
+
+SERIALIZATION_CASES = {
+    'artists': ArtistViewSet,
+    'albums': AlbumViewSet,
+    'album-songs': AlbumSongViewSet,
+}
+
+
+def cpu_per_row(build, rows, repeat):
+    """Lowest process CPU time of ``build()`` over ``repeat`` runs, in microseconds per row."""
+    best = None
+    for _ in range(repeat):
+        started = time.process_time()
+        build()
+        elapsed = time.process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / max(rows, 1) * 1_000_000, 3)
+
+
+def run_serialization_benchmark(limit=10000, repeat=5, using='default', progress=None):
+    """
+    Compares the CPU cost per row of building a list response body with the
+    viewset serializer and JSONRenderer against values() rows and
+    FastJSONRenderer, query included. Both paths read the same ``limit`` rows.
+    """
+    results = {}
+    for name, viewset in SERIALIZATION_CASES.items():
+        queryset = viewset.queryset.using(using).order_by('pk')[:limit]
+        serializer_class = viewset.serializer_class
+        fields = get_values_fields(serializer_class)
+        rows = queryset.count()
+
+        def serializer_body():
+            return JSONRenderer().render(serializer_class(list(queryset), many=True).data)
+
+        def values_body():
+            return FastJSONRenderer().render(list(queryset.values(*fields)))
+
+        if serializer_body() != values_body():
+            raise ValueError(f'The values() body of {name} differs from the serializer body.')
+        serializer_us = cpu_per_row(serializer_body, rows, repeat)
+        values_us = cpu_per_row(values_body, rows, repeat)
+        results[name] = {
+            'rows': rows,
+            'serializer_us_per_row': serializer_us,
+            'values_us_per_row': values_us,
+            'speedup': round(serializer_us / values_us, 1) if values_us else None,
+        }
+        if progress is not None:
+            progress(name, results[name])
+    return {
+        'meta': {
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'database': connections[using].vendor,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def run_batch_benchmark(songs=10, requests=20, progress=None):
+    """
+    Compares an editor adding an artist with an album of ``songs`` tracks
+    through sequential API calls with the same operations sent as one batch.
+    Every run writes a new artist, so runs never collide.
+    """
+    client = APIClient()
+    results = {}
+    for mode in ('sequential', 'batch'):
+        timings, query_counts = [], set()
+        for run in range(requests):
+            operations = editor_operations(f'Batch benchmark {mode} {run}', songs)
+            with CaptureQueriesContext(connections['default']) as queries:
+                started = time.perf_counter()
+                if mode == 'batch':
+                    response = client.post('/api/batch/', {'operations': operations}, format='json')
+                    if response.status_code != 200:
+                        raise ValueError(f'The batch failed: {response.data}')
+                else:
+                    run_sequentially(client, operations)
+                timings.append(time.perf_counter() - started)
+            query_counts.add(len(queries))
+        results[mode] = {
+            'requests': 1 if mode == 'batch' else len(operations),
+            'queries': max(query_counts),
+            **summarize(timings, sum(timings)),
+        }
+        if progress is not None:
+            progress(mode, results[mode])
+    results['speedup'] = round(results['sequential']['p50_ms'] / results['batch']['p50_ms'], 1)
+    return {
+        'meta': {
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+            'operations': len(operations),
+            'requests': requests,
+        },
+        'results': results,
+    }
+
+
+def run_sequentially(client, operations):
+    """Makes the calls of a batch one by one, resolving the references client-side."""
+    refs = {}
+    for operation in operations:
+        body = {
+            key: refs[value[1:].split('.')[0]]['id'] if str(value).startswith('$') else value
+            for key, value in operation['body'].items()
+        }
+        response = client.generic(
+            operation['method'], operation['path'], json.dumps(body), content_type='application/json'
+        )
+        if response.status_code >= 400:
+            raise ValueError(f'{operation["path"]} failed: {response.content}')
+        if 'ref' in operation:
+            refs[operation['ref']] = response.json()
+
+
+def fetch_all(client, url, page_size):
+    """Every row of a list endpoint, following its ``next`` links page by page."""
+    rows, requests = [], 0
+    url = f'{url}?page_size={page_size}'
+    while url:
+        page = client.get(url).json()
+        rows.extend(page['results'])
+        url = page['next']
+        requests += 1
+    return rows, requests
+
+
+def client_side_stats(client, page_size, limit):
+    """
+    The statistics of /api/stats/ computed the way a dashboard without it
+    does: reading the artists, albums and album-songs lists page by page.
+    Returns the statistics and the number of requests made.
+    """
+    artists, artist_requests = fetch_all(client, '/api/artists/', page_size)
+    albums, album_requests = fetch_all(client, '/api/albums/', page_size)
+    tracks, track_requests = fetch_all(client, '/api/album-songs/', page_size)
+    artist_of = {album['id']: album['artist'] for album in albums}
+    tracks_per_album = Counter({album['id']: 0 for album in albums})
+    tracks_per_album.update(track['album'] for track in tracks)
+    songs_per_artist = Counter({artist['id']: 0 for artist in artists})
+    songs_per_artist.update(artist_of[track['album']] for track in tracks)
+    top = sorted(songs_per_artist.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    stats = {
+        'albums_per_year': [
+            {'release_year': year, 'albums': albums}
+            for year, albums in sorted(Counter(album['release_year'] for album in albums).items())
+        ],
+        'tracks_per_album': [
+            {'tracks': tracks, 'albums': albums}
+            for tracks, albums in sorted(Counter(tracks_per_album.values()).items())
+        ],
+        'top_artists': [{'id': artist_id, 'song_count': songs} for artist_id, songs in top],
+    }
+    return stats, artist_requests + album_requests + track_requests
+
+
+def server_side_stats(client, limit):
+    stats = client.get('/api/stats/', {'limit': limit}).json()
+    stats['top_artists'] = [
+        {'id': artist['id'], 'song_count': artist['song_count']} for artist in stats['top_artists']
+    ]
+    del stats['computed_at']
+    return stats, 1
+
+
+def run_stats_benchmark(requests=5, page_size=1000, limit=10, progress=None):
+    """
+    Compares computing the dashboard statistics client-side, from every page
+    of the list endpoints, with one GET /api/stats/ computed live and read
+    from a snapshot. Checks that the three give the same statistics.
+    """
+    client = APIClient()
+    modes = {
+        'client': lambda: client_side_stats(client, page_size, limit),
+        'live': lambda: server_side_stats(client, limit),
+        'snapshot': lambda: server_side_stats(client, limit),
+    }
+    build_snapshot()
+    results, expected = {}, None
+    for mode, compute in modes.items():
+        timings, query_counts = [], set()
+        with override_settings(STATS_FROM_SNAPSHOT=mode == 'snapshot'):
+            for _ in range(requests):
+                with CaptureQueriesContext(connections['default']) as queries:
+                    started = time.perf_counter()
+                    stats, request_count = compute()
+                    timings.append(time.perf_counter() - started)
+                query_counts.add(len(queries))
+        if expected is None:
+            expected = stats
+        elif stats != expected:
+            raise ValueError(f'The {mode} statistics differ from the client-side ones.')
+        results[mode] = {
+            'requests': request_count,
+            'queries': max(query_counts),
+            **summarize(timings, sum(timings)),
+        }
+        if progress is not None:
+            progress(mode, results[mode])
+    results['speedup'] = round(results['client']['p50_ms'] / results['live']['p50_ms'], 1)
+    return {
+        'meta': {
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+            'album_songs': AlbumSong.objects.count(),
+            'page_size': page_size,
+            'requests': requests,
+        },
+        'results': results,
+    }
@@ -0,0 +1,73 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import (benchmark_environment, find_regressions,
+                           run_benchmark)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks every API route in-process and reports p50/p95/p99 latency, '
+        'throughput and SQL query count per endpoint. By default a throwaway test '
+        'database is filled with a deterministic synthetic catalog; use --existing '
+        'to benchmark the configured database as it is.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--artists', type=int, default=200)
+        parser.add_argument('--albums-per-artist', type=int, default=10)
+        parser.add_argument('--tracks-per-album', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--existing', action='store_true',
+                            help='Use the configured database instead of a generated catalog.')
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=100,
+                            help='page_size of list requests, 0 for unpaginated lists.')
+        parser.add_argument('--cache', action='store_true',
+                            help='Keep the response cache enabled (measures cache hits).')
+        parser.add_argument('--output', '-o', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='JSON results of a previous run.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 growth before --compare reports a regression.')
+
+    def handle(self, *args, **options):
+        try:
+            with benchmark_environment(
+                existing=options['existing'],
+                cache=options['cache'],
+                artists=options['artists'],
+                albums_per_artist=options['albums_per_artist'],
+                tracks_per_album=options['tracks_per_album'],
+                seed=options['seed'],
+            ):
+                results = run_benchmark(
+                    requests=options['requests'],
+                    warmup=options['warmup'],
+                    page_size=options['page_size'],
+                    progress=self.report,
+                )
+        except ValueError as error:
+            raise CommandError(error)
+
+        results['meta']['cache'] = options['cache']
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+        if options['compare']:
+            with open(options['compare']) as file:
+                regressions = find_regressions(json.load(file), results, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    def report(self, key, result):
+        if result.get('skipped'):
+            self.stdout.write(self.style.WARNING(f'{key:<28} skipped, no request defined'))
+            return
+        self.stdout.write(
+            f'{key:<28} p50 {result["p50_ms"]:8.2f} ms  p95 {result["p95_ms"]:8.2f} ms  '
+            f'p99 {result["p99_ms"]:8.2f} ms  {result["throughput_rps"]:8.1f} req/s  '
+            f'{result["queries"]:3} queries  {result["status"]}'
+        )
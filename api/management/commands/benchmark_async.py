@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import benchmark_environment, run_concurrency_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares concurrent-request throughput of the read endpoints: viewsets '
+        'under WSGI (one thread per concurrent client), viewsets under ASGI and '
+        'the async views under /api/async/ under ASGI. Uses the same synthetic '
+        'catalog and options as benchmark_api.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--artists', type=int, default=200)
+        parser.add_argument('--albums-per-artist', type=int, default=10)
+        parser.add_argument('--tracks-per-album', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--existing', action='store_true',
+                            help='Use the configured database instead of a generated catalog.')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Requests per endpoint and mode.')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--output', '-o', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            with benchmark_environment(
+                existing=options['existing'],
+                artists=options['artists'],
+                albums_per_artist=options['albums_per_artist'],
+                tracks_per_album=options['tracks_per_album'],
+                seed=options['seed'],
+            ):
+                results = run_concurrency_benchmark(
+                    concurrency=options['concurrency'],
+                    requests=options['requests'],
+                    page_size=options['page_size'],
+                    progress=self.report,
+                )
+        except ValueError as error:
+            raise CommandError(error)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+
+    def report(self, name, modes):
+        for mode, result in modes.items():
+            self.stdout.write(
+                f'{name:<18} {mode:<11} {result["throughput_rps"]:8.1f} req/s  '
+                f'p50 {result["p50_ms"]:8.2f} ms  p95 {result["p95_ms"]:8.2f} ms'
+            )
@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import benchmark_environment, run_batch_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares adding an artist with an album of --songs tracks through '
+        'sequential calls (artist, album, then one song and one album-song per '
+        'track) with the same operations sent to /api/batch/ in one request. '
+        'Runs against a throwaway test database unless --existing is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--songs', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=20, help='Runs per mode.')
+        parser.add_argument('--existing', action='store_true',
+                            help='Use the configured database; the benchmark writes to it.')
+        parser.add_argument('--output', '-o', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            with benchmark_environment(existing=options['existing'], artists=0):
+                results = run_batch_benchmark(
+                    songs=options['songs'],
+                    requests=options['requests'],
+                    progress=self.report,
+                )
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(f'Batch is {results["results"]["speedup"]}x faster than sequential calls.')
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+
+    def report(self, mode, result):
+        self.stdout.write(
+            f'{mode:<11} {result["requests"]:3} requests  {result["queries"]:4} queries  '
+            f'p50 {result["p50_ms"]:8.2f} ms  p95 {result["p95_ms"]:8.2f} ms'
+        )
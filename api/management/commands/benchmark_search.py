@@ -0,0 +1,69 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.v1.search import has_trigram_search, search
+from musical_catalog.models import Album, Artist, Song
+
+FIELDS = (
+    (Artist, 'name'),
+    (Album, 'title'),
+    (Song, 'title'),
+)
+
+
+def misspell(rng, word):
+    """Swaps two neighbouring letters, the most common typing mistake."""
+    if len(word) < 4:
+        return word
+    index = rng.randrange(1, len(word) - 2)
+    return word[:index] + word[index + 1] + word[index] + word[index + 2:]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the latency of the search used by /api/search/ against the '
+        'current database. Fill it first with `manage.py generate_catalog`. '
+        'Queries are words taken from existing titles, half of them misspelt.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--explain', action='store_true',
+                            help='Print the query plan of the first query per model.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        rng = random.Random(options['seed'])
+        titles = list(Song.objects.using(using).order_by('pk').values_list('title', flat=True)[:1000])
+        if not titles:
+            self.stderr.write('The catalog is empty, run `manage.py generate_catalog` first.')
+            return
+        words = [word for title in titles for word in title.split()]
+        queries = []
+        for number in range(options['queries']):
+            word = rng.choice(words)
+            queries.append(misspell(rng, word) if number % 2 else word)
+
+        backend = 'pg_trgm' if has_trigram_search(using) else 'icontains fallback'
+        self.stdout.write(f'{connections[using].vendor}, {backend}, {len(queries)} queries')
+        for model, field in FIELDS:
+            queryset = model.objects.using(using).all()
+            if options['explain']:
+                self.stdout.write(search(queryset, field, queries[0], options['limit']).explain())
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                list(search(queryset, field, query, options['limit']))
+                timings.append((time.perf_counter() - started) * 1000)
+            percentiles = statistics.quantiles(timings, n=100)
+            self.stdout.write(
+                f'{model.__name__:<8} p50 {percentiles[49]:7.2f} ms  '
+                f'p95 {percentiles[94]:7.2f} ms  p99 {percentiles[98]:7.2f} ms'
+            )
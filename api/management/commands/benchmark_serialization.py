@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import benchmark_environment, run_serialization_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the CPU time per row of the artist, album and album-song list '
+        'bodies built by the serializers and JSONRenderer against the values() '
+        'fast path and FastJSONRenderer. Uses the same synthetic catalog and '
+        'options as benchmark_api.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--artists', type=int, default=200)
+        parser.add_argument('--albums-per-artist', type=int, default=10)
+        parser.add_argument('--tracks-per-album', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--existing', action='store_true',
+                            help='Use the configured database instead of a generated catalog.')
+        parser.add_argument('--limit', type=int, default=10000, help='Rows per list body.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per path, the fastest one is reported.')
+        parser.add_argument('--output', '-o', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            with benchmark_environment(
+                existing=options['existing'],
+                artists=options['artists'],
+                albums_per_artist=options['albums_per_artist'],
+                tracks_per_album=options['tracks_per_album'],
+                seed=options['seed'],
+            ):
+                results = run_serialization_benchmark(
+                    limit=options['limit'],
+                    repeat=options['repeat'],
+                    progress=self.report,
+                )
+        except ValueError as error:
+            raise CommandError(error)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<12} {result["rows"]:7} rows  serializer {result["serializer_us_per_row"]:8.2f} us/row  '
+            f'values {result["values_us_per_row"]:8.2f} us/row  x{result["speedup"]}'
+        )
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import benchmark_environment, run_stats_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares computing the dashboard statistics client-side, by paging '
+        'through /api/artists/, /api/albums/ and /api/album-songs/, with one '
+        'request to /api/stats/, computed live and read from a snapshot. Runs '
+        'against a throwaway test database with a synthetic catalog of about '
+        '1M tracks unless --existing is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--artists', type=int, default=8000)
+        parser.add_argument('--albums-per-artist', type=int, default=10)
+        parser.add_argument('--tracks-per-album', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--existing', action='store_true',
+                            help='Use the configured database instead of a synthetic catalog.')
+        parser.add_argument('--requests', type=int, default=5, help='Runs per mode.')
+        parser.add_argument('--page-size', type=int, default=1000)
+        parser.add_argument('--output', '-o', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        catalog = {
+            'artists': options['artists'],
+            'albums_per_artist': options['albums_per_artist'],
+            'tracks_per_album': options['tracks_per_album'],
+            'seed': options['seed'],
+        }
+        try:
+            with benchmark_environment(existing=options['existing'], **catalog):
+                results = run_stats_benchmark(
+                    requests=options['requests'],
+                    page_size=options['page_size'],
+                    progress=self.report,
+                )
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(
+            f'/api/stats/ is {results["results"]["speedup"]}x faster than client-side aggregation '
+            f'over {results["meta"]["album_songs"]} tracks.'
+        )
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+
+    def report(self, mode, result):
+        self.stdout.write(
+            f'{mode:<8} {result["requests"]:6} requests  {result["queries"]:6} queries  '
+            f'p50 {result["p50_ms"]:10.2f} ms  p95 {result["p95_ms"]:10.2f} ms'
+        )
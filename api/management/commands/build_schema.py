@@ -0,0 +1,30 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates the OpenAPI schema of the API into OPENAPI_SCHEMA_PATH, the '
+        'file served by /swagger.json, /swagger/ and /redoc/.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Fail if the file differs from the schema of the code instead of writing it.',
+        )
+
+    def handle(self, *args, **options):
+        from tune_treasure_drf.docs import generate_schema
+
+        path = Path(settings.OPENAPI_SCHEMA_PATH)
+        content = generate_schema()
+        if options['check']:
+            if not path.exists() or path.read_bytes() != content:
+                raise CommandError(f'{path} is out of date, run build_schema to update it.')
+            self.stdout.write(f'{path} is up to date.')
+            return
+        path.write_bytes(content)
+        self.stdout.write(f'Wrote {path}.')
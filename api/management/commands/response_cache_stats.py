@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.v1.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Shows the hit/miss counters of the API response cache. The counters live in '
+        'the cache itself, so they are shared between workers with a shared backend '
+        'such as Redis.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters afterwards.')
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        served = stats['hits'] + stats['not_modified']
+        total = served + stats['misses']
+        for event, value in stats.items():
+            self.stdout.write(f'{event}: {value}')
+        self.stdout.write(f'hit ratio: {served / total:.1%}' if total else 'hit ratio: n/a')
+        if options['reset']:
+            reset_stats()
@@ -0,0 +1,173 @@
+"""
+Per-request timing of the API.
+
+Every response gets a ``Server-Timing`` header splitting its time between the
+database, the view code (mostly serialization) and rendering, and one log line
+on the ``api.timing`` logger. Queries slower than ``SLOW_QUERY_MS`` are logged
+with the view that made them. Queries are timed by an execute wrapper that
+every database connection gets when it opens, so no query is stored and DEBUG
+does not need to be on. The timing of the current request is kept in a
+context variable, which also reaches the threads running the async ORM.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('api.timing')
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Time spent by one request, in seconds."""
+
+    def __init__(self, request, slow_query):
+        self.request = request
+        self.slow_query = slow_query
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self.total = 0.0
+
+    @property
+    def view(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return get_view_name(match.func, self.request.method) if match else None
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db += elapsed
+            if elapsed >= self.slow_query:
+                view = self.view
+                logger.warning(
+                    'slow query view=%s duration_ms=%.1f sql=%s',
+                    view, elapsed * 1000, sql,
+                    extra={'view': view, 'duration_ms': elapsed * 1000, 'sql': sql},
+                )
+
+    @property
+    def serialize(self):
+        return max(self.total - self.db - self.render, 0.0)
+
+    def as_dict(self):
+        return {
+            'view': self.view,
+            'queries': self.queries,
+            'db_ms': round(self.db * 1000, 2),
+            'serialize_ms': round(self.serialize * 1000, 2),
+            'render_ms': round(self.render * 1000, 2),
+            'total_ms': round(self.total * 1000, 2),
+        }
+
+    def header(self):
+        return ', '.join([
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize * 1000:.2f}',
+            f'render;dur={self.render * 1000:.2f}',
+            f'total;dur={self.total * 1000:.2f}',
+        ])
+
+
+def record_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing.execute(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def render_response(response):
+    """Renders a deferred response, counting the time as render time of the request."""
+    timing = _current.get()
+    started = time.perf_counter()
+    response.render()
+    if timing is not None:
+        timing.render += time.perf_counter() - started
+    return response
+
+
+def get_view_name(view_func, method):
+    """``AlbumSongViewSet.list`` for viewsets, ``View.get`` for class-based views."""
+    cls = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if cls is None:
+        return getattr(view_func, '__qualname__', repr(view_func))
+    actions = getattr(view_func, 'actions', None)
+    action = actions.get(method.lower()) if actions else method.lower()
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+class RequestTimingMiddleware:
+    """
+    Measures the queries, database time, view time and render time of each
+    request. Keep it first in MIDDLEWARE so that the total covers everything.
+    Works in both sync and async chains, so async views stay async under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.measure(request) as timing:
+            response = self.get_response(request)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        with self.measure(request) as timing:
+            response = await self.get_response(request)
+        return self.finish(request, response, timing)
+
+    @contextmanager
+    def measure(self, request):
+        timing = RequestTiming(request, settings.SLOW_QUERY_MS / 1000)
+        request.timing = timing
+        token = _current.set(timing)
+        started = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            _current.reset(token)
+            timing.total = time.perf_counter() - started
+
+    def finish(self, request, response, timing):
+        response['Server-Timing'] = timing.header()
+        data = timing.as_dict()
+        logger.info(
+            'request method=%s path=%s status=%s %s',
+            request.method, request.path, response.status_code,
+            ' '.join(f'{key}={value}' for key, value in data.items()),
+            extra={'method': request.method, 'path': request.path,
+                   'status': response.status_code, **data},
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # Django renders the response right after this hook returns.
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.timing.render += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
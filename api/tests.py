@@ -1,8 +1,80 @@
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
+
+from api.benchmark import (editor_operations, find_regressions,
+                           run_batch_benchmark, run_benchmark,
+                           run_serialization_benchmark, run_stats_benchmark)
+from api.v1.cache import get_cache, get_stats
+from api.v1.pagination import KeysetPagination
+from api.v1.search import has_trigram_search
+from api.v1.serializers import ArtistSerializer, SongSerializer
+from api.v1.values import get_values_fields
+from api.v1.views import AlbumSongViewSet, AlbumViewSet, ArtistViewSet
+from musical_catalog.admin import EstimatedCountPaginator
+from musical_catalog.changes import from_cursor
+from musical_catalog.counters import find_counter_drift
+from musical_catalog.importer import import_catalog
+from musical_catalog.jobs import (HANDLERS, claim_job, enqueue,
+                                  requeue_stale_jobs, run_job, work)
+from musical_catalog.models import (Album, AlbumSong, Artist, Job, Song,
+                                    SongRelation, StatsSnapshot, allocate_track_numbers,
+                                    append_tracks, replace_tracks)
+from musical_catalog.relations import build_song_relations
+from musical_catalog.stats import build_snapshot
+from musical_catalog.synthetic import generate_catalog
+from tune_treasure_drf.db_router import (PrimaryReplicaRouter, pin_primary,
+                                         use_replicas)
+from tune_treasure_drf.docs import generate_schema, get_schema
+
+# Throughput of the concurrency tests, shown with a logging config that
+# lets api.tests through at INFO.
+logger = logging.getLogger(__name__)
+
 
-from musical_catalog.models import Album, AlbumSong, Artist, Song
+class QueryScalingMixin:
+    """
+    Assertions that catch N+1 queries in endpoint tests.
+    """
+
+    def assertQueriesDoNotScale(self, url, grow, sizes=(1, 5, 20)):
+        """
+        Calls ``grow(n)`` to add ``n`` rows to the result of ``url`` before each
+        request and fails if the number of queries changes with the result size.
+        """
+        counts = {}
+        total = 0
+        for size in sizes:
+            grow(size - total)
+            total = size
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts[size] = len(queries)
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f'Query count of {url} grows with result size: {counts}',
+        )
 
 
 class ArtistTests(APITestCase):
@@ -204,3 +276,2357 @@ class AlbumSongTests(APITestCase):
         response = self.client.delete(detail_url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(AlbumSong.objects.count(), 0)
+
+
+class KeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.artists = [Artist.objects.create(name=f'Artist {i}') for i in range(5)]
+        self.url = reverse('api_v1:artists-list')
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pagination_is_opt_in(self):
+        """
+        Ensure clients that do not ask for a page still receive a plain list.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+    def test_walk_all_pages(self):
+        """
+        Ensure following the next links returns every row exactly once, in id order.
+        """
+        ids = self.walk(f'{self.url}?page_size=2')
+        self.assertEqual(ids, [artist.id for artist in self.artists])
+
+    def test_page_size_is_capped(self):
+        """
+        Ensure the requested page size cannot exceed the paginator's cap.
+        """
+        with mock.patch.object(KeysetPagination, 'max_page_size', 3):
+            response = self.client.get(f'{self.url}?page_size=100')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_rows_inserted_during_walk(self):
+        """
+        Ensure rows created while a client is paging neither shift nor repeat pages.
+        """
+        first_page = self.client.get(f'{self.url}?page_size=2').data
+        new_artist = Artist.objects.create(name='Late Artist')
+        ids = [item['id'] for item in first_page['results']]
+        ids.extend(self.walk(first_page['next']))
+        self.assertEqual(ids, [artist.id for artist in self.artists] + [new_artist.id])
+
+    def test_invalid_cursor(self):
+        """
+        Ensure a malformed cursor is rejected.
+        """
+        response = self.client.get(f'{self.url}?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_invalid_values(self):
+        """
+        Ensure a well-formed cursor holding values of the wrong type is rejected.
+        """
+        album_songs_url = reverse('api_v1:album-songs-list')
+        cases = (
+            (self.url, ['x']),
+            (self.url, [None]),
+            (self.url, [2 ** 80]),
+            (album_songs_url, ['x', {}]),
+            (album_songs_url, [1, [2]]),
+        )
+        for url, position in cases:
+            cursor = KeysetPagination().encode_cursor(position)
+            with self.subTest(url=url, position=position):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+    def test_album_songs_follow_tracklist_order(self):
+        """
+        Ensure album-songs are paged by (album, track number).
+        """
+        albums = [
+            Album.objects.create(title=f'Album {i}', artist=self.artists[0], release_year=2020)
+            for i in range(2)
+        ]
+        songs = [Song.objects.create(title=f'Song {i}') for i in range(3)]
+        for song in songs:
+            AlbumSong.objects.create(album=albums[1], song=song)
+        for song in songs:
+            AlbumSong.objects.create(album=albums[0], song=song)
+
+        url = f"{reverse('api_v1:album-songs-list')}?page_size=2"
+        rows = []
+        while url:
+            response = self.client.get(url)
+            rows.extend((item['album'], item['_track_number']) for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(rows, [(album.id, number) for album in albums for number in (1, 2, 3)])
+
+
+class TrackRenumberingTests(APITestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='Test Artist')
+        self.url = reverse('api_v1:album-songs-list')
+
+    def create_album(self, title, size):
+        album = Album.objects.create(title=title, artist=self.artist, release_year=2019)
+        songs = Song.objects.bulk_create(Song(title=f'{title} {i}') for i in range(size))
+        numbers = allocate_track_numbers(album.id, size)
+        AlbumSong.objects.bulk_create(
+            AlbumSong(album=album, song=song, _track_number=number)
+            for number, song in zip(numbers, songs)
+        )
+        return album
+
+    def tracklist(self, album):
+        return list(
+            AlbumSong.objects.filter(album=album)
+            .order_by('_track_number')
+            .values_list('song__title', '_track_number')
+        )
+
+    def test_delete_track_closes_gap(self):
+        """
+        Ensure deleting a track shifts the following tracks up by one.
+        """
+        album = self.create_album('Album', 5)
+        track = AlbumSong.objects.get(album=album, _track_number=2)
+        response = self.client.delete(f'{self.url}{track.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.tracklist(album),
+            [('Album 0', 1), ('Album 2', 2), ('Album 3', 3), ('Album 4', 4)],
+        )
+
+    def test_bulk_delete_closes_every_gap(self):
+        """
+        Ensure deleting several tracks of an album in one call keeps the numbering contiguous.
+        """
+        album = self.create_album('Album', 7)
+        AlbumSong.objects.filter(album=album, _track_number__in=(2, 3, 6)).delete()
+        self.assertEqual(
+            self.tracklist(album),
+            [('Album 0', 1), ('Album 3', 2), ('Album 4', 3), ('Album 6', 4)],
+        )
+
+    def test_song_delete_renumbers_every_album(self):
+        """
+        Ensure deleting a song renumbers each album it appeared on.
+        """
+        first = self.create_album('First', 3)
+        second = self.create_album('Second', 3)
+        song = Song.objects.get(title='First 0')
+        AlbumSong.objects.create(album=second, song=song)
+        song.delete()
+        self.assertEqual(self.tracklist(first), [('First 1', 1), ('First 2', 2)])
+        self.assertEqual(
+            self.tracklist(second),
+            [('Second 0', 1), ('Second 1', 2), ('Second 2', 3)],
+        )
+
+    def test_move_track_to_another_album(self):
+        """
+        Ensure a track moved to another album is numbered there and leaves no gap behind.
+        """
+        source = self.create_album('Source', 3)
+        target = self.create_album('Target', 0)
+        track = AlbumSong.objects.get(album=source, _track_number=2)
+        response = self.client.patch(f'{self.url}{track.id}/', {'album': target.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['_track_number'], 1)
+        self.assertEqual(self.tracklist(source), [('Source 0', 1), ('Source 2', 2)])
+        self.assertEqual(self.tracklist(target), [('Source 1', 1)])
+
+        for title in ('Later 0', 'Later 1'):
+            response = self.client.post(
+                self.url, {'album': target.id, 'song': Song.objects.create(title=title).id}, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.tracklist(target), [('Source 1', 1), ('Later 0', 2), ('Later 1', 3)])
+        source.refresh_from_db()
+        target.refresh_from_db()
+        self.assertEqual((source.track_count, target.track_count), (2, 3))
+
+    def test_cascade_delete_skips_renumbering(self):
+        """
+        Ensure deleting an album or an artist does not renumber the tracks being deleted.
+        """
+        for origin in ('album', 'artist'):
+            album = self.create_album(f'Cascade {origin}', 50)
+            target = album if origin == 'album' else self.artist
+            with CaptureQueriesContext(connection) as queries:
+                target.delete()
+            # Only the counters of the artist and the song relations are updated.
+            tables = (Artist._meta.db_table, SongRelation._meta.db_table)
+            updates = [
+                q['sql'] for q in queries
+                if q['sql'].startswith('UPDATE') and q['sql'].split()[1].strip('"') not in tables
+            ]
+            self.assertEqual(updates, [])
+            self.assertFalse(AlbumSong.objects.filter(album_id=album.id).exists())
+
+    def test_delete_query_count_does_not_grow_with_album_size(self):
+        """
+        Benchmark the number of queries needed to delete the first track of
+        albums of increasing size: renumbering must cost the same for all of them.
+        """
+        query_counts = {}
+        for size in (10, 100, 300):
+            album = self.create_album(f'Album of {size}', size)
+            track = AlbumSong.objects.get(album=album, _track_number=1)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.delete(f'{self.url}{track.id}/')
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            self.assertEqual(
+                list(AlbumSong.objects.filter(album=album).order_by('_track_number')
+                     .values_list('_track_number', flat=True)),
+                list(range(1, size)),
+            )
+            query_counts[size] = len(queries)
+        self.assertEqual(len(set(query_counts.values())), 1, query_counts)
+
+
+class TrackAllocationTests(APITestCase):
+
+    def setUp(self):
+        artist = Artist.objects.create(name='Test Artist')
+        self.album = Album.objects.create(title='Sample Album', artist=artist, release_year=2019)
+
+    def test_allocate_contiguous_ranges(self):
+        """
+        Ensure consecutive allocations hand out adjacent ranges and bump the album counter.
+        """
+        self.assertEqual(allocate_track_numbers(self.album.id, 3), range(1, 4))
+        self.assertEqual(allocate_track_numbers(self.album.id), range(4, 5))
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.track_count, 4)
+
+    def test_numbering_continues_after_delete(self):
+        """
+        Ensure a track added after a deletion takes the number right after the last track.
+        """
+        tracks = [
+            AlbumSong.objects.create(album=self.album, song=Song.objects.create(title=f'Song {i}'))
+            for i in range(3)
+        ]
+        tracks[0].delete()
+        track = AlbumSong.objects.create(album=self.album, song=Song.objects.create(title='Song 3'))
+        self.assertEqual(track._track_number, 3)
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.track_count, 3)
+
+    def test_create_costs_one_query_per_track(self):
+        """
+        Ensure a track is numbered and inserted without reading the current tracklist.
+        """
+        song = Song.objects.create(title='Song')
+        with CaptureQueriesContext(connection) as queries:
+            AlbumSong.objects.create(album=self.album, song=song)
+        statements = [q['sql'].split()[0] for q in queries]
+        self.assertNotIn('SELECT', statements)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Concurrent writers need a server-backed database.')
+class ConcurrentTrackAllocationTests(TransactionTestCase):
+    """
+    Stress tests hammering a single album from several threads at once.
+    """
+    threads = 8
+    tracks_per_thread = 25
+
+    def setUp(self):
+        artist = Artist.objects.create(name='Test Artist')
+        self.album = Album.objects.create(title='Sample Album', artist=artist, release_year=2019)
+        self.songs = Song.objects.bulk_create(
+            Song(title=f'Song {i}') for i in range(self.threads * self.tracks_per_thread)
+        )
+
+    def run_concurrently(self, worker):
+        errors = []
+        barrier = threading.Barrier(self.threads)
+
+        def target(chunk):
+            try:
+                barrier.wait()
+                worker(chunk)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        size = self.tracks_per_thread
+        threads = [
+            threading.Thread(target=target, args=(self.songs[i * size:(i + 1) * size],))
+            for i in range(self.threads)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        self.assertEqual(errors, [])
+        numbers = sorted(
+            AlbumSong.objects.filter(album=self.album).values_list('_track_number', flat=True)
+        )
+        self.assertEqual(numbers, list(range(1, len(self.songs) + 1)))
+        return elapsed
+
+    def test_concurrent_inserts_do_not_collide(self):
+        """
+        Ensure concurrent single-track inserts never collide on the track number.
+        """
+        def worker(songs):
+            for song in songs:
+                AlbumSong.objects.create(album_id=self.album.id, song=song)
+
+        elapsed = self.run_concurrently(worker)
+        logger.info('%s concurrent inserts by %s threads: %.0f inserts/s',
+                    len(self.songs), self.threads, len(self.songs) / elapsed)
+
+    def test_concurrent_range_allocations_are_contiguous(self):
+        """
+        Ensure each multi-track insert gets a contiguous block of numbers.
+        """
+        blocks = []
+
+        def worker(songs):
+            for start in range(0, len(songs), 5):
+                with transaction.atomic():
+                    numbers = allocate_track_numbers(self.album.id, 5)
+                    AlbumSong.objects.bulk_create(
+                        AlbumSong(album_id=self.album.id, song=song, _track_number=number)
+                        for number, song in zip(numbers, songs[start:start + 5])
+                    )
+                blocks.append(numbers)
+
+        elapsed = self.run_concurrently(worker)
+        self.assertTrue(all(len(block) == 5 for block in blocks))
+        logger.info('%s tracks in blocks of 5 by %s threads: %.0f inserts/s',
+                    len(self.songs), self.threads, len(self.songs) / elapsed)
+
+
+class TracklistWriteTests(APITestCase):
+
+    def setUp(self):
+        artist = Artist.objects.create(name='Test Artist')
+        self.album = Album.objects.create(title='Sample Album', artist=artist, release_year=2019)
+        self.songs = Song.objects.bulk_create(Song(title=f'Song {i}') for i in range(6))
+        self.url = reverse('api_v1:albums-tracks', kwargs={'pk': self.album.id})
+
+    def tracklist(self):
+        return list(
+            AlbumSong.objects.filter(album=self.album)
+            .order_by('_track_number')
+            .values_list('song_id', '_track_number')
+        )
+
+    def test_append_tracks(self):
+        """
+        Ensure songs are appended after the existing tracks, in the given order.
+        """
+        AlbumSong.objects.create(album=self.album, song=self.songs[0])
+        data = {'songs': [self.songs[2].id, self.songs[1].id]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(track['song'], track['_track_number']) for track in response.data],
+            [(self.songs[2].id, 2), (self.songs[1].id, 3)],
+        )
+        self.assertEqual(
+            self.tracklist(),
+            [(self.songs[0].id, 1), (self.songs[2].id, 2), (self.songs[1].id, 3)],
+        )
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.track_count, 3)
+
+    def test_append_rejects_invalid_songs(self):
+        """
+        Ensure unknown, duplicated and already present songs are rejected without writing.
+        """
+        AlbumSong.objects.create(album=self.album, song=self.songs[0])
+        for songs in ([self.songs[1].id, 0], [10 ** 6], [self.songs[1].id, self.songs[1].id],
+                      [self.songs[0].id], []):
+            response = self.client.post(self.url, {'songs': songs}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, songs)
+        self.assertEqual(self.tracklist(), [(self.songs[0].id, 1)])
+
+    def test_replace_reorders_in_place(self):
+        """
+        Ensure PUT rewrites track numbers of kept songs without re-creating their rows,
+        removes unlisted songs and inserts new ones.
+        """
+        for song in self.songs[:4]:
+            AlbumSong.objects.create(album=self.album, song=song)
+        row_ids = dict(AlbumSong.objects.values_list('song_id', 'id'))
+        order = [self.songs[3].id, self.songs[5].id, self.songs[0].id, self.songs[2].id]
+        response = self.client.put(self.url, {'songs': order}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([track['song'] for track in response.data], order)
+        self.assertEqual(self.tracklist(), [(song, number) for number, song in enumerate(order, start=1)])
+        for song in (self.songs[3], self.songs[0], self.songs[2]):
+            self.assertEqual(AlbumSong.objects.get(album=self.album, song=song).id, row_ids[song.id])
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.track_count, 4)
+
+    def test_replace_with_empty_list_clears_album(self):
+        """
+        Ensure PUT with no songs removes the whole tracklist.
+        """
+        for song in self.songs[:3]:
+            AlbumSong.objects.create(album=self.album, song=song)
+        response = self.client.put(self.url, {'songs': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.tracklist(), [])
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.track_count, 0)
+
+    def test_query_count_does_not_grow_with_tracklist_size(self):
+        """
+        Ensure appending and replacing cost a fixed number of queries.
+        """
+        counts = []
+        for size in (2, 6):
+            album = Album.objects.create(title=f'Album {size}', artist=self.album.artist, release_year=2020)
+            url = reverse('api_v1:albums-tracks', kwargs={'pk': album.id})
+            songs = [song.id for song in self.songs[:size]]
+            with CaptureQueriesContext(connection) as appended:
+                self.client.post(url, {'songs': songs}, format='json')
+            with CaptureQueriesContext(connection) as replaced:
+                self.client.put(url, {'songs': songs[::-1]}, format='json')
+            counts.append((len(appended), len(replaced)))
+        self.assertEqual(counts[0], counts[1])
+
+
+class TracklistReadTests(APITestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='Test Artist')
+
+    def create_album(self, title, year, size):
+        album = Album.objects.create(title=title, artist=self.artist, release_year=year)
+        songs = Song.objects.bulk_create(Song(title=f'{title} {i}') for i in range(size))
+        append_tracks(album.id, [song.id for song in songs])
+        return album
+
+    def test_album_tracks(self):
+        """
+        Ensure the tracklist is returned in order with song titles, in two queries
+        whatever the album size.
+        """
+        for size in (3, 30):
+            album = self.create_album(f'Album {size}', 2019, size)
+            url = reverse('api_v1:albums-tracks', kwargs={'pk': album.id})
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                [(track['_track_number'], track['title']) for track in response.data],
+                [(number, f'Album {size} {number - 1}') for number in range(1, size + 1)],
+            )
+
+    def test_album_tracks_unknown_album(self):
+        """
+        Ensure the tracklist of a missing album is a 404.
+        """
+        response = self.client.get(reverse('api_v1:albums-tracks', kwargs={'pk': 10 ** 6}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_artist_discography(self):
+        """
+        Ensure the discography lists albums in release order with nested tracklists,
+        in three queries whatever the number of albums and tracks.
+        """
+        url = reverse('api_v1:artists-discography', kwargs={'pk': self.artist.id})
+        self.create_album('Second', 2020, 2)
+        self.create_album('First', 2018, 3)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([album['title'] for album in response.data], ['First', 'Second'])
+        self.assertEqual(
+            [track['title'] for track in response.data[0]['tracks']],
+            ['First 0', 'First 1', 'First 2'],
+        )
+        for i in range(5):
+            self.create_album(f'Later {i}', 2021, 20)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 7)
+
+
+class QueryScalingTests(QueryScalingMixin, APITestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='Test Artist')
+        self.album = Album.objects.create(title='Sample Album', artist=self.artist, release_year=2019)
+        self.song = Song.objects.create(title='Sample Song')
+        self.counter = 0
+
+    def next_id(self):
+        self.counter += 1
+        return self.counter
+
+    def add_songs(self, count):
+        for _ in range(count):
+            song = Song.objects.create(title=f'Song {self.next_id()}')
+            AlbumSong.objects.create(album=self.album, song=song)
+
+    def test_artist_list(self):
+        """
+        Ensure the artist list is served with a fixed number of queries.
+        """
+        self.assertQueriesDoNotScale(
+            reverse('api_v1:artists-list'),
+            lambda count: Artist.objects.bulk_create(
+                Artist(name=f'Artist {self.next_id()}') for _ in range(count)
+            ),
+        )
+
+    def test_album_list(self):
+        """
+        Ensure the album list is served with a fixed number of queries.
+        """
+        self.assertQueriesDoNotScale(
+            reverse('api_v1:albums-list'),
+            lambda count: Album.objects.bulk_create(
+                Album(title=f'Album {self.next_id()}', artist=self.artist, release_year=2020)
+                for _ in range(count)
+            ),
+        )
+
+    def test_song_list(self):
+        """
+        Ensure the song list with album ids is served with a fixed number of queries.
+        """
+        self.assertQueriesDoNotScale(reverse('api_v1:songs-list'), self.add_songs)
+
+    def test_song_list_page(self):
+        """
+        Ensure a page of songs is served with a fixed number of queries.
+        """
+        self.assertQueriesDoNotScale(f"{reverse('api_v1:songs-list')}?page_size=100", self.add_songs)
+
+    def test_song_detail(self):
+        """
+        Ensure a song appearing on many albums is served with a fixed number of queries.
+        """
+        def add_albums(count):
+            for _ in range(count):
+                album = Album.objects.create(
+                    title=f'Album {self.next_id()}', artist=self.artist, release_year=2020
+                )
+                AlbumSong.objects.create(album=album, song=self.song)
+
+        self.assertQueriesDoNotScale(
+            reverse('api_v1:songs-detail', kwargs={'pk': self.song.id}), add_albums
+        )
+
+    def test_album_song_list(self):
+        """
+        Ensure the album-song list is served with a fixed number of queries.
+        """
+        self.assertQueriesDoNotScale(reverse('api_v1:album-songs-list'), self.add_songs)
+
+
+class ResponseCacheTests(TransactionTestCase):
+    """
+    The response cache is bypassed inside transactions, so these tests run
+    with real commits.
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.artist = Artist.objects.create(name='Test Artist')
+        self.album = Album.objects.create(title='Sample Album', artist=self.artist, release_year=2019)
+        self.songs = [Song.objects.create(title=f'Song {i}') for i in range(3)]
+        append_tracks(self.album.id, [song.id for song in self.songs])
+
+    def test_hit_and_conditional_get(self):
+        """
+        Ensure the second read is served from the cache and a matching If-None-Match
+        is answered with 304 without any query.
+        """
+        url = reverse('api_v1:artists-detail', kwargs={'pk': self.artist.id})
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(get_stats(), {'hits': 1, 'misses': 1, 'not_modified': 1})
+
+    def test_write_invalidates_list_and_detail(self):
+        """
+        Ensure updating an artist invalidates the artist list and its detail only.
+        """
+        other = Artist.objects.create(name='Other Artist')
+        list_url = reverse('api_v1:artists-list')
+        detail_url = reverse('api_v1:artists-detail', kwargs={'pk': self.artist.id})
+        other_url = reverse('api_v1:artists-detail', kwargs={'pk': other.id})
+        etag = self.client.get(detail_url)['ETag']
+        for url in (list_url, other_url):
+            self.client.get(url)
+
+        self.client.put(detail_url, {'name': 'Renamed'}, format='json')
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Renamed')
+        self.assertEqual(self.client.get(list_url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(other_url)['X-Cache'], 'HIT')
+
+    def test_track_delete_invalidates_shifted_tracklist(self):
+        """
+        Ensure deleting a track invalidates the renumbered tracklist, the discography
+        and the album ids of the song.
+        """
+        urls = {
+            'tracks': reverse('api_v1:albums-tracks', kwargs={'pk': self.album.id}),
+            'discography': reverse('api_v1:artists-discography', kwargs={'pk': self.artist.id}),
+            'song': reverse('api_v1:songs-detail', kwargs={'pk': self.songs[0].id}),
+            'album-songs': reverse('api_v1:album-songs-list'),
+        }
+        for url in urls.values():
+            self.client.get(url)
+        AlbumSong.objects.get(album=self.album, song=self.songs[0]).delete()
+
+        for name, url in urls.items():
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS', name)
+        tracks = self.client.get(urls['tracks']).json()
+        self.assertEqual(
+            [(track['_track_number'], track['title']) for track in tracks],
+            [(1, 'Song 1'), (2, 'Song 2')],
+        )
+
+    def test_song_rename_invalidates_tracklists(self):
+        """
+        Ensure renaming a song invalidates the tracklists it appears in.
+        """
+        url = reverse('api_v1:albums-tracks', kwargs={'pk': self.album.id})
+        self.client.get(url)
+        self.client.patch(
+            reverse('api_v1:songs-detail', kwargs={'pk': self.songs[1].id}),
+            {'title': 'Renamed'}, format='json',
+        )
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[1]['title'], 'Renamed')
+
+    def test_bulk_tracklist_write_invalidates(self):
+        """
+        Ensure the bulk tracklist endpoint invalidates the cached tracklist.
+        """
+        url = reverse('api_v1:albums-tracks', kwargs={'pk': self.album.id})
+        self.client.get(url)
+        order = [self.songs[2].id, self.songs[0].id]
+        self.client.put(url, {'songs': order}, format='json')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([track['song'] for track in response.json()], order)
+
+    def test_counter_changes_invalidate_albums_and_artists(self):
+        """
+        Ensure track and album writes invalidate the cached counters of albums and artists.
+        """
+        album_urls = (
+            reverse('api_v1:albums-list'),
+            reverse('api_v1:albums-detail', kwargs={'pk': self.album.id}),
+        )
+        artist_urls = (
+            reverse('api_v1:artists-list'),
+            reverse('api_v1:artists-detail', kwargs={'pk': self.artist.id}),
+        )
+
+        def counters():
+            albums = [self.client.get(url).json() for url in album_urls]
+            artists = [self.client.get(url).json() for url in artist_urls]
+            return (
+                albums[0][0]['track_count'], albums[1]['track_count'],
+                artists[0][0]['song_count'], artists[1]['song_count'],
+                artists[0][0]['album_count'], artists[1]['album_count'],
+            )
+
+        self.assertEqual(counters(), (3, 3, 3, 3, 1, 1))
+        append_tracks(self.album.id, [Song.objects.create(title='Song 3').id])
+        self.assertEqual(counters(), (4, 4, 4, 4, 1, 1))
+        AlbumSong.objects.filter(album=self.album, song=self.songs[0]).delete()
+        self.assertEqual(counters(), (3, 3, 3, 3, 1, 1))
+        replace_tracks(self.album.id, [self.songs[1].id])
+        self.assertEqual(counters(), (1, 1, 1, 1, 1, 1))
+        Album.objects.create(title='Second Album', artist=self.artist, release_year=2020)
+        artists = [self.client.get(url).json() for url in artist_urls]
+        self.assertEqual((artists[0][0]['album_count'], artists[1]['album_count']), (2, 2))
+
+    def test_browsable_api_is_not_cached(self):
+        """
+        Ensure HTML responses bypass the cache.
+        """
+        url = reverse('api_v1:artists-list')
+        for _ in range(2):
+            response = self.client.get(url, HTTP_ACCEPT='text/html')
+            self.assertNotIn('X-Cache', response)
+
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='Midnight Harbor')
+        Artist.objects.create(name='Harbor')
+        Album.objects.create(title='Harbor Lights', artist=self.artist, release_year=2019)
+        Song.objects.create(title='Northern Harbor Song')
+        Song.objects.create(title='Unrelated')
+        self.url = reverse('api_v1:search-list')
+
+    def test_search_all_kinds(self):
+        """
+        Ensure artists, albums and songs are searched, best match first.
+        """
+        response = self.client.get(self.url, {'q': 'harbor'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([artist['name'] for artist in response.data['artists']],
+                         ['Harbor', 'Midnight Harbor'])
+        self.assertEqual([album['title'] for album in response.data['albums']], ['Harbor Lights'])
+        self.assertEqual([song['title'] for song in response.data['songs']], ['Northern Harbor Song'])
+
+    def test_limit(self):
+        """
+        Ensure the number of results per kind can be limited.
+        """
+        response = self.client.get(self.url, {'q': 'harbor', 'limit': 1})
+        self.assertEqual([artist['name'] for artist in response.data['artists']], ['Harbor'])
+
+    def test_query_is_required(self):
+        """
+        Ensure a missing or too short query is rejected.
+        """
+        for params in ({}, {'q': 'h'}, {'q': 'harbor', 'limit': 500}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_typo_tolerance(self):
+        """
+        Ensure misspelled queries still find the closest titles.
+        """
+        if not has_trigram_search(connection.alias):
+            self.skipTest('Typo tolerance needs PostgreSQL with pg_trgm.')
+        response = self.client.get(self.url, {'q': 'harbour lihgts'})
+        self.assertEqual([album['title'] for album in response.data['albums']], ['Harbor Lights'])
+
+
+class ImportCatalogTests(APITestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        return path
+
+    def write_tracks(self, name, tracks):
+        return self.write(name, [
+            json.dumps({'artist': artist, 'album': album, 'release_year': 2000, 'song': song})
+            for artist, album, song in tracks
+        ])
+
+    def import_catalog(self, path, **options):
+        call_command('import_catalog', path, stdout=io.StringIO(), **options)
+
+    def tracklist(self, album):
+        return list(album.albumsong_set.order_by('_track_number').values_list(
+            'song__title', '_track_number'
+        ))
+
+    def test_import_tracks(self):
+        """
+        Ensure artists and albums are deduplicated and tracks numbered in file order.
+        """
+        path = self.write_tracks('catalog.jsonl', [
+            ('Artist', 'First', 'One'),
+            ('Artist', 'Second', 'Two'),
+            ('Artist', 'First', 'Three'),
+            ('Other', 'First', 'Four'),
+        ])
+        self.import_catalog(path, batch_size=2)
+        self.assertEqual(Artist.objects.count(), 2)
+        self.assertEqual(Album.objects.count(), 3)
+        first = Album.objects.get(title='First', artist__name='Artist')
+        self.assertEqual(self.tracklist(first), [('One', 1), ('Three', 2)])
+        self.assertEqual(first.track_count, 2)
+
+    def test_import_appends_to_existing_albums(self):
+        """
+        Ensure imported tracks continue the numbering of an existing album.
+        """
+        artist = Artist.objects.create(name='Artist')
+        album = Album.objects.create(title='First', artist=artist, release_year=1999)
+        AlbumSong.objects.create(album=album, song=Song.objects.create(title='Existing'))
+        self.import_catalog(self.write_tracks('catalog.jsonl', [('Artist', 'First', 'New')]))
+        self.assertEqual(Artist.objects.count(), 1)
+        self.assertEqual(self.tracklist(album), [('Existing', 1), ('New', 2)])
+        album.refresh_from_db()
+        self.assertEqual(album.track_count, 2)
+        self.assertEqual(album.release_year, 1999)
+
+    def test_import_album_records_and_csv(self):
+        """
+        Ensure album records with tracklists and gzipped CSV files are imported.
+        """
+        self.import_catalog(self.write('albums.jsonl', [json.dumps({
+            'title': 'Album', 'release_year': 2001, 'artist': {'name': 'Artist'},
+            'tracks': [{'title': 'One'}, {'title': 'Two'}],
+        })]))
+        self.import_catalog(self.write('tracks.csv.gz', [
+            'artist,album,release_year,song', 'Artist,Album,2001,Three',
+        ]))
+        album = Album.objects.get()
+        self.assertEqual(self.tracklist(album), [('One', 1), ('Two', 2), ('Three', 3)])
+
+    def test_resume_from_checkpoint(self):
+        """
+        Ensure an import resumes after the records recorded in the checkpoint.
+        """
+        path = self.write_tracks('catalog.jsonl', [
+            ('Artist', 'Album', 'One'), ('Artist', 'Album', 'Two'), ('Artist', 'Album', 'Three'),
+        ])
+        checkpoint = os.path.join(self.directory, 'checkpoint.json')
+        with open(checkpoint, 'w') as file:
+            json.dump({'path': path, 'records': 2}, file)
+        self.import_catalog(path, checkpoint=checkpoint)
+        self.assertEqual(list(Song.objects.values_list('title', flat=True)), ['Three'])
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_checkpoint_saved_after_each_batch(self):
+        """
+        Ensure a failing import leaves a checkpoint after the last committed batch.
+        """
+        path = self.write(
+            'catalog.jsonl',
+            [json.dumps({'artist': 'Artist', 'album': 'Album', 'release_year': 2000, 'song': 'One'}),
+             json.dumps({'artist': 'Artist', 'album': 'Album', 'release_year': 'unknown', 'song': 'Two'})],
+        )
+        checkpoint = os.path.join(self.directory, 'checkpoint.json')
+        with self.assertRaisesMessage(CommandError, 'Record 2: release_year'):
+            self.import_catalog(path, checkpoint=checkpoint, batch_size=1)
+        with open(checkpoint) as file:
+            self.assertEqual(json.load(file)['records'], 1)
+        self.assertEqual(AlbumSong.objects.count(), 1)
+
+    def test_queries_do_not_scale_with_rows(self):
+        """
+        Ensure a batch costs the same number of queries whatever its size.
+        """
+        counts = []
+        for size in (2, 50):
+            path = self.write_tracks(f'catalog{size}.jsonl', [
+                (f'Artist {size}', f'Album {size}', f'Song {number}') for number in range(size)
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                self.import_catalog(path)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class ExportCatalogTests(APITestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='Artist')
+        self.album = Album.objects.create(title='Album', artist=self.artist, release_year=2000)
+        self.songs = [Song.objects.create(title=f'Song {number}') for number in range(3)]
+        append_tracks(self.album.pk, [song.pk for song in reversed(self.songs)])
+        self.empty = Album.objects.create(title='Empty', artist=self.artist, release_year=2001)
+        self.url = reverse('api_v1:export-list')
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        content = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_export(self):
+        """
+        Ensure every album is streamed with its artist and ordered tracklist.
+        """
+        records = self.read(self.client.get(self.url))
+        self.assertEqual(records, [
+            {
+                'id': self.album.pk,
+                'title': 'Album',
+                'release_year': 2000,
+                'artist': {'id': self.artist.pk, 'name': 'Artist'},
+                'tracks': [
+                    {'_track_number': number, 'song': song.pk, 'title': song.title}
+                    for number, song in enumerate(reversed(self.songs), start=1)
+                ],
+            },
+            {
+                'id': self.empty.pk,
+                'title': 'Empty',
+                'release_year': 2001,
+                'artist': {'id': self.artist.pk, 'name': 'Artist'},
+                'tracks': [],
+            },
+        ])
+
+    def test_export_since_and_gzip(self):
+        """
+        Ensure the export can be limited to newer albums and gzipped.
+        """
+        response = self.client.get(self.url, {'since': self.album.pk}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual([record['title'] for record in self.read(response)], ['Empty'])
+        response = self.client.get(self.url, {'since': -1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_queries_do_not_scale(self):
+        """
+        Ensure the export costs one query per model and chunk, not per album.
+        """
+        counts = []
+        for size in (1, 20):
+            for number in range(size):
+                album = Album.objects.create(
+                    title=f'Album {size}-{number}', artist=self.artist, release_year=2000
+                )
+                append_tracks(album.pk, [self.songs[0].pk])
+            with CaptureQueriesContext(connection) as queries:
+                self.read(self.client.get(self.url))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_export_command_round_trip(self):
+        """
+        Ensure the export_catalog output can be loaded back with import_catalog.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'catalog.jsonl.gz')
+        call_command('export_catalog', output=path, stdout=io.StringIO())
+        Artist.objects.all().delete()
+        Song.objects.all().delete()
+        call_command('import_catalog', path, stdout=io.StringIO())
+        album = Album.objects.get()
+        self.assertEqual((album.title, album.artist.name, album.release_year), ('Album', 'Artist', 2000))
+        self.assertEqual(
+            list(album.albumsong_set.order_by('_track_number').values_list('song__title', flat=True)),
+            ['Song 2', 'Song 1', 'Song 0'],
+        )
+
+
+class FilterTests(APITestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='Artist')
+        other = Artist.objects.create(name='Other')
+        self.old = Album.objects.create(title='Old', artist=self.artist, release_year=1970)
+        self.new = Album.objects.create(title='New', artist=self.artist, release_year=2020)
+        self.other = Album.objects.create(title='Other', artist=other, release_year=2020)
+        self.song = Song.objects.create(title='Song')
+        append_tracks(self.old.pk, [self.song.pk])
+        append_tracks(self.new.pk, [self.song.pk, Song.objects.create(title='Other').pk])
+
+    def get(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_filter_albums(self):
+        """
+        Ensure albums can be filtered by artist and release year range.
+        """
+        url = reverse('api_v1:albums-list')
+        for params, albums in (
+            ({'artist': self.artist.pk}, [self.old, self.new]),
+            ({'release_year__gte': 2000}, [self.new, self.other]),
+            ({'artist': self.artist.pk, 'release_year__lte': 2000}, [self.old]),
+        ):
+            self.assertEqual(sorted(album['id'] for album in self.get(url, params)),
+                             sorted(album.pk for album in albums), params)
+
+    def test_filter_album_songs(self):
+        """
+        Ensure album-songs can be filtered by album and song.
+        """
+        url = reverse('api_v1:album-songs-list')
+        for params, tracks in (
+            ({'song': self.song.pk}, [(self.old.pk, 1), (self.new.pk, 1)]),
+            ({'album': self.new.pk}, [(self.new.pk, 1), (self.new.pk, 2)]),
+            ({'album': self.new.pk, 'song': self.song.pk}, [(self.new.pk, 1)]),
+        ):
+            self.assertEqual(
+                sorted((track['album'], track['_track_number']) for track in self.get(url, params)),
+                tracks, params,
+            )
+
+    def test_invalid_filter(self):
+        """
+        Ensure a non-integer filter value is rejected.
+        """
+        response = self.client.get(reverse('api_v1:albums-list'), {'artist': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FilterIndexTests(APITestCase):
+    """
+    Runs EXPLAIN on the queries of the filtered lists over a seeded catalog
+    and fails on any sequential scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_catalog(artists=100, seed=1)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertNoSequentialScans(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for query in queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                    plan = [row[-1] for row in cursor.fetchall()]
+                    scans = [step for step in plan if step.startswith('SCAN') and 'USING' not in step]
+                else:
+                    cursor.execute('EXPLAIN ' + query['sql'])
+                    plan = [row[0] for row in cursor.fetchall()]
+                    scans = [step for step in plan if 'Seq Scan' in step]
+            self.assertFalse(scans, f'{url} {params}:\n' + '\n'.join(plan))
+
+    def test_filters_use_indexes(self):
+        """
+        Ensure every supported filter is served from an index.
+        """
+        album = Album.objects.order_by('pk')[500]
+        song_id = album.albumsong_set.values_list('song_id', flat=True)[0]
+        for url, params in (
+            ('api_v1:albums-list', {'artist': album.artist_id}),
+            ('api_v1:albums-list', {'artist': album.artist_id, 'release_year__gte': 2000}),
+            ('api_v1:albums-list', {'release_year': 1990}),
+            ('api_v1:albums-list', {'release_year__gte': 2022}),
+            ('api_v1:album-songs-list', {'album': album.pk}),
+            ('api_v1:album-songs-list', {'song': song_id}),
+            ('api_v1:album-songs-list', {'song': song_id, 'page_size': 10}),
+        ):
+            self.assertNoSequentialScans(reverse(url), params)
+        if connection.vendor == 'postgresql':
+            # SQLite keeps no range statistics and walks the table in id order
+            # for ORDER BY id LIMIT n whatever the filter.
+            self.assertNoSequentialScans(
+                reverse('api_v1:albums-list'), {'release_year__gte': 2022, 'page_size': 10}
+            )
+
+
+class BenchmarkTests(APITestCase):
+
+    def test_benchmark_covers_every_route(self):
+        """
+        Ensure the benchmark requests every route and method of the API successfully.
+        """
+        generate_catalog(artists=3, albums_per_artist=2, tracks_per_album=4)
+        enqueue('repair_counters')
+        results = run_benchmark(requests=1, warmup=0)['results']
+        self.assertIn('GET albums-tracks', results)
+        self.assertIn('DELETE album-songs-detail', results)
+        for key, result in results.items():
+            self.assertNotIn('skipped', result, key)
+            self.assertTrue(all(200 <= code < 300 for code in result['status']), (key, result))
+        self.assertEqual(Artist.objects.count(), 3)
+
+    def test_find_regressions(self):
+        """
+        Ensure slower endpoints and endpoints making more queries are reported.
+        """
+        def run(p95, queries):
+            return {'results': {'GET artists-list': {'p95_ms': p95, 'queries': queries}}}
+
+        self.assertEqual(find_regressions(run(10, 1), run(11, 1)), [])
+        self.assertEqual(len(find_regressions(run(10, 1), run(13, 2))), 2)
+
+
+class RequestTimingTests(APITestCase):
+
+    def setUp(self):
+        self.album = Album.objects.create(
+            title='Album', artist=Artist.objects.create(name='Artist'), release_year=2000
+        )
+
+    def test_server_timing_header(self):
+        """
+        Ensure responses report their query count and timing split.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api_v1:albums-list'))
+        timing = dict(
+            entry.split(';', 1) for entry in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(timing), {'db', 'serialize', 'render', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+
+    def test_request_log(self):
+        """
+        Ensure every request is logged with its view name and timings.
+        """
+        with self.assertLogs('api.timing', 'INFO') as logs:
+            self.client.get(reverse('api_v1:album-songs-list'))
+        record = logs.records[-1]
+        self.assertEqual(record.view, 'AlbumSongViewSet.list')
+        self.assertEqual(record.status, 200)
+        self.assertIn('view=AlbumSongViewSet.list', record.getMessage())
+        self.assertGreaterEqual(record.total_ms, record.db_ms)
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_query_log(self):
+        """
+        Ensure queries slower than SLOW_QUERY_MS are logged with the view name.
+        """
+        with self.assertLogs('api.timing', 'WARNING') as logs:
+            self.client.get(reverse('api_v1:albums-detail', args=[self.album.pk]))
+        self.assertEqual(logs.records[0].view, 'AlbumViewSet.retrieve')
+        self.assertIn('musical_catalog_album', logs.records[0].sql)
+
+
+class AsyncReadTests(APITestCase):
+
+    def setUp(self):
+        generate_catalog(artists=2, albums_per_artist=2, tracks_per_album=3)
+        self.album = Album.objects.order_by('pk').first()
+        self.track = self.album.albumsong_set.order_by('pk').first()
+
+    async def assertSameResponse(self, name, kwargs=None, params=None):
+        url = reverse(f'api_v1:{name}', kwargs=kwargs)
+        async_url = reverse(f'api_v1:async-{name}', kwargs=kwargs)
+        expected = await sync_to_async(self.client.get)(url, params, HTTP_ACCEPT='application/json')
+        response = await self.async_client.get(async_url, params)
+        self.assertEqual(response.status_code, expected.status_code, async_url)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        # Apart from the next page links, which point to their own endpoints.
+        self.assertEqual(response.content.replace(b'/api/async/', b'/api/'), expected.content, async_url)
+
+    async def test_async_endpoints_match_viewsets(self):
+        """
+        Ensure the async read endpoints return the same JSON as the viewsets.
+        """
+        album = {'pk': self.album.pk}
+        for name, kwargs, params in (
+            ('artists-list', None, None),
+            ('artists-detail', {'pk': self.album.artist_id}, None),
+            ('albums-list', None, None),
+            ('albums-list', None, {'artist': self.album.artist_id, 'page_size': 1}),
+            ('albums-detail', album, None),
+            ('albums-tracks', album, None),
+            ('songs-list', None, {'page_size': 2}),
+            ('songs-detail', {'pk': self.track.song_id}, None),
+            ('album-songs-list', None, {'album': self.album.pk}),
+            ('album-songs-detail', {'pk': self.track.pk}, None),
+        ):
+            await self.assertSameResponse(name, kwargs, params)
+
+    async def test_async_errors_match_viewsets(self):
+        """
+        Ensure missing objects, bad filters and bad cursors get the viewsets' errors.
+        """
+        await self.assertSameResponse('albums-detail', {'pk': 0})
+        await self.assertSameResponse('albums-tracks', {'pk': 0})
+        await self.assertSameResponse('albums-list', None, {'artist': 'abc'})
+        await self.assertSameResponse('songs-list', None, {'cursor': 'invalid'})
+
+    async def test_async_pagination(self):
+        """
+        Ensure the next page link of an async list points to the async endpoint.
+        """
+        response = await self.async_client.get(reverse('api_v1:async-songs-list'), {'page_size': 2})
+        self.assertIn('/api/async/songs/', response.json()['next'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+
+class ReplicaRouterTests(APITestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_routing(self):
+        """
+        Ensure only reads inside use_replicas() go to a replica.
+        """
+        artist = Artist.objects.create(name='Artist')
+        self.assertEqual(self.router.db_for_read(Artist), 'default')
+        with use_replicas():
+            self.assertEqual(self.router.db_for_read(Artist), 'replica')
+            self.assertEqual(self.router.db_for_write(Artist), 'default')
+            self.assertEqual(self.router.db_for_read(Album, instance=artist), 'default')
+            with pin_primary(), use_replicas():
+                self.assertEqual(self.router.db_for_read(Artist), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_routing_without_replicas(self):
+        """
+        Ensure everything uses the primary when no replica is configured.
+        """
+        with use_replicas():
+            self.assertEqual(self.router.db_for_read(Artist), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=5)
+    def test_sticky_after_write(self):
+        """
+        Ensure a client that wrote reads from the primary for a while.
+        """
+        url = reverse('api_v1:artists-list')
+        with mock.patch('api.v1.replicas.use_replicas', wraps=use_replicas) as replicas:
+            response = self.client.post(url, {'name': 'Artist'}, format='json')
+            self.assertIn('read_primary_until', response.cookies)
+            self.client.get(reverse('api_v1:artists-detail', args=[response.data['id']]))
+            replicas.assert_not_called()
+            self.client.cookies.clear()
+            with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', return_value='default'):
+                self.client.get(url)
+            replicas.assert_called_once()
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_sticky_cookie_without_replicas(self):
+        """
+        Ensure writes set no cookie when there are no replicas.
+        """
+        response = self.client.post(reverse('api_v1:artists-list'), {'name': 'Artist'}, format='json')
+        self.assertNotIn('read_primary_until', response.cookies)
+
+
+@skipUnless('replica' in settings.DATABASE_REPLICAS, 'Needs the settings_replica_sqlite settings.')
+class ReplicaRoutingTests(APITestCase):
+    """
+    Runs against a primary and a replica that never receives its writes.
+    """
+    # Only the replica of the settings module the tests are run with.
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        self.album = Album.objects.create(
+            title='Album', artist=Artist.objects.create(name='Artist'), release_year=2000
+        )
+        self.song = Song.objects.create(title='Song')
+
+    def test_reads_go_to_replica(self):
+        """
+        Ensure GET requests read from the replica.
+        """
+        response = self.client.get(reverse('api_v1:artists-list'))
+        self.assertEqual(response.data, [])
+
+    def test_read_your_writes(self):
+        """
+        Ensure a client sees its new tracks right after adding them, and the
+        replica again once the sticky window is over.
+        """
+        url = reverse('api_v1:albums-tracks', args=[self.album.pk])
+        response = self.client.post(url, {'songs': [self.song.pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(AlbumSong.objects.using('default').count(), 1)
+        self.assertEqual(AlbumSong.objects.using('replica').count(), 0)
+        response = self.client.get(url)
+        self.assertEqual([track['song'] for track in response.data], [self.song.pk])
+        with mock.patch('api.v1.replicas.time.time', return_value=time.time() + 3600):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@skipUnless('replica' in settings.DATABASE_REPLICAS, 'Needs the settings_replica_sqlite settings.')
+class ReplicaCacheTests(TransactionTestCase):
+    """
+    The response cache is bypassed inside transactions, so these tests run
+    with real commits against a replica that never receives the writes.
+    """
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        get_cache().clear()
+
+    def test_sticky_client_bypasses_cache(self):
+        """
+        Ensure a client reading its own writes neither gets nor stores responses built from the replica.
+        """
+        writer, reader = APIClient(), APIClient()
+        url = reverse('api_v1:artists-list')
+        response = writer.post(url, {'name': 'Artist'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = reader.get(url)
+        self.assertEqual((response.data, response['X-Cache']), ([], 'MISS'))
+        response = writer.get(url)
+        self.assertEqual([artist['name'] for artist in response.json()], ['Artist'])
+        self.assertNotIn('X-Cache', response)
+        response = reader.get(url)
+        self.assertEqual((response.json(), response['X-Cache']), ([], 'HIT'))
+
+        # Once the sticky window is over (patching time.time would expire the cache too).
+        writer.cookies['read_primary_until'] = '0'
+        response = writer.get(url)
+        self.assertEqual((response.json(), response['X-Cache']), ([], 'HIT'))
+
+
+class ValuesSerializationTests(APITestCase):
+
+    def setUp(self):
+        # Quotes, escapes, control characters, non-ASCII and the line
+        # separators JSONRenderer escapes.
+        names = ['Plain', 'Quote " and \\ backslash', 'Tab\tand\nnewline\x01',
+                 'Кириллица 😀', 'Line\u2028separator\u2029']
+        for number, name in enumerate(names):
+            artist = Artist.objects.create(name=name)
+            album = Album.objects.create(title=f'{name} {number}', artist=artist, release_year=1990 + number)
+            append_tracks(album.id, [
+                Song.objects.create(title=f'{name} song {track}').id for track in range(3)
+            ])
+
+    def assertSameBody(self, url, **extra):
+        """The fast path body is byte-identical to the one of the serializer."""
+        fast = self.client.get(url, **extra)
+        with mock.patch.object(ArtistViewSet, 'values_serialization', False), \
+                mock.patch.object(AlbumViewSet, 'values_serialization', False), \
+                mock.patch.object(AlbumSongViewSet, 'values_serialization', False):
+            slow = self.client.get(url, **extra)
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, slow.content)
+        self.assertEqual(fast['Content-Type'], slow['Content-Type'])
+        return fast
+
+    def test_list_bodies_match_serializers(self):
+        """
+        Ensure the values() lists render the same bytes as the serializers.
+        """
+        for name in ('artists', 'albums', 'album-songs'):
+            url = reverse(f'api_v1:{name}-list')
+            self.assertSameBody(url)
+            self.assertSameBody(url, HTTP_ACCEPT='application/json; indent=2')
+            response = self.assertSameBody(f'{url}?page_size=2')
+            while response.data['next']:
+                response = self.assertSameBody(response.data['next'])
+        self.assertSameBody(f"{reverse('api_v1:albums-list')}?release_year__gte=1992")
+        artist = Artist.objects.get(name='Plain')
+        response = self.assertSameBody(reverse('api_v1:artists-list'))
+        self.assertIn(
+            f'{{"id":{artist.id},"name":"Plain","album_count":1,"song_count":3}}'.encode(),
+            response.content,
+        )
+        self.assertIn(b'Line\\u2028separator\\u2029', response.content)
+
+    def test_list_skips_serializers(self):
+        """
+        Ensure the fast path builds no serializer for the rows.
+        """
+        with mock.patch.object(ArtistSerializer, 'to_representation') as to_representation:
+            response = self.client.get(reverse('api_v1:artists-list'))
+        self.assertEqual(len(response.data), 5)
+        to_representation.assert_not_called()
+
+    def test_unsupported_serializer(self):
+        """
+        Ensure serializers with many-to-many fields are rejected.
+        """
+        self.assertEqual(
+            get_values_fields(ArtistSerializer), ('id', 'name', 'album_count', 'song_count')
+        )
+        with self.assertRaises(ImproperlyConfigured):
+            get_values_fields(SongSerializer)
+
+    def test_serialization_benchmark(self):
+        """
+        Ensure the serialization benchmark reports every fast path list.
+        """
+        results = run_serialization_benchmark(repeat=1)['results']
+        self.assertEqual(set(results), {'artists', 'albums', 'album-songs'})
+        self.assertEqual(results['album-songs']['rows'], 15)
+
+
+class CounterTests(APITestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='Artist')
+        self.songs = [Song.objects.create(title=f'Song {i}') for i in range(4)]
+
+    def counters(self):
+        self.assertEqual(find_counter_drift(), [])
+        return {
+            artist.name: (artist.album_count, artist.song_count)
+            for artist in Artist.objects.all()
+        }
+
+    def test_counters_follow_writes(self):
+        """
+        Ensure the counters follow album and track writes and are exposed in the API.
+        """
+        response = self.client.post(
+            reverse('api_v1:albums-list'),
+            {'title': 'Album', 'artist': self.artist.id, 'release_year': 2000},
+            format='json',
+        )
+        self.assertEqual(response.data['track_count'], 0)
+        album_url = reverse('api_v1:albums-detail', args=[response.data['id']])
+        tracks_url = reverse('api_v1:albums-tracks', args=[response.data['id']])
+        self.assertEqual(self.counters(), {'Artist': (1, 0)})
+
+        self.client.post(tracks_url, {'songs': [song.id for song in self.songs]}, format='json')
+        self.assertEqual(self.client.get(album_url).data['track_count'], 4)
+        self.assertEqual(self.counters(), {'Artist': (1, 4)})
+
+        AlbumSong.objects.create(album_id=response.data['id'], song=Song.objects.create(title='Extra'))
+        self.client.put(tracks_url, {'songs': [self.songs[2].id, self.songs[0].id]}, format='json')
+        self.assertEqual(self.counters(), {'Artist': (1, 2)})
+
+        self.songs[0].delete()
+        artist = self.client.get(reverse('api_v1:artists-detail', args=[self.artist.id])).data
+        self.assertEqual((artist['album_count'], artist['song_count']), (1, 1))
+
+        other = Artist.objects.create(name='Other')
+        self.client.patch(album_url, {'artist': other.id}, format='json')
+        self.assertEqual(self.counters(), {'Artist': (0, 0), 'Other': (1, 1)})
+
+        self.client.delete(album_url)
+        self.assertEqual(self.counters(), {'Artist': (0, 0), 'Other': (0, 0)})
+
+    def test_moved_track_moves_counters(self):
+        """
+        Ensure moving a track to an album of another artist moves its counts along.
+        """
+        other = Artist.objects.create(name='Other')
+        source = Album.objects.create(title='Source', artist=self.artist, release_year=2000)
+        target = Album.objects.create(title='Target', artist=other, release_year=2000)
+        append_tracks(source.id, [song.id for song in self.songs[:2]])
+        track = AlbumSong.objects.get(album=source, song=self.songs[1])
+        response = self.client.put(
+            reverse('api_v1:album-songs-detail', args=[track.id]),
+            {'album': target.id, 'song': self.songs[1].id},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.counters(), {'Artist': (1, 1), 'Other': (1, 1)})
+        source.refresh_from_db()
+        target.refresh_from_db()
+        self.assertEqual((source.track_count, target.track_count), (1, 1))
+
+    def test_stale_instances_keep_counters(self):
+        """
+        Ensure saving instances loaded before tracks were added keeps the counters.
+        """
+        album = Album.objects.create(title='Album', artist=self.artist, release_year=2000)
+        append_tracks(album.id, [song.id for song in self.songs])
+        self.artist.name = 'Renamed'
+        self.artist.save()
+        album.title = 'Renamed'
+        album.save()
+        self.assertEqual(album.track_count, 4)
+        self.assertEqual(self.counters(), {'Renamed': (1, 4)})
+        album.delete()
+        self.assertEqual(self.counters(), {'Renamed': (0, 0)})
+
+    def test_bulk_loads_set_counters(self):
+        """
+        Ensure generated and imported catalogs come with consistent counters.
+        """
+        generate_catalog(artists=3, albums_per_artist=2, tracks_per_album=4)
+        album = Album.objects.first()
+        import_catalog([
+            {'artist': album.artist.name, 'album': album.title, 'release_year': 2000, 'song': 'New'},
+            {'artist': album.artist.name, 'album': 'New album', 'release_year': 2000, 'song': 'New'},
+            {'artist': 'New artist', 'album': 'New album', 'release_year': 2000, 'song': 'New'},
+        ], batch_size=2)
+        self.assertEqual(find_counter_drift(), [])
+        self.assertEqual(Artist.objects.get(name='New artist').song_count, 1)
+
+    def test_check_counters(self):
+        """
+        Ensure check_counters reports drifted counters and --repair fixes them.
+        """
+        album = Album.objects.create(title='Album', artist=self.artist, release_year=2000)
+        append_tracks(album.id, [song.id for song in self.songs])
+        call_command('check_counters', stdout=io.StringIO())
+        Album.objects.update(track_count=9)
+        Artist.objects.update(album_count=0)
+        with self.assertRaisesMessage(CommandError, '2 counters drifted'):
+            call_command('check_counters', stdout=io.StringIO())
+        output = io.StringIO()
+        call_command('check_counters', repair=True, stdout=output)
+        self.assertIn(f'Album {album.id} track_count: 9, actual 4', output.getvalue())
+        self.assertEqual(self.counters(), {'Artist': (1, 4)})
+
+
+class SparseFieldsetTests(APITestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='Artist')
+        self.album = Album.objects.create(title='Album', artist=self.artist, release_year=2000)
+        self.songs = [Song.objects.create(title=f'Song {i}') for i in range(3)]
+        append_tracks(self.album.id, [song.id for song in self.songs])
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, [query['sql'] for query in queries]
+
+    def test_fields_narrow_output_and_columns(self):
+        """
+        Ensure ?fields= trims every object and selects only the needed columns.
+        """
+        for name, params, keys, absent in (
+            ('albums-list', {'fields': 'id,title'}, ['id', 'title'], 'release_year'),
+            ('artists-list', {'fields': 'name'}, ['name'], 'song_count'),
+            ('album-songs-list', {'omit': 'album,song'}, ['_track_number'], 'song_id'),
+        ):
+            response, queries = self.get(reverse(f'api_v1:{name}'), params)
+            self.assertEqual([list(item) for item in response.data], [keys] * len(response.data))
+            self.assertEqual(len(queries), 1)
+            self.assertNotIn(absent, queries[0])
+
+        response, queries = self.get(
+            reverse('api_v1:albums-detail', args=[self.album.id]), {'fields': 'title'}
+        )
+        self.assertEqual(response.data, {'title': 'Album'})
+        self.assertNotIn('release_year', queries[0])
+        self.assertNotIn('track_count', queries[0])
+
+    def test_omitted_albums_skip_prefetch(self):
+        """
+        Ensure songs without their albums are served without the many-to-many query.
+        """
+        url = reverse('api_v1:songs-list')
+        response, queries = self.get(url, {})
+        self.assertEqual(len(queries), 2)
+        response, queries = self.get(url, {'omit': 'albums'})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data[0], {'id': self.songs[0].id, 'title': 'Song 0'})
+        response, queries = self.get(
+            reverse('api_v1:songs-detail', args=[self.songs[0].id]), {'fields': 'albums'}
+        )
+        self.assertEqual(response.data, {'albums': [self.album.id]})
+        self.assertEqual(len(queries), 2)
+
+    def test_paginated_sparse_fields(self):
+        """
+        Ensure pages walk in order when the ordering fields are not requested.
+        """
+        url = reverse('api_v1:album-songs-list')
+        response, _ = self.get(url, {'fields': 'song', 'page_size': 2})
+        songs = [item['song'] for item in response.data['results']]
+        response = self.client.get(response.data['next'])
+        songs += [item['song'] for item in response.data['results']]
+        self.assertEqual(songs, [song.id for song in self.songs])
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(list(response.data['results'][0]), ['song'])
+
+    def test_unknown_field(self):
+        """
+        Ensure unknown field names are rejected.
+        """
+        response = self.client.get(reverse('api_v1:artists-list'), {'omit': 'title'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'omit': ['Unknown field "title".']})
+
+    def test_empty_fieldset(self):
+        """
+        Ensure a fieldset that leaves no field is rejected by the list and detail endpoints alike.
+        """
+        urls = (
+            reverse('api_v1:albums-list'),
+            reverse('api_v1:albums-detail', kwargs={'pk': self.album.id}),
+        )
+        omit_all = {'omit': 'id,title,artist,release_year,track_count'}
+        for url in urls:
+            for params in ({'fields': ''}, {'fields': ' , '}, omit_all):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, (url, params))
+        response = self.client.get(urls[0], {'fields': ''})
+        self.assertEqual(response.data, {'fields': ['At least one field must be returned.']})
+
+
+class BatchTests(APITestCase):
+    url = reverse('api_v1:batch-list')
+
+    def test_batch_with_references(self):
+        """
+        Ensure a batch creates an artist, an album and its tracks, later
+        operations using the ids created by earlier ones.
+        """
+        operations = editor_operations('Editor', 2) + [
+            {'method': 'GET', 'path': '/api/albums/$album.id/tracks/'},
+        ]
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201] * 6 + [200])
+        album = Album.objects.get(title='Editor')
+        self.assertEqual(results[1]['data']['artist'], album.artist_id)
+        self.assertEqual([track['title'] for track in results[-1]['data']], ['Editor 0', 'Editor 1'])
+        self.assertEqual((album.artist.album_count, album.artist.song_count), (1, 2))
+
+    def test_failed_operation_rolls_back(self):
+        """
+        Ensure a failed operation rolls back the operations before it.
+        """
+        operations = editor_operations('Editor', 1)
+        operations[1]['body']['release_year'] = 3000
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['failed'], 1)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 400])
+        self.assertIn('release_year', response.data['results'][1]['data'])
+        self.assertFalse(Artist.objects.exists())
+
+    def test_invalid_operations(self):
+        """
+        Ensure unknown references, routes outside the API and nested batches are rejected.
+        """
+        for operation, detail in (
+            ({'method': 'GET', 'path': '/api/artists/$missing.id/'}, 'Unknown reference "missing".'),
+            ({'method': 'GET', 'path': '/admin/'}, '"/admin/" cannot be used in a batch.'),
+            ({'method': 'POST', 'path': '/api/batch/'}, '"/api/batch/" cannot be used in a batch.'),
+            ({'method': 'GET', 'path': '/nowhere/'}, 'No route matches "/nowhere/".'),
+        ):
+            response = self.client.post(self.url, {'operations': [operation]}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['results'][0]['data'], {'detail': detail})
+
+        operations = [{'method': 'GET', 'path': '/api/artists/', 'ref': 'same'}] * 2
+        response = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(response.data, {'operations': ['Every ref must be unique.']})
+
+    def test_batch_benchmark(self):
+        """
+        Ensure the batch benchmark compares both modes over the same operations.
+        """
+        results = run_batch_benchmark(songs=1, requests=1)['results']
+        self.assertEqual(results['sequential']['requests'], 4)
+        self.assertEqual(results['batch']['requests'], 1)
+        self.assertEqual(Artist.objects.count(), 2)
+
+
+class AdminTests(QueryScalingMixin, APITestCase):
+
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@tune.com', 'password')
+        self.client.force_login(user)
+        self.artist = Artist.objects.create(name='Test Artist')
+        self.album = Album.objects.create(title='Sample Album', artist=self.artist, release_year=2019)
+        self.counter = 0
+
+    def next_id(self):
+        self.counter += 1
+        return self.counter
+
+    def add_albums(self, count):
+        for _ in range(count):
+            artist = Artist.objects.create(name=f'Artist {self.next_id()}')
+            Album.objects.create(title=f'Album {self.counter}', artist=artist, release_year=2000 + self.counter)
+
+    def add_tracks(self, count):
+        for _ in range(count):
+            song = Song.objects.create(title=f'Song {self.next_id()}')
+            AlbumSong.objects.create(album=self.album, song=song)
+
+    def test_changelists(self):
+        """
+        Ensure the query count of the admin changelists does not grow with the number of rows.
+        """
+        for model, grow in (
+            ('artist', self.add_albums),
+            ('album', self.add_albums),
+            ('song', self.add_tracks),
+            ('albumsong', self.add_tracks),
+        ):
+            with self.subTest(model=model):
+                url = reverse(f'admin:musical_catalog_{model}_changelist')
+                self.assertQueriesDoNotScale(url, grow)
+                self.assertQueriesDoNotScale(f'{url}?q=1', grow)
+
+    def test_track_form(self):
+        """
+        Ensure the track form does not load every album and song into its widgets.
+        """
+        url = reverse('admin:musical_catalog_albumsong_add')
+        self.client.get(url)
+        self.assertQueriesDoNotScale(url, self.add_tracks)
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'musical_catalog', 'model_name': 'albumsong',
+            'field_name': 'song', 'term': 'Song',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_estimated_count(self):
+        """
+        Ensure large tables are counted from the planner estimate on PostgreSQL only.
+        """
+        self.add_tracks(3)
+        with mock.patch.object(EstimatedCountPaginator, 'exact_count_threshold', 0):
+            with CaptureQueriesContext(connection) as queries:
+                count = EstimatedCountPaginator(Song.objects.order_by('pk'), 100).count
+        counted = any('COUNT(' in query['sql'] for query in queries)
+        if connection.vendor == 'postgresql':
+            self.assertFalse(counted)
+            self.assertIsInstance(count, int)
+        else:
+            self.assertTrue(counted)
+            self.assertEqual(count, 3)
+        self.assertEqual(EstimatedCountPaginator(Song.objects.order_by('pk'), 100).count, 3)
+
+
+class SchemaTests(APITestCase):
+
+    def setUp(self):
+        get_schema.cache_clear()
+        self.addCleanup(get_schema.cache_clear)
+        self.url = reverse('schema-json', kwargs={'format': '.json'})
+
+    @skipUnless(connection.vendor == 'postgresql', 'The schema file is built against PostgreSQL.')
+    def test_served_schema_is_current(self):
+        """
+        Ensure the built schema file matches a live generation of the schema.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, settings.OPENAPI_SCHEMA_PATH.read_bytes())
+        self.assertEqual(json.loads(response.content), json.loads(generate_schema()),
+                         'Run manage.py build_schema to update the schema file.')
+
+    def test_schema_generated_once(self):
+        """
+        Ensure the schema is generated on the first request without a built file and served with an ETag.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(OPENAPI_SCHEMA_PATH=os.path.join(directory, 'openapi.json')):
+                with mock.patch('tune_treasure_drf.docs.generate_schema', wraps=generate_schema) as generate:
+                    response = self.client.get(self.url)
+                    self.assertEqual(self.client.get(self.url).content, response.content)
+                    yaml_response = self.client.get(reverse('schema-json', kwargs={'format': '.yaml'}))
+                    ui_response = self.client.get(reverse('schema-swagger-ui'), {'format': 'openapi'})
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(json.loads(response.content), json.loads(generate_schema()))
+        self.assertEqual(ui_response.content, response.content)
+        self.assertEqual(yaml_response['Content-Type'], 'application/yaml; charset=utf-8')
+        self.assertNotEqual(yaml_response['ETag'], response['ETag'])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_docs_pages(self):
+        """
+        Ensure the Swagger UI and ReDoc pages are rendered.
+        """
+        for name in ('schema-swagger-ui', 'schema-redoc'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=0)
+class ChangesTests(APITestCase):
+
+    def setUp(self):
+        self.url = reverse('api_v1:changes-list')
+        self.artist = Artist.objects.create(name='Artist')
+        self.album = Album.objects.create(title='Album', artist=self.artist, release_year=2000)
+        self.songs = [Song.objects.create(title=f'Song {number}') for number in range(3)]
+        append_tracks(self.album.pk, [song.pk for song in self.songs])
+        self.cursor = self.get()['cursor']
+
+    def get(self, since=0, **params):
+        response = self.client.get(self.url, {'since': since, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def ids(self, changes):
+        upserts = {name: [row['id'] for row in rows] for name, rows in changes['upserts'].items()}
+        return upserts, changes['deletes']
+
+    def test_full_sync(self):
+        """
+        Ensure a sync from the start returns the whole catalog.
+        """
+        changes = self.get()
+        self.assertFalse(changes['more'])
+        self.assertEqual(changes['upserts']['artists'], [
+            {'id': self.artist.pk, 'name': 'Artist', 'album_count': 1, 'song_count': 3},
+        ])
+        self.assertEqual(
+            [(track['song'], track['_track_number']) for track in changes['upserts']['album_songs']],
+            [(song.pk, number) for number, song in enumerate(self.songs, start=1)],
+        )
+        self.assertEqual(len(changes['upserts']['songs']), 3)
+
+    def test_only_changes_after_cursor(self):
+        """
+        Ensure only the rows changed after the cursor are returned.
+        """
+        self.assertEqual(self.ids(self.get(self.cursor)), (
+            {'artists': [], 'albums': [], 'songs': [], 'album_songs': []},
+            {'artists': [], 'albums': [], 'songs': [], 'album_songs': []},
+        ))
+        self.songs[0].title = 'Renamed'
+        self.songs[0].save()
+        changes = self.get(self.cursor)
+        self.assertEqual(changes['upserts']['songs'], [
+            {'id': self.songs[0].pk, 'title': 'Renamed', 'albums': [self.album.pk]},
+        ])
+        self.assertGreater(from_cursor(changes['cursor']), from_cursor(self.cursor))
+        self.assertEqual(self.get(changes['cursor'])['upserts']['songs'], [])
+
+    def test_deleted_and_renumbered_tracks(self):
+        """
+        Ensure deleted rows are reported and renumbered tracks show up as changes.
+        """
+        first, second, third = AlbumSong.objects.filter(album=self.album).order_by('_track_number')
+        deleted_pk = first.pk
+        first.delete()
+        upserts, deletes = self.ids(self.get(self.cursor))
+        self.assertEqual(deletes['album_songs'], [deleted_pk])
+        self.assertEqual(upserts['album_songs'], [second.pk, third.pk])
+        self.assertEqual(upserts['albums'], [self.album.pk])
+        self.assertEqual(upserts['artists'], [self.artist.pk])
+
+        cursor = self.get(self.cursor)['cursor']
+        replace_tracks(self.album.pk, [self.songs[2].pk, self.songs[1].pk])
+        changes = self.get(cursor)
+        self.assertEqual(
+            [(track['id'], track['_track_number']) for track in changes['upserts']['album_songs']],
+            [(second.pk, 2), (third.pk, 1)],
+        )
+
+        cursor = changes['cursor']
+        Artist.objects.filter(pk=self.artist.pk).delete()
+        upserts, deletes = self.ids(self.get(cursor))
+        self.assertEqual(deletes['artists'], [self.artist.pk])
+        self.assertEqual(deletes['albums'], [self.album.pk])
+        self.assertCountEqual(deletes['album_songs'], [second.pk, third.pk])
+        self.assertEqual(upserts['artists'], [])
+
+    def test_pages(self):
+        """
+        Ensure a sync in small pages returns every change once and stops.
+        """
+        seen, cursor, calls = [], 0, 0
+        while True:
+            changes = self.get(cursor, limit=2)
+            calls += 1
+            seen.extend((name, row['id']) for name, rows in changes['upserts'].items() for row in rows)
+            cursor = changes['cursor']
+            if not changes['more']:
+                break
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), 1 + 1 + 3 + 3)
+        self.assertGreater(calls, 1)
+
+    def test_pages_of_rows_sharing_a_time(self):
+        """
+        Ensure rows written at the same time are split into pages of exactly the limit.
+        """
+        Song.objects.bulk_create(Song(title=f'Bulk {number}') for number in range(7))
+        # Like the backfill of the timestamps: the whole catalog at one time.
+        moment = timezone.now() - timedelta(seconds=1)
+        for model in (Artist, Album, Song, AlbumSong):
+            model.objects.update(updated_at=moment)
+        seen, cursor, pages = [], 0, []
+        while True:
+            changes = self.get(cursor, limit=2)
+            pages.append(sum(len(rows) for rows in changes['upserts'].values()))
+            seen.extend((name, row['id']) for name, rows in changes['upserts'].items() for row in rows)
+            cursor = changes['cursor']
+            if not changes['more']:
+                break
+        self.assertEqual(len(seen), 1 + 1 + 10 + 3)
+        self.assertEqual(len(set(seen)), len(seen))
+        self.assertEqual(pages, [2] * 7 + [1])
+
+    def test_cost_independent_of_catalog_size(self):
+        """
+        Ensure the query count of a sync does not depend on the catalog size.
+        """
+        generate_catalog(artists=5, albums_per_artist=2, tracks_per_album=5)
+        cursor = self.get()['cursor']
+        self.songs[0].save()
+        with CaptureQueriesContext(connection) as queries:
+            changes = self.get(cursor)
+        self.assertEqual(self.ids(changes)[0]['songs'], [self.songs[0].pk])
+        # The oldest open transaction on PostgreSQL, the keys of the four models
+        # and of the tombstones, then the changed song and its albums; the
+        # sources without changes are not queried.
+        horizon = 1 if connection.vendor == 'postgresql' else 0
+        self.assertEqual(len(queries), horizon + 5 + 1 + 1)
+
+    @override_settings(CHANGES_SETTLE_SECONDS=60)
+    def test_recent_changes_held_back(self):
+        """
+        Ensure changes younger than the settle delay are left for a later sync.
+        """
+        changes = self.get()
+        self.assertEqual(self.ids(changes)[0]['artists'], [])
+        self.assertLess(from_cursor(changes['cursor']), from_cursor(self.cursor))
+
+    def test_invalid_cursor(self):
+        """
+        Ensure a malformed cursor is rejected.
+        """
+        response = self.client.get(self.url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs pg_stat_activity.')
+@override_settings(CHANGES_SETTLE_SECONDS=1)
+class ChangesTransactionTests(TransactionTestCase):
+    """
+    The writer must hold its transaction open on another connection while
+    the client syncs, so these tests run with real commits.
+    """
+
+    def test_sync_during_open_transaction(self):
+        """
+        Ensure the cursor stays before a transaction still open, whose rows come with a later sync.
+        """
+        url = reverse('api_v1:changes-list')
+        written, release = threading.Event(), threading.Event()
+
+        def write():
+            try:
+                with transaction.atomic():
+                    Artist.objects.create(name='Slow')
+                    written.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            self.assertTrue(written.wait(10))
+            Artist.objects.create(name='Fast')
+            # Both rows are now older than the settle delay.
+            time.sleep(1.2)
+            changes = self.client.get(url, {'since': 0}).data
+        finally:
+            release.set()
+            writer.join()
+        self.assertEqual(changes['upserts']['artists'], [])
+
+        changes = self.client.get(url, {'since': changes['cursor']}).data
+        self.assertEqual([artist['name'] for artist in changes['upserts']['artists']], ['Slow', 'Fast'])
+
+
+class SongRelationTests(APITestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='Artist')
+        self.songs = [Song.objects.create(title=f'Song {number}') for number in range(5)]
+        self.first = self.create_album('First', [0, 1, 2])
+        self.second = self.create_album('Second', [0, 1])
+        self.compilation = self.create_album('Compilation', [0, 3, 4])
+
+    def create_album(self, title, songs):
+        album = Album.objects.create(title=title, artist=self.artist, release_year=2000)
+        append_tracks(album.pk, [self.songs[number].pk for number in songs])
+        return album
+
+    def relations(self):
+        return {
+            (song_id, related_id): shared
+            for song_id, related_id, shared in SongRelation.objects.values_list(
+                'song_id', 'related_id', 'shared_albums'
+            )
+        }
+
+    def assertRelationsCurrent(self):
+        maintained = self.relations()
+        build_song_relations(chunk_size=2)
+        self.assertEqual(maintained, self.relations())
+
+    def test_relations_follow_tracks(self):
+        """
+        Ensure the co-occurrence counts stay equal to a rebuild through every kind of track write.
+        """
+        zero, one, two, three, four = (song.pk for song in self.songs)
+        self.assertEqual(self.relations()[zero, one], 2)
+        self.assertEqual(self.relations()[one, zero], 2)
+        self.assertNotIn((one, three), self.relations())
+        self.assertRelationsCurrent()
+
+        AlbumSong.objects.get(album=self.second, song_id=one).delete()
+        self.assertEqual(self.relations()[zero, one], 1)
+        self.assertRelationsCurrent()
+
+        AlbumSong.objects.filter(album=self.first, song_id__in=[zero, two]).delete()
+        self.assertNotIn((zero, one), self.relations())
+        self.assertRelationsCurrent()
+
+        replace_tracks(self.first.pk, [three, one, four])
+        self.assertRelationsCurrent()
+
+        track = AlbumSong.objects.get(album=self.compilation, song_id=zero)
+        track.song = self.songs[2]
+        track.save()
+        self.assertRelationsCurrent()
+
+        self.songs[3].delete()
+        self.assertRelationsCurrent()
+
+        self.compilation.delete()
+        self.assertRelationsCurrent()
+
+        self.artist.delete()
+        self.assertEqual(self.relations(), {})
+
+    def test_song_changed_in_place(self):
+        """
+        Ensure changing the song of a track leaves the pairs of the new song with the album alone.
+        """
+        x, y = Song.objects.create(title='X'), Song.objects.create(title='Y')
+        for title, songs in (('Both', [x.pk, y.pk]), ('Only X', [x.pk])):
+            album = Album.objects.create(title=title, artist=self.artist, release_year=2000)
+            append_tracks(album.pk, songs)
+        track = AlbumSong.objects.get(album=album)
+        response = self.client.put(
+            reverse('api_v1:album-songs-detail', args=[track.pk]),
+            {'album': album.pk, 'song': y.pk},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.relations()[x.pk, y.pk], 1)
+        self.assertEqual(self.relations()[y.pk, x.pk], 1)
+        self.assertRelationsCurrent()
+
+    def test_bulk_loads_maintain_relations(self):
+        """
+        Ensure the synthetic catalog loader keeps the relations current.
+        """
+        generate_catalog(artists=3, albums_per_artist=3, tracks_per_album=6, shared_songs=0.5)
+        self.assertRelationsCurrent()
+
+    def test_related_songs(self):
+        """
+        Ensure the related songs are ordered by shared albums and read in two queries.
+        """
+        url = reverse('api_v1:songs-related', kwargs={'pk': self.songs[0].pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'id': self.songs[1].pk, 'title': 'Song 1', 'shared_albums': 2},
+            {'id': self.songs[2].pk, 'title': 'Song 2', 'shared_albums': 1},
+            {'id': self.songs[3].pk, 'title': 'Song 3', 'shared_albums': 1},
+            {'id': self.songs[4].pk, 'title': 'Song 4', 'shared_albums': 1},
+        ])
+        response = self.client.get(url, {'limit': 1})
+        self.assertEqual([song['id'] for song in response.data], [self.songs[1].pk])
+
+        response = self.client.get(reverse('api_v1:songs-related', kwargs={'pk': 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_build_command(self):
+        """
+        Ensure the build command rewrites a damaged table.
+        """
+        expected = self.relations()
+        SongRelation.objects.filter(song=self.songs[0]).update(shared_albums=7)
+        SongRelation.objects.filter(song=self.songs[1]).delete()
+        out = io.StringIO()
+        call_command('build_song_relations', stdout=out)
+        self.assertEqual(self.relations(), expected)
+        self.assertIn(f'Wrote {len(expected)} song relations.', out.getvalue())
+
+
+class JobTests(APITestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='Artist')
+        self.album = Album.objects.create(title='Album', artist=self.artist, release_year=2000)
+        self.songs = [Song.objects.create(title=f'Song {number}').pk for number in range(3)]
+        append_tracks(self.album.pk, self.songs)
+
+    def test_async_album_delete(self):
+        """
+        Ensure an album deletion preferring respond-async is enqueued and done by the worker.
+        """
+        url = reverse('api_v1:albums-detail', kwargs={'pk': self.album.pk})
+        response = self.client.delete(url, HTTP_PREFER='respond-async, wait=10')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Job.QUEUED)
+        self.assertTrue(Album.objects.filter(pk=self.album.pk).exists())
+
+        self.assertEqual(work(burst=True), 1)
+        self.assertFalse(Album.objects.filter(pk=self.album.pk).exists())
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.data['status'], Job.SUCCEEDED)
+        self.assertEqual(response.data['result'], {'deleted': True})
+        self.assertEqual(Artist.objects.get().song_count, 0)
+
+    def test_async_tracklist_replace(self):
+        """
+        Ensure a tracklist replacement preferring respond-async is validated, then enqueued.
+        """
+        url = reverse('api_v1:albums-tracks', kwargs={'pk': self.album.pk})
+        response = self.client.put(url, {'songs': [0]}, format='json', HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+        songs = self.songs[::-1]
+        response = self.client.put(url, {'songs': songs}, format='json', HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response['Preference-Applied'], 'respond-async')
+        work(burst=True)
+        tracks = AlbumSong.objects.filter(album=self.album).order_by('_track_number')
+        self.assertEqual(list(tracks.values_list('song_id', flat=True)), songs)
+
+    def test_jobs_of_an_album_run_one_at_a_time(self):
+        """
+        Ensure a job waits for the older unfinished jobs of its key, and only for them.
+        """
+        first = enqueue('replace_tracks', {'album_id': self.album.pk, 'songs': self.songs[::-1]}, 'album:1')
+        second = enqueue('delete_album', {'album_id': self.album.pk}, 'album:1')
+        other = enqueue('repair_counters', key='counters')
+        self.assertEqual(claim_job().pk, first.pk)
+        self.assertEqual(claim_job().pk, other.pk)
+        self.assertIsNone(claim_job())
+        run_job(Job.objects.get(pk=first.pk))
+        self.assertEqual(claim_job().pk, second.pk)
+        with self.assertRaises(ValueError):
+            enqueue('unknown')
+
+    @override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_DELAY_SECONDS=60)
+    def test_failed_job_is_retried(self):
+        """
+        Ensure a failed job is retried later, and fails after its last attempt.
+        """
+        job = enqueue('replace_tracks', {'album_id': 0, 'songs': self.songs})
+        run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('Album 0 does not exist.', job.error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(claim_job())
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(work(burst=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(JOB_TIMEOUT_SECONDS=60)
+    def test_abandoned_job_is_requeued(self):
+        """
+        Ensure a job whose worker stopped signalling runs again, and a long job that signals does not.
+        """
+        job = enqueue('repair_counters')
+        claim_job()
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+        requeue_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=2))
+        requeue_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        out = io.StringIO()
+        call_command('run_worker', '--burst', stdout=out)
+        self.assertIn('Ran 1 jobs.', out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), (Job.SUCCEEDED, 2, {'repaired': 0}))
+
+    def test_superseded_run_is_discarded(self):
+        """
+        Ensure a run whose job was requeued and claimed again neither commits nor records anything.
+        """
+        enqueue('delete_album', {'album_id': self.album.pk})
+        stale = claim_job()
+        Job.objects.filter(pk=stale.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        requeue_stale_jobs()
+        self.assertEqual(claim_job().attempts, 2)
+
+        job = run_job(stale)
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 2))
+        self.assertTrue(Album.objects.filter(pk=self.album.pk).exists())
+
+        failing = enqueue('replace_tracks', {'album_id': 0, 'songs': self.songs})
+        stale = claim_job()
+        Job.objects.filter(pk=failing.pk).update(status=Job.SUCCEEDED)
+        self.assertEqual(run_job(stale).status, Job.SUCCEEDED)
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.error), (Job.SUCCEEDED, ''))
+
+    def test_enqueue_rebuilds(self):
+        """
+        Ensure the rebuild commands can leave their work to the worker.
+        """
+        call_command('check_counters', '--repair', '--enqueue', stdout=io.StringIO())
+        call_command('build_song_relations', '--enqueue', stdout=io.StringIO())
+        self.assertEqual(list(Job.objects.values_list('kind', flat=True).order_by('pk')),
+                         ['repair_counters', 'build_song_relations'])
+        self.assertEqual(work(burst=True), 2)
+        self.assertEqual(Job.objects.get(kind='build_song_relations').result, {'written': 6})
+
+    def test_unknown_job(self):
+        """
+        Ensure the status of an unknown job is a 404.
+        """
+        response = self.client.get(reverse('api_v1:jobs-detail', kwargs={'pk': 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class JobHeartbeatTests(TransactionTestCase):
+    """
+    The heartbeat is written from another connection, so these tests run
+    with real commits.
+    """
+
+    @override_settings(JOB_HEARTBEAT_SECONDS=0.05)
+    def test_heartbeat_while_running(self):
+        """
+        Ensure the heartbeat of a job is refreshed while its handler runs.
+        """
+        def wait(using):
+            time.sleep(0.5)
+            return {}
+
+        with mock.patch.dict(HANDLERS, {'wait': wait}):
+            enqueue('wait')
+            job = run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertGreater(job.heartbeat_at, job.started_at)
+
+
+class StatsTests(APITestCase):
+
+    def setUp(self):
+        self.artists = [Artist.objects.create(name=f'Artist {number}') for number in range(3)]
+        songs = [Song.objects.create(title=f'Song {number}').pk for number in range(4)]
+        for title, artist, year, tracks in (
+            ('First', 0, 2001, 4), ('Second', 0, 2002, 2), ('Third', 1, 2002, 2), ('Empty', 2, 2003, 0),
+        ):
+            album = Album.objects.create(title=title, artist=self.artists[artist], release_year=year)
+            if tracks:
+                append_tracks(album.pk, songs[:tracks])
+
+    def test_stats(self):
+        """
+        Ensure every statistic is computed with one aggregate query.
+        """
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('api_v1:stats-list'), {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['albums_per_year'], [
+            {'release_year': 2001, 'albums': 1},
+            {'release_year': 2002, 'albums': 2},
+            {'release_year': 2003, 'albums': 1},
+        ])
+        self.assertEqual(response.data['tracks_per_album'], [
+            {'tracks': 0, 'albums': 1},
+            {'tracks': 2, 'albums': 2},
+            {'tracks': 4, 'albums': 1},
+        ])
+        self.assertEqual(
+            [(artist['id'], artist['song_count']) for artist in response.data['top_artists']],
+            [(self.artists[0].pk, 6), (self.artists[1].pk, 2)],
+        )
+
+    def test_single_statistic(self):
+        """
+        Ensure a statistic endpoint computes and returns only its statistic.
+        """
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_v1:stats-top-artists'), {'limit': 1})
+        self.assertEqual(set(response.data), {'computed_at', 'top_artists'})
+        self.assertEqual(len(response.data['top_artists']), 1)
+        response = self.client.get(reverse('api_v1:stats-albums-per-year'))
+        self.assertEqual(set(response.data), {'computed_at', 'albums_per_year'})
+        response = self.client.get(reverse('api_v1:stats-top-artists'), {'limit': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(STATS_FROM_SNAPSHOT=True)
+    def test_snapshot(self):
+        """
+        Ensure the statistics are read from the latest snapshot in one query once it is built.
+        """
+        url = reverse('api_v1:stats-list')
+        live = self.client.get(url).data
+        call_command('build_stats_snapshot', stdout=io.StringIO())
+        build_snapshot()
+        self.assertEqual(StatsSnapshot.objects.count(), 1)
+        Album.objects.create(title='Later', artist=self.artists[2], release_year=2004)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['albums_per_year'], live['albums_per_year'])
+        self.assertEqual(response.data['top_artists'], live['top_artists'])
+        self.assertEqual(
+            response.data['computed_at'],
+            StatsSnapshot.objects.get().computed_at.isoformat().replace('+00:00', 'Z'),
+        )
+
+    def test_stats_benchmark(self):
+        """
+        Ensure the stats benchmark finds the same statistics client-side and server-side.
+        """
+        results = run_stats_benchmark(requests=1, page_size=2)['results']
+        self.assertEqual(results['live']['requests'], 1)
+        self.assertEqual(results['snapshot']['queries'], 1)
+        self.assertGreater(results['client']['requests'], 3)
+
+
+class StatsCacheTests(TransactionTestCase):
+    """
+    The response cache is bypassed inside transactions, so these tests run
+    with real commits.
+    """
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.artist = Artist.objects.create(name='Artist')
+
+    def test_cached_stats_are_invalidated(self):
+        """
+        Ensure cached statistics are served until a write they depend on, and expire.
+        """
+        url = reverse('api_v1:stats-albums-per-year')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        album = Album.objects.create(title='Album', artist=self.artist, release_year=2000)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['albums_per_year'], [{'release_year': 2000, 'albums': 1}])
+
+        url = reverse('api_v1:stats-top-artists')
+        self.client.get(url)
+        append_tracks(album.pk, [Song.objects.create(title='Song').pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['top_artists'][0]['song_count'], 1)
+
+        url = reverse('api_v1:stats-tracks-per-album')
+        with override_settings(STATS_CACHE_TIMEOUT=0):
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
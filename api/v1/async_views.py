@@ -0,0 +1,126 @@
+"""
+Async read-only endpoints of the catalog for ASGI deployments.
+
+They return the same JSON as the GET endpoints of the viewsets, support the
+same filters and keyset pagination, and fetch rows with the async ORM
+(``aget``, ``aiterator``), so under ASGI a request does not hold a worker
+thread while it is serialized and rendered. Writes stay on the viewsets.
+The responses are not cached.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from musical_catalog.models import Album, AlbumSong, Artist, Song
+
+from .filters import QueryParamFilterBackend
+from .pagination import AlbumSongKeysetPagination, KeysetPagination
+from .serializers import (AlbumFilterSerializer, AlbumSerializer,
+                          AlbumSongFilterSerializer, AlbumSongSerializer,
+                          ArtistSerializer, SongSerializer, TrackSerializer)
+from .views import tracklist_queryset
+
+
+class AsyncReadView(View):
+    """
+    Serves the list of ``model`` at the collection URL and one object when the
+    URL has a ``pk``. Subclasses set the same attributes as the viewsets.
+    """
+    http_method_names = ['get']
+    model = None
+    serializer_class = None
+    pagination_class = None
+    filter_serializer_class = None
+    chunk_size = 2000
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    async def get(self, request, pk=None):
+        request = Request(request)
+        try:
+            if pk is None:
+                data = await self.list(request)
+            else:
+                data = await self.retrieve(request, pk)
+        except APIException as exc:
+            response = exception_handler(exc, {'request': request, 'view': self})
+            return self.render(response.data, response.status_code)
+        return self.render(data)
+
+    async def list(self, request):
+        queryset = QueryParamFilterBackend().filter_queryset(request, self.get_queryset(), self)
+        paginator = self.pagination_class() if self.pagination_class else None
+        page = await paginator.apaginate_queryset(queryset, request) if paginator else None
+        if page is None:
+            return await self.serialize(
+                [instance async for instance in queryset.aiterator(chunk_size=self.chunk_size)]
+            )
+        return paginator.get_paginated_response(await self.serialize(page)).data
+
+    async def retrieve(self, request, pk):
+        try:
+            instance = await self.get_queryset().aget(pk=pk)
+        except self.model.DoesNotExist:
+            raise NotFound()
+        return (await self.serialize([instance]))[0]
+
+    async def serialize(self, instances):
+        return self.serializer_class(instances, many=True).data
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            JSONRenderer().render(data), status=status, content_type='application/json'
+        )
+
+
+class AsyncArtistView(AsyncReadView):
+    model = Artist
+    serializer_class = ArtistSerializer
+    pagination_class = KeysetPagination
+
+
+class AsyncAlbumView(AsyncReadView):
+    model = Album
+    serializer_class = AlbumSerializer
+    pagination_class = KeysetPagination
+    filter_serializer_class = AlbumFilterSerializer
+
+
+class AsyncSongView(AsyncReadView):
+    model = Song
+    serializer_class = SongSerializer
+    pagination_class = KeysetPagination
+
+    async def serialize(self, instances):
+        # aiterator() does not run prefetches, the album ids are fetched for
+        # the whole page in one query instead.
+        await sync_to_async(prefetch_related_objects)(
+            instances, Prefetch('albums', queryset=Album.objects.only('id'))
+        )
+        return await super().serialize(instances)
+
+
+class AsyncAlbumSongView(AsyncReadView):
+    model = AlbumSong
+    serializer_class = AlbumSongSerializer
+    pagination_class = AlbumSongKeysetPagination
+    filter_serializer_class = AlbumSongFilterSerializer
+
+
+class AsyncTracklistView(AsyncReadView):
+    """The ordered tracklist of an album with song titles, in two queries."""
+    serializer_class = TrackSerializer
+
+    async def get(self, request, pk):
+        if not await Album.objects.filter(pk=pk).aexists():
+            return self.render({'detail': NotFound.default_detail}, NotFound.status_code)
+        tracks = tracklist_queryset().filter(album_id=pk)
+        return self.render(await self.serialize(
+            [track async for track in tracks.aiterator(chunk_size=self.chunk_size)]
+        ))
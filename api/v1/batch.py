@@ -0,0 +1,109 @@
+"""
+Several calls to the catalog API in one HTTP request and one transaction.
+
+A batch is an ordered list of operations, each with a method, the path of a
+route of ``api/v1/urls.py`` and an optional JSON body. An operation can be
+named with ``ref``; a later operation refers to a field of its response with
+``$<ref>.<field>``, either as a whole JSON string value of its body or inside
+its path, typically to use the id of an object created earlier in the batch.
+
+The operations are dispatched to the viewsets one after the other, inside a
+single transaction on the primary database. The first operation that fails
+rolls the whole batch back, so the catalog is never left half-written.
+"""
+import json
+import re
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+
+from tune_treasure_drf.db_router import pin_primary
+
+REFERENCE = re.compile(r'\$([\w-]+)\.(\w+)')
+
+
+class BatchError(Exception):
+    """An operation that cannot be dispatched."""
+
+
+def lookup(match, refs):
+    ref, field = match.groups()
+    if ref not in refs:
+        raise BatchError(f'Unknown reference "{ref}".')
+    data = refs[ref]
+    if not isinstance(data, dict) or field not in data:
+        raise BatchError(f'The response of "{ref}" has no field "{field}".')
+    return data[field]
+
+
+def substitute(value, refs):
+    """Replaces the ``$<ref>.<field>`` strings of a JSON body by the values they refer to."""
+    if isinstance(value, str):
+        match = REFERENCE.fullmatch(value)
+        return lookup(match, refs) if match else value
+    if isinstance(value, list):
+        return [substitute(item, refs) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute(item, refs) for key, item in value.items()}
+    return value
+
+
+def make_request(request, method, path, body):
+    """A JSON request to ``path`` with the headers and user of the batch request."""
+    url = urlsplit(path)
+    content = b'' if body is None else json.dumps(body).encode()
+    inner = WSGIRequest({
+        **request.META,
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': BytesIO(content),
+    })
+    if hasattr(request, 'user'):
+        inner.user = request.user
+    return inner
+
+
+def run_operation(request, operation, refs):
+    """Dispatches one operation and returns the status and data of its response."""
+    path = REFERENCE.sub(lambda match: str(lookup(match, refs)), operation['path'])
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        raise BatchError(f'No route matches "{path}".')
+    view_class = getattr(match.func, 'cls', None)
+    if match.namespace != 'api_v1' or view_class is None or not getattr(view_class, 'batchable', True):
+        raise BatchError(f'"{path}" cannot be used in a batch.')
+    body = substitute(operation.get('body'), refs)
+    inner = make_request(request, operation['method'], path, body)
+    inner.resolver_match = match
+    response = match.func(inner, *match.args, **match.kwargs)
+    return response.status_code, getattr(response, 'data', None)
+
+
+def run_batch(request, operations):
+    """
+    Runs the validated ``operations`` of a batch request in one transaction.
+    Returns the ``{'status', 'data'}`` result of every operation run and the
+    index of the failed one, None when all of them succeeded.
+    """
+    results, refs = [], {}
+    with pin_primary(), transaction.atomic():
+        for index, operation in enumerate(operations):
+            try:
+                status, data = run_operation(request._request, operation, refs)
+            except BatchError as error:
+                status, data = 400, {'detail': str(error)}
+            results.append({'status': status, 'data': data})
+            if status >= 400:
+                transaction.set_rollback(True)
+                return results, index
+            if 'ref' in operation:
+                refs[operation['ref']] = data
+    return results, None
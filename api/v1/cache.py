@@ -0,0 +1,283 @@
+"""
+Response cache for the catalog read endpoints.
+
+Every cacheable response depends on a few tags such as ``artists``, ``album:3``
+or ``tracklist:3``. Each tag has a version token stored in the cache. A cached
+response remembers the tag versions it was built from and is only served while
+all of them are still current. Model signals replace the tokens of the tags a
+write touches, which invalidates exactly the responses built from that data.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from api.middleware import render_response
+from musical_catalog.models import (Album, AlbumSong, Artist, Song,
+                                    StatsSnapshot, deletes_whole_album)
+from musical_catalog.signals import catalog_loaded, tracklist_changed
+from tune_treasure_drf.db_router import replicas_in_use
+
+STATS = ('hits', 'misses', 'not_modified')
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def get_tag_versions(tags):
+    """
+    Returns the current version token of each tag. Tags that have no version
+    yet (or whose version was evicted) get a fresh random one, so an evicted
+    tag can never bring back a version an old response was built from.
+    """
+    cache = get_cache()
+    keys = {f'catalog:tag:{tag}': tag for tag in tags}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def invalidate(*tags):
+    get_cache().set_many({f'catalog:tag:{tag}': uuid.uuid4().hex for tag in tags}, timeout=None)
+
+
+def invalidate_on_commit(tags, using):
+    """
+    Invalidates the tags now and, when called inside a transaction, once more
+    after it commits: a response built by another connection from the
+    pre-commit data in between would otherwise be stored under the new versions.
+    """
+    tags = list(tags)
+    invalidate(*tags)
+    if connections[using].in_atomic_block:
+        transaction.on_commit(lambda: invalidate(*tags), using=using)
+
+
+def record(event):
+    cache = get_cache()
+    key = f'catalog:stats:{event}'
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.set(key, 1, timeout=None)
+
+
+def get_stats():
+    values = get_cache().get_many([f'catalog:stats:{event}' for event in STATS])
+    return {event: values.get(f'catalog:stats:{event}', 0) for event in STATS}
+
+
+def reset_stats():
+    get_cache().delete_many([f'catalog:stats:{event}' for event in STATS])
+
+
+class CachedResponseMixin:
+    """
+    Serves the GET responses of the actions listed in ``cache_tags`` from the
+    response cache, with strong ETags and conditional GET support.
+
+    ``cache_tags`` maps an action name to the tag templates its responses depend
+    on, formatted with the URL kwargs (``{'retrieve': ('artist:{pk}',)}``). A
+    request whose If-None-Match matches a current response gets a 304 straight
+    from the cache, without touching the database. Only JSON responses are
+    cached, and reads made inside a transaction (ATOMIC_REQUESTS, tests) bypass
+    the cache since they may see uncommitted data. Every response also depends
+    on the ``catalog`` tag, which bulk loads invalidate as a whole.
+    """
+    cache_tags = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        action = self.action_map.get(request.method.lower())
+        templates = self.cache_tags.get(action) if request.method == 'GET' else None
+        if not templates or not self.is_cacheable(request, kwargs):
+            return super().dispatch(request, *args, **kwargs)
+
+        cache = get_cache()
+        tags = ['catalog'] + [template.format(**kwargs) for template in templates]
+        accept = request.META.get('HTTP_ACCEPT', '')
+        key = 'catalog:response:' + hashlib.sha1(
+            f'{request.get_full_path()}|{accept}'.encode()
+        ).hexdigest()
+        client_etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+        entry = cache.get(key)
+        if entry is not None and get_tag_versions(entry['versions']) == entry['versions']:
+            if entry['etag'] in client_etags or '*' in client_etags:
+                record('not_modified')
+                return self.not_modified(entry['etag'])
+            record('hits')
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            for header, value in entry['headers'].items():
+                response[header] = value
+            response['ETag'] = entry['etag']
+            response['X-Cache'] = 'HIT'
+            return response
+
+        # Versions are read before the data so that a write committed while the
+        # response is being built leaves it stored under outdated versions.
+        versions = get_tag_versions(tags)
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        render_response(response)
+        etag = '"%s"' % hashlib.md5(response.content).hexdigest()
+        cache.set(key, {
+            'versions': versions,
+            'etag': etag,
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'headers': {header: response[header] for header in ('Allow', 'Vary') if header in response},
+        }, timeout=self.get_cache_timeout())
+        record('misses')
+        if etag in client_etags:
+            return self.not_modified(etag)
+        response['ETag'] = etag
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def get_cache_timeout(self):
+        if replicas_in_use():
+            # Built from a replica that may not have the latest invalidated
+            # writes yet, so it must not outlive the replication lag.
+            return min(settings.RESPONSE_CACHE_TIMEOUT, settings.REPLICA_STICKY_SECONDS)
+        return settings.RESPONSE_CACHE_TIMEOUT
+
+    def is_cacheable(self, request, kwargs):
+        renderer_format = request.GET.get('format') or kwargs.get('format')
+        if renderer_format not in (None, 'json'):
+            return False
+        if renderer_format is None and 'text/html' in request.META.get('HTTP_ACCEPT', ''):
+            return False
+        return not any(
+            connection.in_atomic_block for connection in connections.all(initialized_only=True)
+        )
+
+    def not_modified(self, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
+def artist_of(album_id, using):
+    return Album.objects.using(using).filter(pk=album_id).values_list('artist_id', flat=True).first()
+
+
+def track_tags(album_id, artist_id, song_ids=()):
+    # Track writes also change the track_count of the album and the
+    # song_count of its artist.
+    tags = ['album-songs', f'tracklist:{album_id}', 'albums', f'album:{album_id}', 'artists']
+    if artist_id is not None:
+        tags.extend([f'discography:{artist_id}', f'artist:{artist_id}'])
+    if song_ids:
+        tags.append('songs')
+        tags.extend(f'song:{song_id}' for song_id in song_ids)
+    return tags
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_delete, sender=Artist)
+def invalidate_artist(sender, instance, using, **kwargs):
+    invalidate_on_commit(['artists', f'artist:{instance.pk}', f'discography:{instance.pk}'], using)
+
+
+@receiver(pre_save, sender=Album)
+def invalidate_previous_artist(sender, instance, raw, using, **kwargs):
+    """An album moved to another artist leaves the old discography and counters outdated."""
+    if instance.pk is None or raw:
+        return
+    artist_id = artist_of(instance.pk, using)
+    if artist_id is not None and artist_id != instance.artist_id:
+        invalidate_on_commit([f'discography:{artist_id}', f'artist:{artist_id}'], using)
+
+
+@receiver(post_save, sender=Album)
+@receiver(post_delete, sender=Album)
+def invalidate_album(sender, instance, using, **kwargs):
+    invalidate_on_commit([
+        'albums', f'album:{instance.pk}', f'tracklist:{instance.pk}',
+        f'discography:{instance.artist_id}',
+        # The album_count and song_count of the artist.
+        'artists', f'artist:{instance.artist_id}',
+    ], using)
+
+
+@receiver(post_save, sender=Song)
+def invalidate_song(sender, instance, created, using, **kwargs):
+    tags = ['songs', f'song:{instance.pk}']
+    if not created:
+        # The title is shown in the tracklists of every album the song is on.
+        for album_id, artist_id in AlbumSong.objects.using(using).filter(
+            song_id=instance.pk
+        ).values_list('album_id', 'album__artist_id'):
+            tags.extend(track_tags(album_id, artist_id))
+    invalidate_on_commit(tags, using)
+
+
+@receiver(post_delete, sender=Song)
+def invalidate_deleted_song(sender, instance, using, **kwargs):
+    # Its tracks are deleted first and invalidate the tracklists themselves.
+    invalidate_on_commit(['songs', f'song:{instance.pk}'], using)
+
+
+@receiver(pre_save, sender=AlbumSong)
+def invalidate_previous_track(sender, instance, raw, using, **kwargs):
+    """A track moved to another album or song leaves the old ones outdated."""
+    if instance.pk is None or raw:
+        return
+    previous = AlbumSong.objects.using(using).filter(pk=instance.pk).values_list(
+        'album_id', 'album__artist_id', 'song_id'
+    ).first()
+    if previous is None:
+        return
+    album_id, artist_id, song_id = previous
+    if (album_id, song_id) != (instance.album_id, instance.song_id):
+        invalidate_on_commit(track_tags(album_id, artist_id, [song_id]), using)
+
+
+@receiver(post_save, sender=AlbumSong)
+def invalidate_saved_track(sender, instance, using, **kwargs):
+    if AlbumSong.album.is_cached(instance):
+        artist_id = instance.album.artist_id
+    else:
+        artist_id = artist_of(instance.album_id, using)
+    invalidate_on_commit(track_tags(instance.album_id, artist_id, [instance.song_id]), using)
+
+
+@receiver(post_delete, sender=AlbumSong)
+def invalidate_deleted_track(sender, instance, using, origin=None, **kwargs):
+    if origin is not None and deletes_whole_album(origin):
+        # The album's own post_delete invalidates its tracklist and discography.
+        artist_id = None
+    else:
+        artist_id = artist_of(instance.album_id, using)
+    invalidate_on_commit(track_tags(instance.album_id, artist_id, [instance.song_id]), using)
+
+
+@receiver(post_save, sender=StatsSnapshot)
+def invalidate_stats(sender, using, **kwargs):
+    invalidate_on_commit(['stats'], using)
+
+
+@receiver(tracklist_changed)
+def invalidate_tracklist(sender, album_id, song_ids, using, **kwargs):
+    invalidate_on_commit(track_tags(album_id, artist_of(album_id, using), song_ids), using)
+
+
+@receiver(catalog_loaded)
+def invalidate_catalog(sender, using, **kwargs):
+    invalidate_on_commit(['catalog'], using)
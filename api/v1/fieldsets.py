@@ -0,0 +1,123 @@
+"""
+Sparse fieldsets for the read actions of the catalog viewsets.
+
+``?fields=id,title`` keeps only the listed serializer fields and
+``?omit=albums`` drops the listed ones. SparseFieldsetMixin trims the
+serializer, SparseFieldsetFilterBackend narrows the query to the columns of
+the remaining fields, so a client that asks for less also makes the
+database read less. A many-to-many field that is left out is not prefetched.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+SPARSE_ACTIONS = ('list', 'retrieve')
+
+
+class SparseFieldsetMixin:
+    """
+    Reads ``fields`` and ``omit`` on the list and retrieve actions and trims
+    the serializer to the requested fields. Unknown field names, and
+    fieldsets that leave no field, are rejected with a 400 response.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    def get_sparse_fields(self):
+        """The names of the serializer fields to render, or None for all of them."""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self.parse_sparse_fields()
+        return self._sparse_fields
+
+    def parse_sparse_fields(self):
+        if self.request is None:
+            # Schema generation without a request, see build_schema.
+            return None
+        params = self.request.query_params
+        if self.action not in SPARSE_ACTIONS or not (
+            self.fields_query_param in params or self.omit_query_param in params
+        ):
+            return None
+        available = list(self.get_serializer_class()().fields)
+        fields = available
+        for param in (self.fields_query_param, self.omit_query_param):
+            if param not in params:
+                continue
+            names = [name.strip() for name in params[param].split(',') if name.strip()]
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                raise ValidationError({param: [f'Unknown field "{unknown[0]}".']})
+            if param == self.fields_query_param:
+                fields = [name for name in fields if name in names]
+            else:
+                fields = [name for name in fields if name not in names]
+            if not fields:
+                raise ValidationError({param: ['At least one field must be returned.']})
+        return tuple(fields)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in fields:
+                    target.fields.pop(name)
+        return serializer
+
+    def get_values_fields(self):
+        # The values() fast path of ValuesListMixin reads the same fields.
+        fields = self.get_sparse_fields()
+        lookups = super().get_values_fields()
+        if fields is None:
+            return lookups
+        return tuple(name for name in lookups if name in fields)
+
+
+class SparseFieldsetFilterBackend(BaseFilterBackend):
+    """
+    Loads only the columns of the fields requested from a SparseFieldsetMixin
+    view, plus the primary key and the pagination ordering. The queryset is
+    left alone when a field is not backed by a model field.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        fields = view.get_sparse_fields()
+        if fields is None:
+            return queryset
+        serializer_fields = view.get_serializer_class()().fields
+        columns = {queryset.model._meta.pk.name, *getattr(view.paginator, 'ordering', ())}
+        many = False
+        for name in fields:
+            source = serializer_fields[name].source
+            try:
+                field = queryset.model._meta.get_field(source)
+            except FieldDoesNotExist:
+                return queryset
+            if field.many_to_many or field.one_to_many:
+                many = True
+            else:
+                columns.add(source)
+        queryset = queryset.only(*columns)
+        if not many:
+            # The prefetches only serve the many-to-many fields.
+            queryset = queryset.prefetch_related(None)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': view.fields_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Comma-separated fields to return.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': view.omit_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Comma-separated fields to leave out.',
+                'schema': {'type': 'string'},
+            },
+        ]
@@ -0,0 +1,39 @@
+from rest_framework.filters import BaseFilterBackend
+
+
+class QueryParamFilterBackend(BaseFilterBackend):
+    """
+    Filters the queryset with the query parameters declared by the view's
+    ``filter_serializer_class``. The validated values are passed to
+    ``queryset.filter()`` as they are, so every serializer field must be named
+    after a model lookup (``artist``, ``release_year__gte``). Invalid values
+    are rejected with a 400 response.
+    """
+
+    def get_filter_serializer(self, request, view):
+        serializer_class = getattr(view, 'filter_serializer_class', None)
+        if serializer_class is None:
+            return None
+        return serializer_class(data=request.query_params)
+
+    def filter_queryset(self, request, queryset, view):
+        serializer = self.get_filter_serializer(request, view)
+        if serializer is None:
+            return queryset
+        serializer.is_valid(raise_exception=True)
+        return queryset.filter(**serializer.validated_data)
+
+    def get_schema_operation_parameters(self, view):
+        serializer_class = getattr(view, 'filter_serializer_class', None)
+        if serializer_class is None:
+            return []
+        return [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': field.help_text or '',
+                'schema': {'type': 'integer'},
+            }
+            for name, field in serializer_class().fields.items()
+        ]
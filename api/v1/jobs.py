@@ -0,0 +1,31 @@
+"""
+Background variants of the slow write operations of the API.
+
+A client asks for one with the ``Prefer: respond-async`` header (RFC 7240).
+The operation is then validated, enqueued as a job for ``manage.py
+run_worker`` and answered with ``202 Accepted``: the body is the job and
+the ``Location`` header is the URL its status is polled from.
+"""
+import re
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from .serializers import JobSerializer
+
+PREFERENCE_SEPARATOR = re.compile(r'[,;]')
+
+
+def prefers_async(request):
+    """Whether the request carries the ``respond-async`` preference."""
+    preferences = PREFERENCE_SEPARATOR.split(request.META.get('HTTP_PREFER', ''))
+    return any(preference.strip().lower() == 'respond-async' for preference in preferences)
+
+
+def accepted(request, job):
+    """The 202 response for an enqueued job."""
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={
+        'Location': reverse('api_v1:jobs-detail', kwargs={'pk': job.pk}, request=request),
+        'Preference-Applied': 'respond-async',
+    })
@@ -0,0 +1,181 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset (cursor) pagination over a stable unique ordering.
+
+    Pagination is only applied when the client sends ``cursor`` or
+    ``page_size``, so existing clients keep receiving plain lists. Each page
+    is fetched with ``WHERE key > last_seen_key ORDER BY key LIMIT n``, which
+    is served from the index backing ``ordering`` and costs the same for
+    page 1 and page N. Rows inserted while a client is walking the list never
+    shift the pages it has not fetched yet.
+    """
+    ordering = ('id',)
+    page_size = 100
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.get_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Same as paginate_queryset(), fetching the page with the async ORM."""
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.get_page([instance async for instance in queryset.aiterator()])
+
+    def get_page_queryset(self, queryset, request):
+        """The query of the requested page, with one extra row to detect the next page."""
+        params = request.query_params
+        if (self.cursor_query_param not in params
+                and self.page_size_query_param not in params):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.db = queryset.db
+        self.fields = [queryset.model._meta.get_field(name) for name in self.ordering]
+        self.attnames = [field.attname for field in self.fields]
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, page):
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_position = self.get_position(page[-1]) if self.has_next else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_position(self, instance):
+        if isinstance(instance, dict):
+            # A values() row, keyed by field name.
+            return [instance[name] for name in self.ordering]
+        return [getattr(instance, attname) for attname in self.attnames]
+
+    def get_position_filter(self, position):
+        """
+        Builds ``(f1, f2, ...) > (v1, v2, ...)`` as
+        ``f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...``.
+        """
+        condition = Q()
+        for index, attname in enumerate(self.attnames):
+            equal = {name: value for name, value in zip(self.attnames[:index], position)}
+            condition |= Q(**equal, **{f'{attname}__gt': position[index]})
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(b64decode(encoded.encode('ascii')).decode('ascii'))
+        except (UnicodeError, BinasciiError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return [self.decode_value(field, value) for field, value in zip(self.fields, position)]
+
+    def decode_value(self, field, value):
+        """
+        Converts a cursor value for a lookup on ``field``, or rejects the
+        cursor if the value is of the wrong type or out of the column's range.
+        """
+        field = field.target_field if field.is_relation else field
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            value = field.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        ops = connections[self.db].ops
+        if field.get_internal_type() in ops.integer_field_ranges:
+            low, high = ops.integer_field_range(field.get_internal_type())
+            if low is None:
+                # SQLite has no per-type range, but stores 64-bit integers at most.
+                low, high = -2 ** 63, 2 ** 63 - 1
+            if not low <= value <= high:
+                raise NotFound(self.invalid_cursor_message)
+        return value
+
+    def encode_cursor(self, position):
+        return b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results per page (max {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class AlbumSongKeysetPagination(KeysetPagination):
+    """
+    Walks album-songs in tracklist order using the ``(album, _track_number)``
+    unique index.
+    """
+    ordering = ('album', '_track_number')
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+
+from tune_treasure_drf.db_router import use_replicas
+
+
+class ReplicaReadMixin:
+    """
+    Serves GET requests from the read replicas (see DATABASE_REPLICAS).
+
+    A successful write through the view sets a short-lived cookie that keeps
+    the client's reads on the primary for REPLICA_STICKY_SECONDS, so a client
+    always sees its own writes even if the replicas lag behind. Such reads
+    also bypass the response cache, whose entries other clients may have
+    built from a lagging replica under the tag versions of the write.
+    """
+    sticky_cookie_name = 'read_primary_until'
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            if self.reads_from_primary(request):
+                return super().dispatch(request, *args, **kwargs)
+            with use_replicas():
+                return super().dispatch(request, *args, **kwargs)
+        response = super().dispatch(request, *args, **kwargs)
+        if settings.DATABASE_REPLICAS and response.status_code < 400:
+            sticky = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                self.sticky_cookie_name, str(time.time() + sticky), max_age=sticky, httponly=True
+            )
+        return response
+
+    def is_cacheable(self, request, kwargs):
+        if self.reads_from_primary(request):
+            return False
+        return super().is_cacheable(request, kwargs)
+
+    def reads_from_primary(self, request):
+        try:
+            return float(request.COOKIES.get(self.sticky_cookie_name, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,39 @@
+"""
+Ranked search over artist names, album titles and song titles.
+
+On PostgreSQL with pg_trgm the search matches by word similarity
+(``query <% title``), which the trigram GIN indexes serve without scanning
+the table, tolerates typos and ranks by similarity. Elsewhere (SQLite in
+tests) it falls back to a case-insensitive substring search ranked exact
+match > prefix > substring.
+"""
+from functools import lru_cache
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, Value, When
+
+
+@lru_cache(maxsize=None)
+def has_trigram_search(using):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def search(queryset, field, query, limit):
+    """Returns the ``limit`` best matches of ``query`` on ``field``, best first."""
+    if has_trigram_search(queryset.db):
+        queryset = queryset.filter(**{f'{field}__trigram_word_similar': query}).annotate(
+            score=TrigramWordSimilarity(query, field)
+        )
+    else:
+        queryset = queryset.filter(**{f'{field}__icontains': query}).annotate(score=Case(
+            When(**{f'{field}__iexact': query}, then=Value(2)),
+            When(**{f'{field}__istartswith': query}, then=Value(1)),
+            default=Value(0),
+        ))
+    return queryset.order_by('-score', 'pk')[:limit]
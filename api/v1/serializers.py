@@ -2,28 +2,32 @@ from datetime import datetime
 
 from rest_framework import serializers
 
-from musical_catalog.models import Album, AlbumSong, Artist, Song
+from musical_catalog.changes import from_cursor
+from musical_catalog.models import (Album, AlbumSong, Artist, Job, Song,
+                                    SongRelation)
 
 
 class ArtistSerializer(serializers.ModelSerializer):
     """
-    Serializer for the Artist model. It serializes all fields related to a musical artist.
+    Serializer for the Artist model. It serializes all fields related to a musical artist,
+    including the read-only numbers of their albums and of the tracks on them.
     """
     class Meta:
         model = Artist
-        fields = ('id', 'name',)
+        fields = ('id', 'name', 'album_count', 'song_count')
 
 
 class AlbumSerializer(serializers.ModelSerializer):
     """
     Serializer for the Album model. It serializes all fields related to a musical album, 
-    including details like title, associated artist, and release year.
+    including details like title, associated artist, release year and the read-only
+    number of tracks.
     """
     artist = serializers.PrimaryKeyRelatedField(queryset = Artist.objects.all())
 
     class Meta:
         model = Album
-        fields = ('id', 'title', 'artist', 'release_year')
+        fields = ('id', 'title', 'artist', 'release_year', 'track_count')
 
     def validate_release_year(self, value):
         current_year = datetime.now().year
@@ -35,7 +39,7 @@ class AlbumSerializer(serializers.ModelSerializer):
 class SongSerializer(serializers.ModelSerializer):
     """
     Serializer for the Song model. It serializes all fields related to a musical song, 
-    which can be part of multiple albums.
+    which can be part of multiple albums. Prefetch ``albums`` when serializing many songs.
     """
 
     class Meta: 
@@ -56,8 +60,214 @@ class AlbumSongSerializer(serializers.ModelSerializer):
         model = AlbumSong 
         fields = ('album', 'song', '_track_number')
 
-    def get_album(self, obj):
-        return obj.album.id, obj.album.title
 
-    def get_song(self, obj):
-        return obj.song.id, obj.song.title
+class AlbumSongChangeSerializer(AlbumSongSerializer):
+    """
+    Read-only serializer for an album-song of the change feed. It adds the id
+    that the deletions of the feed refer to.
+    """
+
+    class Meta(AlbumSongSerializer.Meta):
+        fields = ('id', *AlbumSongSerializer.Meta.fields)
+        read_only_fields = fields
+
+
+class TrackSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for one track of an album tracklist: its number,
+    the song id and the song title. Expects ``song`` to be selected along
+    with the track.
+    """
+    title = serializers.CharField(source='song.title', read_only=True)
+
+    class Meta:
+        model = AlbumSong
+        fields = ('_track_number', 'song', 'title')
+        read_only_fields = fields
+
+
+class RelatedSongSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for a related song: its id, its title and the number
+    of albums it shares with the song. Expects ``related`` to be selected.
+    """
+    id = serializers.IntegerField(source='related_id', read_only=True)
+    title = serializers.CharField(source='related.title', read_only=True)
+
+    class Meta:
+        model = SongRelation
+        fields = ('id', 'title', 'shared_albums')
+        read_only_fields = fields
+
+
+class DiscographySerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for an album of an artist's discography together with
+    its tracklist. Expects the tracks to be prefetched into ``tracklist``.
+    """
+    tracks = TrackSerializer(source='tracklist', many=True, read_only=True)
+
+    class Meta:
+        model = Album
+        fields = ('id', 'title', 'release_year', 'tracks')
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for a background job: its kind, its status and
+    attempts, its timing and, once finished, its result or last error.
+    """
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'kind', 'status', 'attempts', 'max_attempts', 'created_at',
+            'started_at', 'heartbeat_at', 'finished_at', 'result', 'error',
+        )
+        read_only_fields = fields
+
+
+class TracklistSerializer(serializers.Serializer):
+    """
+    Serializer for writing a whole album tracklist in one request. It takes an
+    ordered list of song ids and resolves all of them with a single query.
+    Pass ``album`` and ``replace`` in the context.
+    """
+    songs = serializers.ListField(child=serializers.IntegerField(min_value=1))
+
+    def validate_songs(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError('A song can appear on an album only once.')
+        found = set(Song.objects.filter(pk__in=value).values_list('pk', flat=True))
+        missing = [pk for pk in value if pk not in found]
+        if missing:
+            raise serializers.ValidationError(f'Invalid pk "{missing[0]}" - object does not exist.')
+        if self.context['replace']:
+            return value
+        if not value:
+            raise serializers.ValidationError('This list may not be empty.')
+        present = AlbumSong.objects.filter(
+            album=self.context['album'], song_id__in=value
+        ).values_list('song_id', flat=True)
+        if present:
+            raise serializers.ValidationError(f'Song "{present[0]}" is already on the album.')
+        return value
+
+
+class AlbumFilterSerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters filtering the album list.
+    """
+    artist = serializers.IntegerField(required=False, help_text='Artist id.')
+    release_year = serializers.IntegerField(required=False)
+    release_year__gte = serializers.IntegerField(required=False)
+    release_year__lte = serializers.IntegerField(required=False)
+
+
+class AlbumSongFilterSerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters filtering the album-song list.
+    """
+    album = serializers.IntegerField(required=False, help_text='Album id.')
+    song = serializers.IntegerField(required=False, help_text='Song id.')
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters of the catalog search.
+    """
+    q = serializers.CharField(min_length=2, max_length=100)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters of the catalog export.
+    """
+    since = serializers.IntegerField(min_value=0, required=False)
+
+
+class RelatedSongsQuerySerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters of the related songs of a song.
+    """
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters of the change feed.
+    """
+    since = serializers.CharField(
+        default='0',
+        help_text='Cursor returned by the previous call; 0 for the whole catalog.',
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=5000, default=1000)
+
+    def validate_since(self, value):
+        try:
+            from_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError('Invalid cursor.')
+        return value
+
+
+class StatsQuerySerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters of the catalog statistics.
+    """
+    limit = serializers.IntegerField(
+        min_value=1, max_value=100, default=10, help_text='Number of top artists.',
+    )
+
+
+class AlbumsPerYearSerializer(serializers.Serializer):
+    """
+    Serializer for the number of albums released in a year.
+    """
+    release_year = serializers.IntegerField()
+    albums = serializers.IntegerField()
+
+
+class TracksPerAlbumSerializer(serializers.Serializer):
+    """
+    Serializer for the number of albums with a given number of tracks.
+    """
+    tracks = serializers.IntegerField()
+    albums = serializers.IntegerField()
+
+
+class StatsSerializer(serializers.Serializer):
+    """
+    Read-only serializer for the catalog statistics and the time they were
+    computed at. Statistics missing from the data are left out.
+    """
+    computed_at = serializers.DateTimeField()
+    albums_per_year = AlbumsPerYearSerializer(many=True, required=False)
+    tracks_per_album = TracksPerAlbumSerializer(many=True, required=False)
+    top_artists = ArtistSerializer(many=True, required=False)
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    """
+    Serializer for one operation of a batch request.
+    """
+    method = serializers.ChoiceField(choices=('GET', 'POST', 'PUT', 'PATCH', 'DELETE'))
+    path = serializers.CharField(help_text='Path of an API route, for example /api/artists/.')
+    body = serializers.JSONField(required=False, help_text='JSON body of the request.')
+    ref = serializers.RegexField(
+        r'^[\w-]+$', required=False,
+        help_text='Name later operations use to refer to the response, as "$<ref>.id".',
+    )
+
+
+class BatchSerializer(serializers.Serializer):
+    """
+    Serializer for a batch request: the operations to run in one transaction, in order.
+    """
+    operations = BatchOperationSerializer(many=True, allow_empty=False, max_length=100)
+
+    def validate_operations(self, value):
+        refs = [operation['ref'] for operation in value if 'ref' in operation]
+        if len(set(refs)) != len(refs):
+            raise serializers.ValidationError('Every ref must be unique.')
+        return value
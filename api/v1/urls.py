@@ -1,7 +1,11 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import AlbumSongViewSet, AlbumViewSet, ArtistViewSet, SongViewSet
+from .async_views import (AsyncAlbumSongView, AsyncAlbumView,
+                          AsyncArtistView, AsyncSongView, AsyncTracklistView)
+from .views import (AlbumSongViewSet, AlbumViewSet, ArtistViewSet,
+                    BatchViewSet, ChangesViewSet, ExportViewSet, JobViewSet,
+                    SearchViewSet, SongViewSet, StatsViewSet)
 
 app_name = 'api_v1'
 
@@ -10,7 +14,27 @@ router.register(r'artists', ArtistViewSet, basename='artists')
 router.register(r'albums', AlbumViewSet, basename='albums')
 router.register(r'songs', SongViewSet, basename='songs')
 router.register(r'album-songs', AlbumSongViewSet, basename='album-songs')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'export', ExportViewSet, basename='export')
+router.register(r'batch', BatchViewSet, basename='batch')
+router.register(r'changes', ChangesViewSet, basename='changes')
+router.register(r'jobs', JobViewSet, basename='jobs')
+router.register(r'stats', StatsViewSet, basename='stats')
+
+# Async GET-only twins of the read endpoints, for ASGI deployments.
+async_urlpatterns = [
+    path('artists/', AsyncArtistView.as_view(), name='async-artists-list'),
+    path('artists/<int:pk>/', AsyncArtistView.as_view(), name='async-artists-detail'),
+    path('albums/', AsyncAlbumView.as_view(), name='async-albums-list'),
+    path('albums/<int:pk>/', AsyncAlbumView.as_view(), name='async-albums-detail'),
+    path('albums/<int:pk>/tracks/', AsyncTracklistView.as_view(), name='async-albums-tracks'),
+    path('songs/', AsyncSongView.as_view(), name='async-songs-list'),
+    path('songs/<int:pk>/', AsyncSongView.as_view(), name='async-songs-detail'),
+    path('album-songs/', AsyncAlbumSongView.as_view(), name='async-album-songs-list'),
+    path('album-songs/<int:pk>/', AsyncAlbumSongView.as_view(), name='async-album-songs-detail'),
+]
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/', include(async_urlpatterns)),
 ]
@@ -1,38 +1,342 @@
-from rest_framework import viewsets
+from django.conf import settings
+from django.db import router
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
-from musical_catalog.models import Album, AlbumSong, Artist, Song
+from musical_catalog.changes import find_changes
+from musical_catalog.exporter import export_lines
+from musical_catalog.jobs import album_key, enqueue
+from musical_catalog.models import (Album, AlbumSong, Artist, Job, Song,
+                                    SongRelation, append_tracks,
+                                    replace_tracks)
+from musical_catalog.stats import get_stats
 
-from .serializers import (AlbumSerializer, AlbumSongSerializer,
-                          ArtistSerializer, SongSerializer)
+from .batch import run_batch
+from .cache import CachedResponseMixin
+from .fieldsets import SparseFieldsetFilterBackend, SparseFieldsetMixin
+from .filters import QueryParamFilterBackend
+from .jobs import accepted, prefers_async
+from .pagination import AlbumSongKeysetPagination, KeysetPagination
+from .renderers import NDJSONRenderer
+from .replicas import ReplicaReadMixin
+from .search import search
+from .serializers import (AlbumFilterSerializer, AlbumSerializer,
+                          AlbumSongChangeSerializer, AlbumSongFilterSerializer,
+                          AlbumSongSerializer, ArtistSerializer,
+                          BatchSerializer, ChangesQuerySerializer,
+                          DiscographySerializer, ExportQuerySerializer,
+                          JobSerializer, RelatedSongSerializer, RelatedSongsQuerySerializer,
+                          SearchQuerySerializer, SongSerializer,
+                          StatsQuerySerializer, StatsSerializer,
+                          TracklistSerializer, TrackSerializer)
+from .values import ValuesListMixin
 
 
-class ArtistViewSet(viewsets.ModelViewSet):
+def tracklist_queryset():
+    """Tracks in album order, with their songs joined in the same query."""
+    return AlbumSong.objects.select_related('song').order_by('_track_number')
+
+
+class ArtistViewSet(ReplicaReadMixin, CachedResponseMixin, SparseFieldsetMixin, ValuesListMixin,
+                    viewsets.ModelViewSet):
     """
     ViewSet for handling CRUD operations related to the Artist model.
     """
     queryset = Artist.objects.all()
     serializer_class = ArtistSerializer
+    pagination_class = KeysetPagination
+    values_serialization = True
+    filter_backends = (SparseFieldsetFilterBackend,)
+    cache_tags = {
+        'list': ('artists',),
+        'retrieve': ('artist:{pk}',),
+        'discography': ('discography:{pk}',),
+    }
+
+    @action(detail=True, serializer_class=DiscographySerializer, pagination_class=None)
+    def discography(self, request, pk=None):
+        """
+        Returns the artist's albums in release order, each with its tracklist.
+        Served with three queries whatever the number of albums and tracks.
+        """
+        artist = self.get_object()
+        albums = artist.albums.order_by('release_year', 'id').prefetch_related(
+            Prefetch('albumsong_set', queryset=tracklist_queryset(), to_attr='tracklist')
+        )
+        return Response(self.get_serializer(albums, many=True).data)
 
-class AlbumViewSet(viewsets.ModelViewSet):
+class AlbumViewSet(ReplicaReadMixin, CachedResponseMixin, SparseFieldsetMixin, ValuesListMixin,
+                   viewsets.ModelViewSet):
     """
     ViewSet for handling CRUD operations related to the Album model.
     This includes operations for individual albums and their associated artist.
     """
     queryset = Album.objects.all()
     serializer_class = AlbumSerializer
+    pagination_class = KeysetPagination
+    values_serialization = True
+    filter_backends = (QueryParamFilterBackend, SparseFieldsetFilterBackend)
+    filter_serializer_class = AlbumFilterSerializer
+    cache_tags = {
+        'list': ('albums',),
+        'retrieve': ('album:{pk}',),
+        'tracks': ('tracklist:{pk}',),
+    }
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Deletes the album with its tracks, or enqueues the deletion when the
+        request prefers ``respond-async``.
+        """
+        if not prefers_async(request):
+            return super().destroy(request, *args, **kwargs)
+        album = self.get_object()
+        job = enqueue('delete_album', {'album_id': album.pk}, key=album_key(album.pk))
+        return accepted(request, job)
+
+    def get_serializer_class(self):
+        if self.action == 'tracks':
+            if getattr(self.request, 'method', None) == 'GET':
+                return TrackSerializer
+            return TracklistSerializer
+        return super().get_serializer_class()
+
+    @action(detail=True, methods=['get', 'post', 'put'], pagination_class=None)
+    def tracks(self, request, pk=None):
+        """
+        GET returns the ordered tracklist with song titles in two queries.
+        POST appends an ordered list of song ids to the end of the album and PUT
+        replaces and reorders the whole tracklist, each in one transaction.
+        A PUT preferring ``respond-async`` is validated and then enqueued.
+        """
+        album = self.get_object()
+        if request.method == 'GET':
+            tracks = tracklist_queryset().filter(album=album)
+            return Response(self.get_serializer(tracks, many=True).data)
+        replace = request.method == 'PUT'
+        serializer = self.get_serializer(
+            data=request.data,
+            context={**self.get_serializer_context(), 'album': album, 'replace': replace},
+        )
+        serializer.is_valid(raise_exception=True)
+        songs = serializer.validated_data['songs']
+        if not replace:
+            tracks = append_tracks(album.id, songs)
+            return Response(
+                AlbumSongSerializer(tracks, many=True).data,
+                status=status.HTTP_201_CREATED,
+            )
+        if prefers_async(request):
+            job = enqueue('replace_tracks', {'album_id': album.id, 'songs': songs}, key=album_key(album.id))
+            return accepted(request, job)
+        replace_tracks(album.id, songs)
+        tracks = AlbumSong.objects.filter(album=album).order_by('_track_number')
+        return Response(AlbumSongSerializer(tracks, many=True).data)
 
-class SongViewSet(viewsets.ModelViewSet):
+class SongViewSet(ReplicaReadMixin, CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for handling CRUD operations related to the Song model.
     Songs can be part of multiple albums.
     """
-    queryset = Song.objects.all()
+    queryset = Song.objects.prefetch_related(
+        Prefetch('albums', queryset=Album.objects.only('id'))
+    )
     serializer_class = SongSerializer
+    pagination_class = KeysetPagination
+    filter_backends = (SparseFieldsetFilterBackend,)
+    cache_tags = {
+        'list': ('songs',),
+        'retrieve': ('song:{pk}',),
+        # Relations change with any tracklist, titles with any song.
+        'related': ('album-songs', 'songs'),
+    }
 
-class AlbumSongViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        if self.action == 'related':
+            return Song.objects.only('id')
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action == 'related':
+            return RelatedSongSerializer
+        return super().get_serializer_class()
+
+    @action(detail=True, pagination_class=None)
+    def related(self, request, pk=None):
+        """
+        Returns the ``limit`` songs sharing the most albums with the song, read
+        in order from the index of the co-occurrence table.
+        """
+        song = self.get_object()
+        params = RelatedSongsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        relations = SongRelation.objects.filter(song=song).select_related('related').only(
+            'related_id', 'shared_albums', 'related__title'
+        ).order_by('-shared_albums', 'related_id')[:params.validated_data['limit']]
+        return Response(self.get_serializer(relations, many=True).data)
+
+class AlbumSongViewSet(ReplicaReadMixin, CachedResponseMixin, SparseFieldsetMixin, ValuesListMixin,
+                       viewsets.ModelViewSet):
     """
     ViewSet for handling CRUD operations related to the AlbumSong intermediate model.
     This model captures the relationship between songs and albums, including track numbers.
     """
     queryset = AlbumSong.objects.all()
     serializer_class = AlbumSongSerializer
+    pagination_class = AlbumSongKeysetPagination
+    values_serialization = True
+    filter_backends = (QueryParamFilterBackend, SparseFieldsetFilterBackend)
+    filter_serializer_class = AlbumSongFilterSerializer
+    # Renumbering shifts many rows at once, so every album-song response shares one tag.
+    cache_tags = {
+        'list': ('album-songs',),
+        'retrieve': ('album-songs',),
+    }
+
+
+class SearchViewSet(CachedResponseMixin, viewsets.ViewSet):
+    """
+    ViewSet for searching artists, albums and songs by name or title.
+    Results of each kind are ranked best match first.
+    """
+    cache_tags = {
+        'list': ('artists', 'albums', 'songs'),
+    }
+
+    def list(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query, limit = params.validated_data['q'], params.validated_data['limit']
+        songs = Song.objects.prefetch_related(Prefetch('albums', queryset=Album.objects.only('id')))
+        return Response({
+            'artists': ArtistSerializer(search(Artist.objects.all(), 'name', query, limit), many=True).data,
+            'albums': AlbumSerializer(search(Album.objects.all(), 'title', query, limit), many=True).data,
+            'songs': SongSerializer(search(songs, 'title', query, limit), many=True).data,
+        })
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    ViewSet for streaming the whole catalog as NDJSON, one album with its
+    artist and tracklist per line. ``since`` limits the export to albums
+    with a greater id; the response is gzipped when the client accepts it.
+    """
+    renderer_classes = (NDJSONRenderer,)
+    # Streams its response, nothing a batch could use.
+    batchable = False
+
+    def list(self, request):
+        params = ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        lines = (line.encode() for line in export_lines(params.validated_data.get('since')))
+        compress = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        response = StreamingHttpResponse(
+            compress_sequence(lines) if compress else lines,
+            content_type=NDJSONRenderer.media_type,
+        )
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class ChangesViewSet(viewsets.ViewSet):
+    """
+    ViewSet for the change feed of the catalog: the rows created, updated and
+    deleted after the ``since`` cursor. Pass the returned ``cursor`` as
+    ``since`` to the next call; ``more`` tells whether changes are left after
+    it. Renumbered tracks are reported as updated album-songs.
+    """
+
+    def list(self, request):
+        params = ChangesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        changes = find_changes(params.validated_data['since'], params.validated_data['limit'])
+        upserts = changes['upserts']
+        songs = upserts['songs'].prefetch_related(Prefetch('albums', queryset=Album.objects.only('id')))
+        return Response({
+            'cursor': changes['cursor'],
+            'more': changes['more'],
+            'upserts': {
+                'artists': ArtistSerializer(upserts['artists'], many=True).data,
+                'albums': AlbumSerializer(upserts['albums'], many=True).data,
+                'songs': SongSerializer(songs, many=True).data,
+                'album_songs': AlbumSongChangeSerializer(upserts['album_songs'], many=True).data,
+            },
+            'deletes': changes['deletes'],
+        })
+
+
+class StatsViewSet(ReplicaReadMixin, CachedResponseMixin, viewsets.ViewSet):
+    """
+    ViewSet for the aggregate statistics of the catalog: albums per release
+    year, albums per number of tracks and the top ``limit`` artists by song
+    count. Each is computed by one aggregate query, or read from the latest
+    snapshot with STATS_FROM_SNAPSHOT on, and cached for at most
+    STATS_CACHE_TIMEOUT seconds.
+    """
+    cache_tags = {
+        'list': ('artists', 'albums', 'album-songs', 'stats'),
+        'albums_per_year': ('albums', 'stats'),
+        'tracks_per_album': ('albums', 'album-songs', 'stats'),
+        'top_artists': ('artists', 'albums', 'album-songs', 'stats'),
+    }
+
+    def get_cache_timeout(self):
+        return min(super().get_cache_timeout(), settings.STATS_CACHE_TIMEOUT)
+
+    def stats_response(self, request, names=None):
+        params = StatsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        stats = get_stats(names, using=router.db_for_read(Album))
+        if 'top_artists' in stats:
+            stats['top_artists'] = stats['top_artists'][:params.validated_data['limit']]
+        return Response(StatsSerializer(stats).data)
+
+    def list(self, request):
+        return self.stats_response(request)
+
+    @action(detail=False, url_path='albums-per-year')
+    def albums_per_year(self, request):
+        return self.stats_response(request, ['albums_per_year'])
+
+    @action(detail=False, url_path='tracks-per-album')
+    def tracks_per_album(self, request):
+        return self.stats_response(request, ['tracks_per_album'])
+
+    @action(detail=False, url_path='top-artists')
+    def top_artists(self, request):
+        return self.stats_response(request, ['top_artists'])
+
+
+class JobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    ViewSet for the status of a background job enqueued by a request that
+    preferred ``respond-async``. Read from the primary, so that a job is
+    found as soon as the 202 response is sent.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+
+
+class BatchViewSet(ReplicaReadMixin, viewsets.GenericViewSet):
+    """
+    ViewSet for running several API calls in one request and one transaction.
+    Returns the status and data of every operation; when one fails, the batch
+    is rolled back and the response is a 400 with the index of the failed one.
+    """
+    serializer_class = BatchSerializer
+    batchable = False
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results, failed = run_batch(request, serializer.validated_data['operations'])
+        if failed is None:
+            return Response({'results': results})
+        return Response({'results': results, 'failed': failed}, status=status.HTTP_400_BAD_REQUEST)
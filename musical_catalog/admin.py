@@ -1,15 +1,78 @@
+import json
+
 from django.contrib import admin
 from django.contrib.auth.models import Group, User
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from django.urls import reverse
 
 from .models import Album, AlbumSong, Artist, Song
 
-admin.site.register(Artist)
-admin.site.register(Album)
-admin.site.register(Song)
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for the changelists of large tables. On PostgreSQL the number of
+    rows is taken from the planner estimate instead of a COUNT(*) over the whole
+    result, unless the estimate is small enough for an exact count to be cheap.
+    The last page numbers are approximate on large results.
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor == 'postgresql':
+            estimate = json.loads(queryset.explain(format='json'))[0]['Plan']['Plan Rows']
+            if estimate > self.exact_count_threshold:
+                return estimate
+        return super().count
+
+
+class CatalogAdmin(admin.ModelAdmin):
+    """
+    Base admin of the catalog models: estimated counts, and no second
+    COUNT(*) of the unfiltered table next to the search results.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Artist)
+class ArtistAdmin(CatalogAdmin):
+    list_display = ('name', 'album_count', 'song_count')
+    search_fields = ('name',)
+
+
+@admin.register(Album)
+class AlbumAdmin(CatalogAdmin):
+    list_display = ('title', 'artist', 'release_year', 'track_count', 'tracks')
+    list_select_related = ('artist',)
+    list_filter = ('release_year',)
+    search_fields = ('title',)
+    autocomplete_fields = ('artist',)
+
+    @admin.display(description='Треки')
+    def tracks(self, album):
+        url = reverse('admin:musical_catalog_albumsong_changelist')
+        return format_html('<a href="{}?album__exact={}">{}</a>', url, album.pk, album.track_count)
+
+
+@admin.register(Song)
+class SongAdmin(CatalogAdmin):
+    list_display = ('title',)
+    search_fields = ('title',)
+
 
 @admin.register(AlbumSong)
-class AlbumSongAdmin(admin.ModelAdmin):
+class AlbumSongAdmin(CatalogAdmin):
     exclude = ('_track_number',)
+    list_display = ('song', 'album', '_track_number')
+    list_select_related = ('song', 'album')
+    search_fields = ('song__title',)
+    autocomplete_fields = ('album', 'song')
+
 
 admin.site.unregister(Group)
-admin.site.unregister(User)
\ No newline at end of file
+admin.site.unregister(User)
@@ -0,0 +1,167 @@
+"""
+Change feed of the catalog, for clients that keep an offline copy of it.
+
+Every catalog row carries an indexed ``updated_at`` and every deleted row
+leaves a Tombstone, so the changes after a cursor are found with index range
+scans whose cost depends on the number of changes, not on the catalog size.
+
+Many rows can share a time (a bulk import, a renumbered tracklist, the
+backfill of the timestamps), so changes are ordered by ``(time, source,
+pk)`` and the cursor is the last of those keys that was returned, written
+as ``<time>.<source>.<pk>`` with the time in microseconds since the epoch.
+A page stops after exactly ``limit`` changes, even in the middle of rows
+sharing a time. A bare time is also accepted as a cursor, meaning every
+change up to and including that time.
+
+Rows are stamped when they are written, not when their transaction commits,
+so a cursor must never move past the start of a transaction still in
+flight: a long one (an album deleted by a job, an import batch) would commit
+rows older than the cursor, which no later sync would return. On PostgreSQL
+the cursor is held before the start of the oldest transaction that has
+written, as pg_stat_activity shows it, and CHANGES_SETTLE_SECONDS more to
+allow for the clock of the application servers and for the rows stamped just
+before their statement reached the database. Other databases only hold back
+the changes younger than CHANGES_SETTLE_SECONDS.
+"""
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Album, AlbumSong, Artist, Song, Tombstone
+
+SOURCES = {
+    'artists': Artist,
+    'albums': Album,
+    'songs': Song,
+    'album_songs': AlbumSong,
+}
+
+# Position of the tombstones among the sources, after the models, and of a
+# key past every change of a time.
+TOMBSTONES = len(SOURCES)
+END = TOMBSTONES + 1
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def to_cursor(key):
+    moment, source, pk = key
+    return f'{(moment - EPOCH) // timedelta(microseconds=1)}.{source}.{pk}'
+
+
+def from_cursor(cursor):
+    """
+    Returns the ``(time, source, pk)`` key of a cursor. Raises ValueError if
+    the cursor is malformed.
+    """
+    parts = str(cursor).split('.')
+    if len(parts) not in (1, 3) or not all(part.isdigit() for part in parts):
+        raise ValueError(f'Invalid cursor {cursor!r}.')
+    moment = EPOCH + timedelta(microseconds=int(parts[0]))
+    if len(parts) == 1:
+        return moment, END, 0
+    source, pk = int(parts[1]), int(parts[2])
+    if source > END:
+        raise ValueError(f'Invalid cursor {cursor!r}.')
+    return moment, source, pk
+
+
+def after(field, key, source):
+    """The rows of ``source`` whose ``(field, source, pk)`` key follows ``key``."""
+    moment, start_source, start_pk = key
+    if source > start_source:
+        return Q(**{f'{field}__gte': moment})
+    if source < start_source:
+        return Q(**{f'{field}__gt': moment})
+    # A range on the indexed time, minus the rows of that time already returned.
+    return Q(**{f'{field}__gte': moment}) & ~Q(**{field: moment, 'pk__lte': start_pk})
+
+
+def oldest_write_start(using=DEFAULT_DB_ALIAS):
+    """
+    Returns the start time of the oldest transaction of another session that
+    has written to the database and is still open, or None if there is none
+    or the database does not tell (anything but PostgreSQL). The sessions are
+    only visible to the same role or to members of pg_read_all_stats.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT MIN(xact_start) FROM pg_stat_activity '
+            'WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid() '
+            'AND datname = current_database()'
+        )
+        return cursor.fetchone()[0]
+
+
+def get_horizon(using=DEFAULT_DB_ALIAS):
+    """The time up to which every change is committed, as far as the cursor goes."""
+    horizon = timezone.now()
+    oldest = oldest_write_start(using)
+    if oldest is not None:
+        horizon = min(horizon, oldest)
+    return horizon - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+
+
+def find_changes(since=0, limit=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Returns the ``limit`` oldest changes after the ``since`` cursor, as a dict:
+
+    * ``upserts``: querysets of the rows created or updated, per source;
+    * ``deletes``: ids of the rows deleted, per source;
+    * ``cursor``: the cursor to pass to the next call;
+    * ``more``: whether changes are left after that cursor.
+    """
+    start = from_cursor(since)
+    horizon = get_horizon(using)
+    # limit + 1 keys of every source tell whether changes are left after the page.
+    keys = []
+    for source, model in enumerate(SOURCES.values()):
+        rows = model.objects.using(using).filter(
+            after('updated_at', start, source), updated_at__lte=horizon
+        ).order_by('updated_at', 'pk')
+        keys.extend(
+            (moment, source, pk)
+            for moment, pk in rows.values_list('updated_at', 'pk')[:limit + 1]
+        )
+    tombstones = Tombstone.objects.using(using).filter(
+        after('deleted_at', start, TOMBSTONES), deleted_at__lte=horizon
+    ).order_by('deleted_at', 'pk')
+    keys.extend(
+        (moment, TOMBSTONES, pk)
+        for moment, pk in tombstones.values_list('deleted_at', 'pk')[:limit + 1]
+    )
+    keys.sort()
+    more = len(keys) > limit
+    page = keys[:limit]
+    if more:
+        until = page[-1]
+    else:
+        until = max(start, (horizon, END, 0))
+
+    pks = {source: [] for source in range(END)}
+    for _, source, pk in page:
+        pks[source].append(pk)
+    deletes = {name: [] for name in SOURCES}
+    names = {model._meta.model_name: name for name, model in SOURCES.items()}
+    if pks[TOMBSTONES]:
+        deleted = Tombstone.objects.using(using).filter(
+            pk__in=pks[TOMBSTONES]
+        ).order_by('deleted_at', 'pk')
+        for model_name, object_id in deleted.values_list('model', 'object_id'):
+            deletes[names[model_name]].append(object_id)
+    return {
+        'upserts': {
+            name: model.objects.using(using).filter(pk__in=pks[source]).order_by('updated_at', 'pk')
+            for source, (name, model) in enumerate(SOURCES.items())
+        },
+        'deletes': deletes,
+        'cursor': to_cursor(until),
+        'more': more,
+    }
@@ -0,0 +1,74 @@
+"""
+Verification and repair of the denormalized counters.
+
+``Album.track_count``, ``Artist.album_count`` and ``Artist.song_count`` are
+kept up to date with F() updates in the transactions that insert and delete
+albums and tracks. Writes that bypass the models (raw SQL, restores of
+partial dumps) can still make them drift; these functions compare every
+counter with the rows it counts and rewrite the ones that differ.
+"""
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Album, AlbumSong, Artist
+
+
+def count_of(queryset, group_by, aggregate):
+    return Coalesce(Subquery(queryset.values(group_by).annotate(value=aggregate).values('value')), 0)
+
+
+def actual_counters():
+    """The expressions computing each counter from the rows, per model."""
+    return {
+        Album: {
+            # The last track number, which is the number of tracks as long as the
+            # numbering is contiguous and the counter new tracks are numbered from.
+            'track_count': count_of(
+                AlbumSong.objects.filter(album=OuterRef('pk')), 'album', Max('_track_number')
+            ),
+        },
+        Artist: {
+            'album_count': count_of(
+                Album.objects.filter(artist=OuterRef('pk')), 'artist', Count('pk')
+            ),
+            'song_count': count_of(
+                AlbumSong.objects.filter(album__artist=OuterRef('pk')), 'album__artist', Count('pk')
+            ),
+        },
+    }
+
+
+def find_counter_drift(using=DEFAULT_DB_ALIAS):
+    """
+    Returns ``(model, pk, field, stored, actual)`` for every counter that
+    differs from the rows it counts.
+    """
+    drift = []
+    for model, counters in actual_counters().items():
+        annotations = {f'actual_{name}': expression for name, expression in counters.items()}
+        condition = Q()
+        for name in counters:
+            condition |= ~Q(**{name: F(f'actual_{name}')})
+        rows = model.objects.using(using).annotate(**annotations).filter(condition).order_by('pk')
+        for row in rows.values('pk', *counters, *annotations).iterator():
+            drift.extend(
+                (model, row['pk'], name, row[name], row[f'actual_{name}'])
+                for name in counters if row[name] != row[f'actual_{name}']
+            )
+    return drift
+
+
+def repair_counters(using=DEFAULT_DB_ALIAS):
+    """
+    Recomputes the drifted counters from the rows in one transaction and
+    returns the drift found, as find_counter_drift() does.
+    """
+    with transaction.atomic(using=using):
+        drift = find_counter_drift(using)
+        for model, counters in actual_counters().items():
+            pks = {pk for drifted, pk, *_ in drift if drifted is model}
+            if pks:
+                model.objects.using(using).filter(pk__in=pks).update(**counters, updated_at=timezone.now())
+    return drift
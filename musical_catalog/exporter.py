@@ -0,0 +1,46 @@
+"""
+Streaming export of the whole catalog, one denormalized album per record.
+
+Albums are read through a server-side cursor ``chunk_size`` rows at a time and
+the tracklists of each chunk are fetched with one extra query, so the memory
+used by an export does not depend on the catalog size. The records can be
+loaded back with ``import_catalog``.
+"""
+import json
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Prefetch
+
+from .models import Album, AlbumSong
+
+
+def album_records(since=None, chunk_size=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Yields every album in id order with its artist and tracklist. ``since`` is
+    the id of the last album of a previous export: only newer albums are yielded.
+    """
+    tracks = AlbumSong.objects.using(using).select_related('song').only(
+        'album_id', 'song_id', '_track_number', 'song__title'
+    ).order_by('_track_number')
+    albums = Album.objects.using(using).select_related('artist').prefetch_related(
+        Prefetch('albumsong_set', queryset=tracks, to_attr='tracklist')
+    ).order_by('pk')
+    if since is not None:
+        albums = albums.filter(pk__gt=since)
+    for album in albums.iterator(chunk_size=chunk_size):
+        yield {
+            'id': album.pk,
+            'title': album.title,
+            'release_year': album.release_year,
+            'artist': {'id': album.artist_id, 'name': album.artist.name},
+            'tracks': [
+                {'_track_number': track._track_number, 'song': track.song_id, 'title': track.song.title}
+                for track in album.tracklist
+            ],
+        }
+
+
+def export_lines(since=None, chunk_size=1000, using=DEFAULT_DB_ALIAS):
+    """Yields the album records as NDJSON lines."""
+    for record in album_records(since, chunk_size, using):
+        yield json.dumps(record, ensure_ascii=False) + '\n'
@@ -0,0 +1,212 @@
+"""
+Streaming bulk import of catalog records.
+
+Records are read lazily, grouped into batches of about ``batch_size`` tracks
+and every batch is written in its own transaction with a handful of bulk
+statements, so memory stays flat whatever the input size. Two record shapes
+are accepted:
+
+* a track: ``{"artist": ..., "album": ..., "release_year": ..., "song": ...}``
+  (also the CSV columns);
+* an album with its tracklist, as produced by ``export_catalog``:
+  ``{"title": ..., "release_year": ..., "artist": {"name": ...},
+  "tracks": [{"title": ...}, ...]}``.
+
+Artists are matched by name and albums by their ``(title, artist)`` natural
+key, first against the rows seen earlier in the import and then against the
+database. Every track gets a new song, appended to the end of its album;
+albums without tracks are skipped.
+"""
+import csv
+import io
+import json
+from collections import Counter, defaultdict, namedtuple
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .models import (Album, AlbumSong, Artist, Song, add_song_relations,
+                     add_to_artist_counters, allocate_track_numbers)
+from .signals import catalog_loaded
+
+Track = namedtuple('Track', ('artist', 'album', 'release_year', 'song'))
+
+
+def read_records(stream, format='jsonl'):
+    """Yields the records of a JSONL or CSV stream one at a time."""
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def parse_record(record, number):
+    """Returns the tracks of a record, raising ValueError if it is malformed."""
+    if not isinstance(record, dict):
+        raise ValueError(f'Record {number}: expected an object.')
+    if 'tracks' in record:
+        artist = record.get('artist')
+        if isinstance(artist, dict):
+            artist = artist.get('name')
+        album = record.get('title')
+        titles = [
+            track.get('title') if isinstance(track, dict) else track
+            for track in record['tracks'] or ()
+        ]
+    else:
+        artist, album, titles = record.get('artist'), record.get('album'), [record.get('song')]
+    try:
+        release_year = int(record.get('release_year'))
+    except (TypeError, ValueError):
+        raise ValueError(f'Record {number}: release_year must be an integer.')
+    for field, value in (('artist', artist), ('album', album), *(('song', title) for title in titles)):
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f'Record {number}: {field} is required.')
+    return [Track(artist.strip(), album.strip(), release_year, title.strip()) for title in titles]
+
+
+def batched(records, batch_size, start=0):
+    """
+    Groups the parsed records into lists of at least ``batch_size`` tracks.
+    A record is never split, so a batch boundary is always a record boundary.
+    Yields ``(records_read, tracks)`` pairs; ``start`` is the number of
+    records skipped before ``records``.
+    """
+    tracks, number = [], start
+    for number, record in enumerate(records, start=start + 1):
+        tracks.extend(parse_record(record, number))
+        if len(tracks) >= batch_size:
+            yield number, tracks
+            tracks = []
+    if tracks:
+        yield number, tracks
+
+
+class CatalogImporter:
+    """
+    Writes batches of tracks, remembering the ids of the artists and albums
+    it has already resolved.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.artist_ids = {}
+        self.album_ids = {}
+        self.counts = {'artists': 0, 'albums': 0, 'songs': 0, 'album_songs': 0}
+
+    def write(self, tracks):
+        with transaction.atomic(using=self.using):
+            self.resolve_artists({track.artist for track in tracks})
+            lengths = Counter(self.album_key(track) for track in tracks)
+            new_albums = self.resolve_albums(tracks, lengths)
+
+            # New albums were created with their final track_count, the others
+            # get their numbers from the counter row with one UPDATE each.
+            next_numbers = {}
+            for key, length in lengths.items():
+                if key in new_albums:
+                    next_numbers[key] = 1
+                else:
+                    next_numbers[key] = allocate_track_numbers(
+                        self.album_ids[key], length, self.using
+                    ).start
+
+            songs = Song.objects.using(self.using).bulk_create(
+                Song(title=track.song) for track in tracks
+            )
+            rows = []
+            for track, song in zip(tracks, songs):
+                key = self.album_key(track)
+                rows.append((self.album_ids[key], song.pk, next_numbers[key]))
+                next_numbers[key] += 1
+            self.insert_tracks(rows)
+            add_song_relations([(album_id, song_id) for album_id, song_id, _ in rows], self.using)
+        self.counts['songs'] += len(songs)
+        self.counts['album_songs'] += len(rows)
+
+    def album_key(self, track):
+        return track.album, self.artist_ids[track.artist]
+
+    def resolve_artists(self, names):
+        missing = names - self.artist_ids.keys()
+        if not missing:
+            return
+        existing = Artist.objects.using(self.using).filter(name__in=missing).order_by('-pk')
+        self.artist_ids.update(existing.values_list('name', 'pk'))
+        created = Artist.objects.using(self.using).bulk_create(
+            Artist(name=name) for name in sorted(missing - self.artist_ids.keys())
+        )
+        self.artist_ids.update((artist.name, artist.pk) for artist in created)
+        self.counts['artists'] += len(created)
+
+    def resolve_albums(self, tracks, lengths):
+        """Resolves the albums of the batch and returns the keys of the new ones."""
+        missing = lengths.keys() - self.album_ids.keys()
+        if not missing:
+            return set()
+        existing = Album.objects.using(self.using).filter(
+            title__in={title for title, _ in missing},
+            artist_id__in={artist_id for _, artist_id in missing},
+        ).values_list('title', 'artist_id', 'pk')
+        for title, artist_id, pk in existing:
+            if (title, artist_id) in missing:
+                self.album_ids[title, artist_id] = pk
+        release_years = {self.album_key(track): track.release_year for track in tracks}
+        new_albums = sorted(missing - self.album_ids.keys())
+        created = Album.objects.using(self.using).bulk_create(
+            Album(
+                title=title,
+                artist_id=artist_id,
+                release_year=release_years[title, artist_id],
+                track_count=lengths[title, artist_id],
+            )
+            for title, artist_id in new_albums
+        )
+        self.album_ids.update(((album.title, album.artist_id), album.pk) for album in created)
+        self.counts['albums'] += len(created)
+        counters = defaultdict(lambda: (0, 0))
+        for album in created:
+            albums, songs = counters[album.artist_id]
+            counters[album.artist_id] = (albums + 1, songs + album.track_count)
+        add_to_artist_counters(counters, self.using)
+        return set(new_albums)
+
+    def insert_tracks(self, rows):
+        """Inserts ``(album_id, song_id, track_number)`` rows, with COPY on PostgreSQL."""
+        connection = connections[self.using]
+        if connection.vendor != 'postgresql':
+            AlbumSong.objects.using(self.using).bulk_create(
+                AlbumSong(album_id=album_id, song_id=song_id, _track_number=number)
+                for album_id, song_id, number in rows
+            )
+            return
+        now = timezone.now().isoformat()
+        data = io.StringIO(''.join(
+            f'{album_id}\t{song_id}\t{number}\t{now}\t{now}\n' for album_id, song_id, number in rows
+        ))
+        table = connection.ops.quote_name(AlbumSong._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {table} (album_id, song_id, _track_number, created_at, updated_at) FROM STDIN', data
+            )
+
+
+def import_catalog(records, batch_size=5000, start=0, using=DEFAULT_DB_ALIAS, progress=None):
+    """
+    Imports the ``records`` iterable in batches of about ``batch_size`` tracks,
+    one transaction per batch. ``progress`` is called after every committed
+    batch with the number of records read so far (including the ``start``
+    records skipped by the caller) and the rows created so far, which makes it
+    the place to save a checkpoint. Returns the number of rows created per model.
+    """
+    importer = CatalogImporter(using)
+    try:
+        for records_read, tracks in batched(records, batch_size, start):
+            importer.write(tracks)
+            if progress is not None:
+                progress(records_read, importer.counts)
+    finally:
+        catalog_loaded.send(sender=Album, using=using)
+    return importer.counts
@@ -0,0 +1,245 @@
+"""
+Background jobs stored in the database and run by ``manage.py run_worker``.
+
+Operations too slow for a request (deleting a large album, reordering a long
+tracklist, rebuilding counters or song relations) are enqueued as Job rows
+and the request returns at once. Workers poll the table, so no broker is
+needed. A job is claimed by a conditional UPDATE from ``queued`` to
+``running``, which only one worker can win; on PostgreSQL the candidates are
+also read with SKIP LOCKED so that workers do not wait on each other.
+
+A job only becomes runnable once no older unfinished job has the same key,
+so the jobs of an album never run concurrently and run in the order they
+were enqueued. Handlers run in a transaction: a failed attempt leaves no
+partial changes behind and is retried after JOB_RETRY_DELAY_SECONDS, doubled
+on every attempt, until ``max_attempts``.
+
+While a job runs, a thread of its worker refreshes ``heartbeat_at`` every
+JOB_HEARTBEAT_SECONDS, so however long the job takes, it is only put back
+in the queue once that signal is older than JOB_TIMEOUT_SECONDS, when its
+worker died or hung. A run is told apart from the next by ``attempts``, and
+records its outcome only if its job is still running that attempt: a run
+that was given up for dead and then finishes rolls its changes back instead
+of overwriting those of the run that replaced it.
+"""
+import logging
+import threading
+import time
+import traceback
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .counters import repair_counters
+from .models import Album, Job, replace_tracks
+from .relations import build_song_relations
+from .stats import build_snapshot
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+class JobSuperseded(Exception):
+    """Raised to roll back a run whose job was meanwhile given to another run."""
+
+
+def job_handler(kind):
+    """Registers the decorated function as the handler of the ``kind`` jobs."""
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def album_key(album_id):
+    """The key serializing the jobs that write the tracks of an album."""
+    return f'album:{album_id}'
+
+
+def enqueue(kind, payload=None, key=None, using=DEFAULT_DB_ALIAS):
+    """
+    Adds a job to the queue and returns it. ``payload`` holds the keyword
+    arguments of the handler and must be JSON serializable.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind {kind!r}.')
+    return Job.objects.using(using).create(
+        kind=kind, payload=payload or {}, key=key, max_attempts=settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def requeue_stale_jobs(using=DEFAULT_DB_ALIAS):
+    """
+    Puts back in the queue the running jobs whose worker stopped signalling
+    for JOB_TIMEOUT_SECONDS, or fails them if they have no attempt left.
+    """
+    now = timezone.now()
+    stale = Job.objects.using(using).filter(
+        status=Job.RUNNING, heartbeat_at__lt=now - timedelta(seconds=settings.JOB_TIMEOUT_SECONDS),
+    )
+    error = 'The worker stopped before the job finished.'
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, error=error, finished_at=now,
+    )
+    stale.update(status=Job.QUEUED, error=error, run_after=now)
+
+
+def claim_job(using=DEFAULT_DB_ALIAS):
+    """
+    Marks the oldest runnable job as running and returns it, or returns None
+    if no job can run now.
+    """
+    now = timezone.now()
+    blocking = Job.objects.filter(
+        key=OuterRef('key'), status__in=(Job.QUEUED, Job.RUNNING), pk__lt=OuterRef('pk'),
+    )
+    candidates = Job.objects.using(using).filter(
+        status=Job.QUEUED, run_after__lte=now,
+    ).exclude(Exists(blocking)).order_by('pk')
+    skip_locked = connections[using].features.has_select_for_update_skip_locked
+    if skip_locked:
+        candidates = candidates.select_for_update(skip_locked=True, of=('self',))
+    # Without SKIP LOCKED (SQLite), the conditional UPDATE alone settles the
+    # race: a read transaction there cannot turn into a write one while
+    # another worker writes.
+    with transaction.atomic(using=using) if skip_locked else nullcontext():
+        for job in candidates[:10]:
+            claimed = Job.objects.using(using).filter(pk=job.pk, status=Job.QUEUED).update(
+                status=Job.RUNNING, attempts=job.attempts + 1, started_at=now, heartbeat_at=now,
+            )
+            if claimed:
+                job.status, job.attempts = Job.RUNNING, job.attempts + 1
+                job.started_at = job.heartbeat_at = now
+                return job
+    return None
+
+
+def current_run(job, using=DEFAULT_DB_ALIAS):
+    """The job row, as long as it is still running the attempt of ``job``."""
+    return Job.objects.using(using).filter(pk=job.pk, status=Job.RUNNING, attempts=job.attempts)
+
+
+@contextmanager
+def heartbeat(job, using=DEFAULT_DB_ALIAS):
+    """
+    Refreshes the ``heartbeat_at`` of a running job every
+    JOB_HEARTBEAT_SECONDS while the block runs. The thread has its own
+    connection: writes made in the job's transaction would only show once
+    the job is done.
+    """
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(settings.JOB_HEARTBEAT_SECONDS):
+                try:
+                    current_run(job, using).update(heartbeat_at=timezone.now())
+                except DatabaseError:
+                    logger.exception('Could not refresh the heartbeat of job %s.', job)
+        finally:
+            connections[using].close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_job(job, using=DEFAULT_DB_ALIAS):
+    """
+    Runs a claimed job in a transaction and records its result, or its error
+    and the time of the next attempt. If the job was requeued while it ran,
+    its changes are rolled back and nothing is recorded.
+    """
+    try:
+        with heartbeat(job, using), transaction.atomic(using=using):
+            result = HANDLERS[job.kind](**job.payload, using=using)
+            finished_at = timezone.now()
+            # In the handler's transaction, so that a superseded run commits nothing.
+            if not current_run(job, using).update(
+                status=Job.SUCCEEDED, result=result, error='', finished_at=finished_at,
+            ):
+                raise JobSuperseded
+    except JobSuperseded:
+        logger.warning('Job %s was run again meanwhile, attempt %s is discarded.', job, job.attempts)
+        job.refresh_from_db(using=using)
+        return job
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.JOB_RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1)
+            )
+            logger.warning('Job %s failed, attempt %s of %s.', job, job.attempts, job.max_attempts)
+        else:
+            job.status, job.finished_at = Job.FAILED, timezone.now()
+            logger.error('Job %s failed:\n%s', job, job.error)
+        if not current_run(job, using).update(
+            status=job.status, error=job.error, run_after=job.run_after, finished_at=job.finished_at,
+        ):
+            logger.warning('Job %s was run again meanwhile, attempt %s is discarded.', job, job.attempts)
+            job.refresh_from_db(using=using)
+        return job
+    job.status, job.result, job.error, job.finished_at = Job.SUCCEEDED, result, '', finished_at
+    return job
+
+
+def work(using=DEFAULT_DB_ALIAS, poll_interval=1.0, burst=False, should_stop=lambda: False):
+    """
+    Runs jobs one after the other, waiting ``poll_interval`` seconds whenever
+    the queue is empty, until ``should_stop()`` is true or, with ``burst``,
+    no job is left to run now. Returns the number of jobs run.
+    """
+    done = 0
+    while not should_stop():
+        requeue_stale_jobs(using)
+        job = claim_job(using)
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job, using)
+        done += 1
+    return done
+
+
+@job_handler('delete_album')
+def delete_album(album_id, using=DEFAULT_DB_ALIAS):
+    album = Album.objects.using(using).filter(pk=album_id).first()
+    if album is None:
+        return {'deleted': False}
+    album.delete()
+    return {'deleted': True}
+
+
+@job_handler('replace_tracks')
+def replace_album_tracks(album_id, songs, using=DEFAULT_DB_ALIAS):
+    if not Album.objects.using(using).filter(pk=album_id).exists():
+        raise Album.DoesNotExist(f'Album {album_id} does not exist.')
+    replace_tracks(album_id, songs, using)
+    return {'track_count': len(songs)}
+
+
+@job_handler('repair_counters')
+def repair_counters_job(using=DEFAULT_DB_ALIAS):
+    return {'repaired': len(repair_counters(using))}
+
+
+@job_handler('build_song_relations')
+def build_song_relations_job(chunk_size=10000, using=DEFAULT_DB_ALIAS):
+    return {'written': build_song_relations(chunk_size, using)}
+
+
+@job_handler('build_stats_snapshot')
+def build_stats_snapshot_job(using=DEFAULT_DB_ALIAS):
+    return {'computed_at': build_snapshot(using).computed_at.isoformat()}
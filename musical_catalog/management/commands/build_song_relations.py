@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from musical_catalog.jobs import enqueue
+from musical_catalog.relations import build_song_relations
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the song co-occurrence table behind /api/songs/{id}/related/ '
+        'from the tracks. Track writes keep it current afterwards; run it once '
+        'after deploying the table, or to repair it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Song ids aggregated per statement.')
+        parser.add_argument('--enqueue', action='store_true',
+                            help='Leave the rebuild to run_worker.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            job = enqueue(
+                'build_song_relations', {'chunk_size': options['chunk_size']},
+                key='build_song_relations', using=options['database'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'Enqueued job {job.pk}.'))
+            return
+        written = build_song_relations(
+            options['chunk_size'],
+            options['database'],
+            progress=lambda song_id: self.stdout.write(f'Songs up to id {song_id} done.'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} song relations.'))
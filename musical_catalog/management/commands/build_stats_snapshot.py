@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from musical_catalog.jobs import enqueue
+from musical_catalog.stats import build_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Computes the catalog statistics into a snapshot, which /api/stats/ '
+        'serves instead of live aggregates when STATS_FROM_SNAPSHOT=1. Run it '
+        'periodically (cron) to refresh the snapshot.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enqueue', action='store_true',
+                            help='Leave the computation to run_worker.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            job = enqueue('build_stats_snapshot', key='build_stats_snapshot', using=options['database'])
+            self.stdout.write(self.style.SUCCESS(f'Enqueued job {job.pk}.'))
+            return
+        snapshot = build_snapshot(options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote the statistics snapshot of {snapshot}.'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from musical_catalog.counters import find_counter_drift, repair_counters
+from musical_catalog.jobs import enqueue
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the denormalized counters (Album.track_count, Artist.album_count '
+        'and Artist.song_count) with the rows they count and fails if any has '
+        'drifted. --repair recomputes the drifted ones; run it while the catalog '
+        'is not being written to.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true',
+                            help='Rewrite the drifted counters.')
+        parser.add_argument('--enqueue', action='store_true',
+                            help='With --repair, leave the repair to run_worker.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            if not options['repair']:
+                raise CommandError('--enqueue only applies to --repair.')
+            job = enqueue('repair_counters', key='repair_counters', using=options['database'])
+            self.stdout.write(self.style.SUCCESS(f'Enqueued job {job.pk}.'))
+            return
+        if options['repair']:
+            drift = repair_counters(options['database'])
+        else:
+            drift = find_counter_drift(options['database'])
+        for model, pk, name, stored, actual in drift:
+            self.stdout.write(f'{model.__name__} {pk} {name}: {stored}, actual {actual}')
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All counters are consistent.'))
+        elif options['repair']:
+            self.stdout.write(self.style.SUCCESS(f'Repaired {len(drift)} counters.'))
+        else:
+            raise CommandError(f'{len(drift)} counters drifted, run with --repair to fix them.')
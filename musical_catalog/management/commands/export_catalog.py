@@ -0,0 +1,36 @@
+import gzip
+import sys
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand
+
+from musical_catalog.exporter import export_lines
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams the whole catalog as NDJSON, one album with its artist and '
+        'tracklist per line. The output can be loaded back with import_catalog.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o',
+                            help='Output file, stdout by default. Gzipped if it ends with .gz.')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output.')
+        parser.add_argument('--since', type=int,
+                            help='Only export albums with a greater id (incremental export).')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        albums = 0
+        with ExitStack() as stack:
+            stream = stack.enter_context(open(output, 'wb')) if output else sys.stdout.buffer
+            if options['gzip'] or (output or '').endswith('.gz'):
+                stream = stack.enter_context(gzip.GzipFile(fileobj=stream, mode='wb'))
+            for line in export_lines(options['since'], options['chunk_size'], options['database']):
+                stream.write(line.encode())
+                albums += 1
+        if output:
+            self.stdout.write(self.style.SUCCESS(f'Exported {albums} albums to {output}'))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from musical_catalog.synthetic import generate_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills the database with a deterministic synthetic catalog for benchmarks. '
+        'The defaults create about 1M album tracks: 8 000 artists, 80 000 albums '
+        'and ~860 000 songs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--artists', type=int, default=8000)
+        parser.add_argument('--albums-per-artist', type=int, default=10)
+        parser.add_argument('--tracks-per-album', type=int, default=12)
+        parser.add_argument('--shared-songs', type=float, default=0.1,
+                            help='Share of tracks reusing a song from another album.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(done):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{done}/{options["artists"]} artists')
+
+        counts = generate_catalog(
+            artists=options['artists'],
+            albums_per_artist=options['albums_per_artist'],
+            tracks_per_album=options['tracks_per_album'],
+            shared_songs=options['shared_songs'],
+            seed=options['seed'],
+            using=options['database'],
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{value} {name}' for name, value in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary} in {elapsed:.1f}s'))
@@ -0,0 +1,87 @@
+import gzip
+import itertools
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from musical_catalog.importer import import_catalog, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams a JSONL or CSV catalog file (optionally gzipped) into the database '
+        'in bulk. Each line is either a track (artist, album, release_year, song) '
+        'or an album with its tracklist as written by export_catalog. With '
+        '--checkpoint, an interrupted import resumes after the last committed batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            help='Input format, guessed from the file name by default.')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Approximate number of tracks written per transaction.')
+        parser.add_argument('--checkpoint',
+                            help='File recording the progress of the import.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        name = path[:-3] if path.endswith('.gz') else path
+        input_format = options['format'] or ('csv' if name.endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint']
+        start = self.read_checkpoint(checkpoint, path) if checkpoint else 0
+        if start:
+            self.stdout.write(f'Resuming after record {start}')
+
+        started = time.perf_counter()
+
+        def progress(records_read, counts):
+            if checkpoint:
+                self.write_checkpoint(checkpoint, path, records_read)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{records_read} records, {counts["album_songs"]} tracks '
+                f'({counts["album_songs"] / elapsed:.0f} tracks/s)'
+            )
+
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            with opener(path, 'rt', encoding='utf-8', newline='') as stream:
+                records = itertools.islice(read_records(stream, input_format), start, None)
+                counts = import_catalog(
+                    records,
+                    batch_size=options['batch_size'],
+                    start=start,
+                    using=options['database'],
+                    progress=progress,
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{value} {name}' for name, value in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary} in {elapsed:.1f}s'))
+
+    def read_checkpoint(self, checkpoint, path):
+        try:
+            with open(checkpoint) as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            raise CommandError(f'{checkpoint} is not a valid checkpoint.')
+        if state.get('path') != os.path.abspath(path):
+            raise CommandError(f'{checkpoint} belongs to the import of {state.get("path")}.')
+        return state['records']
+
+    def write_checkpoint(self, checkpoint, path, records_read):
+        # Written next to the checkpoint and renamed, so a crash never leaves
+        # a truncated file behind.
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'path': os.path.abspath(path), 'records': records_read}, file)
+        os.replace(temporary, checkpoint)
@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from musical_catalog.jobs import work
+
+
+def run_process(database, poll_interval, burst):
+    """Runs jobs in a worker process until it receives SIGTERM or SIGINT."""
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    previous = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        return work(database, poll_interval, burst, should_stop=lambda: bool(stopping))
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the background jobs enqueued by the API (deleting albums, '
+        'replacing tracklists, rebuilds) in a pool of worker processes. '
+        'SIGTERM or Ctrl+C stops the workers after their current job.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Number of worker processes.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no job is left to run instead of waiting for more.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        worker_args = (options['database'], options['poll_interval'], options['burst'])
+        if options['processes'] == 1:
+            done = run_process(*worker_args)
+            self.stdout.write(self.style.SUCCESS(f'Ran {done} jobs.'))
+            return
+        # Forked processes must not share the connections of the parent.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=run_process, args=worker_args)
+            for _ in range(options['processes'])
+        ]
+
+        def stop(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGTERM)
+
+        # Ctrl+C reaches the children directly; SIGTERM is passed on to them.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, stop)
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Started {len(processes)} workers.')
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped.'))
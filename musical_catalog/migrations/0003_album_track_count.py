@@ -0,0 +1,35 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:19
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_track_count(apps, schema_editor):
+    Album = apps.get_model('musical_catalog', 'Album')
+    AlbumSong = apps.get_model('musical_catalog', 'AlbumSong')
+    last_track = (
+        AlbumSong.objects.filter(album=OuterRef('pk'))
+        .values('album')
+        .annotate(last=Max('_track_number'))
+        .values('last')
+    )
+    Album.objects.using(schema_editor.connection.alias).update(
+        track_count=Coalesce(Subquery(last_track), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musical_catalog', '0002_albumsong_unique_song_album'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='track_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество треков'),
+        ),
+        migrations.RunPython(fill_track_count, migrations.RunPython.noop),
+    ]
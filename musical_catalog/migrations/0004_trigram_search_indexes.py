@@ -0,0 +1,46 @@
+from django.db import migrations
+
+TRIGRAM_INDEXES = (
+    ('musical_catalog_artist', 'name'),
+    ('musical_catalog_album', 'title'),
+    ('musical_catalog_song', 'title'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    Creates pg_trgm GIN indexes for the search endpoint. Other databases, and
+    PostgreSQL servers shipped without the contrib extensions, fall back to a
+    plain substring search.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+            f'ON {table} USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musical_catalog', '0003_album_track_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
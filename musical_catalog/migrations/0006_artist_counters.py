@@ -0,0 +1,48 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_artist_counters(apps, schema_editor):
+    Artist = apps.get_model('musical_catalog', 'Artist')
+    Album = apps.get_model('musical_catalog', 'Album')
+    AlbumSong = apps.get_model('musical_catalog', 'AlbumSong')
+    albums = (
+        Album.objects.filter(artist=OuterRef('pk'))
+        .values('artist')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    tracks = (
+        AlbumSong.objects.filter(album__artist=OuterRef('pk'))
+        .values('album__artist')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    Artist.objects.using(schema_editor.connection.alias).update(
+        album_count=Coalesce(Subquery(albums), 0),
+        song_count=Coalesce(Subquery(tracks), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musical_catalog', '0005_album_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='album_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество альбомов'),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='song_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество песен'),
+        ),
+        migrations.RunPython(fill_artist_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+SEARCH_INDEXES = (
+    ('musical_catalog_artist', 'name'),
+    ('musical_catalog_album', 'title'),
+    ('musical_catalog_song', 'title'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Creates pg_trgm GIN indexes on UPPER(column) for the admin search, which
+    filters with ``icontains``, compiled by Django to ``UPPER(column) LIKE
+    UPPER(%term%)`` on PostgreSQL. Other databases, and PostgreSQL servers
+    shipped without the contrib extensions, scan the table.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_upper_trgm '
+            f'ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_upper_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musical_catalog', '0006_artist_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+TIMESTAMPED_MODELS = ('artist', 'album', 'song', 'albumsong')
+
+
+def timestamp_fields():
+    for model_name in TIMESTAMPED_MODELS:
+        yield migrations.AddField(
+            model_name=model_name,
+            name='created_at',
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now, verbose_name='Создано'
+            ),
+            preserve_default=False,
+        )
+        yield migrations.AddField(
+            model_name=model_name,
+            name='updated_at',
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Изменено'
+            ),
+            preserve_default=False,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musical_catalog', '0007_admin_search_indexes'),
+    ]
+
+    operations = [
+        *timestamp_fields(),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20, verbose_name='Модель')),
+                ('object_id', models.BigIntegerField(verbose_name='Идентификатор')),
+                ('deleted_at', models.DateTimeField(
+                    db_index=True, default=django.utils.timezone.now, verbose_name='Удалено'
+                )),
+            ],
+            options={
+                'verbose_name': 'Удалённая запись',
+                'verbose_name_plural': 'Удалённые записи',
+            },
+        ),
+    ]
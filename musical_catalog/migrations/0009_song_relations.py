@@ -0,0 +1,42 @@
+# Generated by Django 4.2.4 on 2026-10-18 12:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_song_relations(apps, schema_editor):
+    schema_editor.execute(
+        'INSERT INTO musical_catalog_songrelation (song_id, related_id, shared_albums) '
+        'SELECT a.song_id, b.song_id, COUNT(*) FROM musical_catalog_albumsong a '
+        'JOIN musical_catalog_albumsong b ON b.album_id = a.album_id AND b.song_id <> a.song_id '
+        'GROUP BY a.song_id, b.song_id'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musical_catalog', '0008_change_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SongRelation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shared_albums', models.PositiveIntegerField(verbose_name='Общих альбомов')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='musical_catalog.song', verbose_name='Связанная песня')),
+                ('song', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='relations', to='musical_catalog.song', verbose_name='Песня')),
+            ],
+            options={
+                'verbose_name': 'Связанная песня',
+                'verbose_name_plural': 'Связанные песни',
+                'indexes': [models.Index(fields=['song', '-shared_albums', 'related'], name='song_relation_top_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='songrelation',
+            constraint=models.UniqueConstraint(fields=('song', 'related'), name='unique_song_relation'),
+        ),
+        migrations.RunPython(fill_song_relations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.4 on 2026-10-18 13:26
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_heartbeats(apps, schema_editor):
+    # Running jobs claimed before the heartbeat last signalled when they started.
+    Job = apps.get_model('musical_catalog', 'Job')
+    Job.objects.using(schema_editor.connection.alias).filter(status='running').update(
+        heartbeat_at=F('started_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('musical_catalog', '0011_stats_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последний сигнал'),
+        ),
+        migrations.RunPython(fill_heartbeats, migrations.RunPython.noop),
+    ]
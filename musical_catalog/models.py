@@ -1,23 +1,63 @@
-from django.db import models
-from django.db.models.signals import post_delete
+import threading
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
+from django.db.models import Case, F, Q, Subquery, Value, When
+from django.db.models.signals import post_delete, pre_delete
 from django.dispatch import receiver
+from django.utils import timezone
+
+from .signals import tracklist_changed
 
+# Renumbered tracks are temporarily moved past this offset so that shifting a
+# tracklist never trips the (album, _track_number) unique constraint.
+TRACK_NUMBER_SHIFT = 1_000_000
 
-class Artist(models.Model):
+
+class TimestampedModel(models.Model):
+    """
+    Abstract model with the creation and last modification times of a row.
+    ``updated_at`` is indexed for the change feed; bulk UPDATEs set it
+    themselves, since auto_now only applies to save().
+    """
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Изменено')
+
+    class Meta:
+        abstract = True
+
+
+class Artist(TimestampedModel):
     """
     Model representing a musical artist.
     """
     name = models.CharField(max_length=100, verbose_name='Имя')
+    album_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество альбомов'
+    )
+    # Tracks on the artist's albums: a song on two albums is counted twice.
+    song_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество песен'
+    )
 
     class Meta:
         verbose_name = 'Исполнитель'
         verbose_name_plural = 'Исполнители'
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            kwargs = fields_to_update(self, ('album_count', 'song_count'), kwargs)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
 
-class Album(models.Model):
+class Album(TimestampedModel):
     """
     Model representing a musical album which includes details about the title, 
     its associated artist, and the year of release.
@@ -30,17 +70,48 @@ class Album(models.Model):
         verbose_name='Исполнитель'
     )
     release_year = models.PositiveIntegerField(verbose_name='Год выпуска')
+    track_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество треков'
+    )
 
     class Meta:
         verbose_name = 'Альбом'
         verbose_name_plural = 'Альбомы'
         unique_together = ('title', 'artist')
+        # Back the ?artist= and ?release_year__gte= filters of the album list.
+        indexes = [
+            models.Index(fields=['artist', 'release_year'], name='album_artist_year_idx'),
+            models.Index(fields=['release_year'], name='album_release_year_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The counters of the artist change in the same transaction as the album.
+        using = kwargs.get('using') or router.db_for_write(Album, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            previous = None
+            if not self._state.adding:
+                previous = Album.objects.using(using).filter(pk=self.pk).values_list(
+                    'artist_id', 'track_count'
+                ).first()
+            if previous is None:
+                super().save(*args, **kwargs)
+                add_to_artist_counters({self.artist_id: (1, self.track_count)}, using)
+                return
+            artist_id, self.track_count = previous
+            super().save(*args, **fields_to_update(self, ('track_count',), kwargs))
+            if artist_id != self.artist_id:
+                add_to_artist_counters({
+                    artist_id: (-1, -self.track_count),
+                    self.artist_id: (1, self.track_count),
+                }, using)
 
     def __str__(self):
         return self.title
 
 
-class Song(models.Model):
+class Song(TimestampedModel):
     """
     Model representing a musical song. Each song can be part of multiple albums.
     """
@@ -55,7 +126,7 @@ class Song(models.Model):
         return self.title
 
 
-class AlbumSong(models.Model): 
+class AlbumSong(TimestampedModel):
     """ 
     Intermediate model used to capture the many-to-many relationship  
     between songs and albums. Also captures the track number of each song in an album. 
@@ -75,24 +146,472 @@ class AlbumSong(models.Model):
             )
         ]
 
-    def save(self, *args, **kwargs): 
-    # If the instance does not have a set track number (i.e., it's new), we compute the next available track number
-        if not self._track_number:
-            last_track = AlbumSong.objects.filter(album=self.album).order_by('-_track_number').first() 
-            if last_track: 
-                self._track_number = last_track._track_number + 1 
-            else: 
-                self._track_number = 1 
-        super(AlbumSong, self).save(*args, **kwargs)
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(AlbumSong, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            previous = row = None
+            if not self._state.adding:
+                row = AlbumSong.objects.using(using).filter(pk=self.pk).values_list(
+                    'album_id', 'song_id', '_track_number'
+                ).first()
+                previous = row[:2] if row else None
+            # A track moved to another album is deleted from the old one and
+            # added to the new one, as far as numbers and counters go.
+            moved = row is not None and row[0] != self.album_id
+            if moved:
+                # Both counter rows are locked in id order, so that opposite
+                # moves cannot deadlock.
+                list(Album.objects.using(using).select_for_update().filter(
+                    pk__in=(row[0], self.album_id)
+                ).order_by('pk').values_list('pk', flat=True))
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], '_track_number'}
+            changed = previous is not None and previous != (self.album_id, self.song_id)
+            if changed:
+                # Uncounted before the update, while the album does not hold
+                # the new song yet, so that no pair with it is uncounted.
+                remove_song_relations([previous], using)
+            # A new track takes the next number from the album's counter row, which stays
+            # locked until the insert commits, so concurrent inserts never collide.
+            if not self._track_number or moved:
+                self._track_number = allocate_track_numbers(self.album_id, using=using)[0]
+            super().save(*args, **kwargs)
+            if moved:
+                close_track_gaps(row[0], [row[2]], using)
+            if previous is None or changed:
+                add_song_relations([(self.album_id, self.song_id)], using)
  
     def __str__(self): 
         return f'{self.song.title} (Track {self._track_number} in {self.album.title})'
 
+
+class Tombstone(models.Model):
+    """
+    Model recording a deleted catalog row, so that the change feed can report
+    deletions. ``model`` is the model name of the row, e.g. ``albumsong``.
+    """
+    model = models.CharField(max_length=20, verbose_name='Модель')
+    object_id = models.BigIntegerField(verbose_name='Идентификатор')
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Удалено')
+
+    class Meta:
+        verbose_name = 'Удалённая запись'
+        verbose_name_plural = 'Удалённые записи'
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
+
+
+class SongRelation(models.Model):
+    """
+    Model counting the albums two songs share, the basis of the related songs
+    of a song. A pair is stored in both directions, and only while the songs
+    share at least one album. Kept current by add_song_relations() and
+    remove_song_relations(), rebuilt by ``manage.py build_song_relations``.
+    """
+    # The unique constraint indexes song first, no separate index is needed.
+    song = models.ForeignKey(
+        Song,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='relations',
+        verbose_name='Песня'
+    )
+    related = models.ForeignKey(
+        Song,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Связанная песня'
+    )
+    shared_albums = models.PositiveIntegerField(verbose_name='Общих альбомов')
+
+    class Meta:
+        verbose_name = 'Связанная песня'
+        verbose_name_plural = 'Связанные песни'
+        constraints = [
+            models.UniqueConstraint(fields=['song', 'related'], name='unique_song_relation'),
+        ]
+        # Serves the top related songs of a song straight from the index.
+        indexes = [
+            models.Index(fields=['song', '-shared_albums', 'related'], name='song_relation_top_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.song_id} -> {self.related_id} ({self.shared_albums})'
+
+
+class Job(models.Model):
+    """
+    Model representing a background job run by ``manage.py run_worker``:
+    the name of its handler, the keyword arguments to call it with and its
+    progress. Jobs sharing a ``key`` (e.g. ``album:42``) run one at a time,
+    in the order they were enqueued. The worker running a job refreshes its
+    ``heartbeat_at``; ``attempts`` tells its successive runs apart.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (SUCCEEDED, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    kind = models.CharField(max_length=50, verbose_name='Тип')
+    payload = models.JSONField(default=dict, verbose_name='Параметры')
+    key = models.CharField(max_length=100, null=True, blank=True, verbose_name='Ключ')
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED, verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name='Максимум попыток')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Не раньше')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начато')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Последний сигнал')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершено')
+    result = models.JSONField(null=True, blank=True, verbose_name='Результат')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            # The queue: runnable jobs in order, and the unfinished jobs of a key.
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+            models.Index(fields=['key', 'status'], name='job_key_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
+
+
+class StatsSnapshot(models.Model):
+    """
+    Model holding precomputed catalog statistics, served by /api/stats/
+    instead of live aggregates when STATS_FROM_SNAPSHOT is on. Only the
+    latest snapshot is kept; ``manage.py build_stats_snapshot`` writes it.
+    """
+    data = models.JSONField(verbose_name='Статистика')
+    computed_at = models.DateTimeField(verbose_name='Рассчитано')
+
+    class Meta:
+        verbose_name = 'Снимок статистики'
+        verbose_name_plural = 'Снимки статистики'
+
+    def __str__(self):
+        return f'{self.computed_at:%Y-%m-%d %H:%M:%S}'
+
+
+def fields_to_update(instance, counters, kwargs):
+    """
+    Returns the save() kwargs that update every field of an existing row but
+    the ``counters``, which only change through F() updates: an instance
+    loaded before a concurrent write must not save its stale counts back.
+    """
+    if kwargs.get('update_fields') is not None or kwargs.get('force_insert'):
+        return kwargs
+    return {**kwargs, 'update_fields': [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in counters
+    ]}
+
+
+def allocate_track_numbers(album_id, count=1, using=DEFAULT_DB_ALIAS):
+    """
+    Atomically reserves ``count`` consecutive track numbers at the end of the
+    album and returns them as a range.
+
+    The album's ``track_count`` is bumped with a single UPDATE ... RETURNING, so
+    allocation costs one round trip and the counter row stays locked only until
+    the caller's transaction commits; the artist's ``song_count`` follows with
+    one more UPDATE. Call it inside that transaction together with the inserts
+    that use the numbers.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(Album._meta.db_table)
+    now = timezone.now()
+    with transaction.atomic(using=using, savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET track_count = track_count + %s, updated_at = %s '
+                f'WHERE id = %s RETURNING track_count, artist_id',
+                [count, connection.ops.adapt_datetimefield_value(now), album_id],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise Album.DoesNotExist(f'Album {album_id} does not exist.')
+        track_count, artist_id = row
+        Artist.objects.using(using).filter(pk=artist_id).update(
+            song_count=F('song_count') + count, updated_at=now
+        )
+    return range(track_count - count + 1, track_count + 1)
+
+
+def add_to_artist_counters(counters, using=DEFAULT_DB_ALIAS):
+    """
+    Adds ``{artist_id: (albums, songs)}`` to the ``album_count`` and
+    ``song_count`` of the artists with a single UPDATE. Negative numbers
+    subtract.
+    """
+    if not counters:
+        return
+    Artist.objects.using(using).filter(pk__in=counters).update(
+        album_count=F('album_count') + Case(*[
+            When(pk=artist_id, then=Value(albums)) for artist_id, (albums, _) in counters.items()
+        ]),
+        song_count=F('song_count') + Case(*[
+            When(pk=artist_id, then=Value(songs)) for artist_id, (_, songs) in counters.items()
+        ]),
+        updated_at=timezone.now(),
+    )
+
+
+def append_tracks(album_id, song_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Adds the songs to the end of the album, in the given order, with a single
+    counter bump and a single multi-row INSERT.
+    """
+    with transaction.atomic(using=using):
+        numbers = allocate_track_numbers(album_id, len(song_ids), using)
+        tracks = AlbumSong.objects.using(using).bulk_create(
+            AlbumSong(album_id=album_id, song_id=song_id, _track_number=number)
+            for number, song_id in zip(numbers, song_ids)
+        )
+        add_song_relations([(album_id, song_id) for song_id in song_ids], using)
+    tracklist_changed.send(sender=AlbumSong, album_id=album_id, song_ids=song_ids, using=using)
+    return tracks
+
+
+def replace_tracks(album_id, song_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Makes ``song_ids`` the whole tracklist of the album, in the given order.
+
+    Tracks of songs that are no longer listed are deleted (through the regular
+    delete signals), the remaining ones keep their rows and get their new
+    numbers in one pass, and the newly listed songs are bulk inserted.
+    """
+    tracks = AlbumSong.objects.using(using).filter(album_id=album_id)
+    with transaction.atomic(using=using):
+        artist_id = Album.objects.using(using).select_for_update().filter(
+            pk=album_id
+        ).values_list('artist_id', flat=True).first()
+        current = set(tracks.values_list('song_id', flat=True))
+        if current - set(song_ids):
+            tracks.exclude(song_id__in=song_ids).delete()
+        positions = {song_id: number for number, song_id in enumerate(song_ids, start=1)}
+        kept = [song_id for song_id in song_ids if song_id in current]
+        now = timezone.now()
+        if kept:
+            tracks.update(_track_number=F('_track_number') + TRACK_NUMBER_SHIFT)
+            tracks.update(updated_at=now, _track_number=Case(*[
+                When(song_id=song_id, then=Value(positions[song_id])) for song_id in kept
+            ]))
+        added = [song_id for song_id in song_ids if song_id not in current]
+        AlbumSong.objects.using(using).bulk_create(
+            AlbumSong(album_id=album_id, song_id=song_id, _track_number=positions[song_id])
+            for song_id in added
+        )
+        add_song_relations([(album_id, song_id) for song_id in added], using)
+        Album.objects.using(using).filter(pk=album_id).update(
+            track_count=len(song_ids), updated_at=now
+        )
+        # The deleted tracks were already subtracted by close_track_gaps().
+        if added:
+            Artist.objects.using(using).filter(pk=artist_id).update(
+                song_count=F('song_count') + len(added), updated_at=now
+            )
+    tracklist_changed.send(sender=AlbumSong, album_id=album_id, song_ids=added, using=using)
+
+
+def add_song_relations(tracks, using=DEFAULT_DB_ALIAS):
+    """
+    Counts the albums shared through new tracks, given as ``(album_id,
+    song_id)`` pairs of rows already inserted: every new track relates its
+    song to the other songs of its album, in both directions. One INSERT ...
+    ON CONFLICT for the whole batch, whatever the number of albums.
+    """
+    if not tracks:
+        return
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    relations, album_songs = quote(SongRelation._meta.db_table), quote(AlbumSong._meta.db_table)
+    values = ', '.join(['(%s, %s)'] * len(tracks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH new (album_id, song_id) AS (VALUES {values}), '
+            # Pairs starting from a new track...
+            f'pairs (song_id, related_id) AS ('
+            f'SELECT n.song_id, t.song_id FROM new n '
+            f'JOIN {album_songs} t ON t.album_id = n.album_id AND t.song_id <> n.song_id '
+            f'UNION ALL '
+            # ...and pairs ending on one, from the tracks that were already there.
+            f'SELECT t.song_id, n.song_id FROM new n '
+            f'JOIN {album_songs} t ON t.album_id = n.album_id '
+            f'WHERE (t.album_id, t.song_id) NOT IN (SELECT album_id, song_id FROM new)) '
+            f'INSERT INTO {relations} (song_id, related_id, shared_albums) '
+            f'SELECT song_id, related_id, COUNT(*) FROM pairs '
+            f'GROUP BY song_id, related_id '
+            f'ON CONFLICT (song_id, related_id) DO UPDATE '
+            f'SET shared_albums = {relations}.shared_albums + EXCLUDED.shared_albums',
+            [value for track in tracks for value in track],
+        )
+
+
+def remove_song_relations(tracks, using=DEFAULT_DB_ALIAS):
+    """
+    Uncounts the albums shared through deleted tracks, given as ``(album_id,
+    song_id)`` pairs of rows already deleted (or about to be: a song is never
+    related to itself), with one UPDATE per album, and drops the pairs of
+    songs left without a shared album.
+    """
+    if not tracks:
+        return
+    removed = defaultdict(set)
+    for album_id, song_id in tracks:
+        removed[album_id].add(song_id)
+    relations = SongRelation.objects.using(using)
+    for album_id, song_ids in removed.items():
+        remaining = AlbumSong.objects.using(using).filter(album_id=album_id).values('song_id')
+        relations.filter(
+            Q(song_id__in=song_ids, related_id__in=song_ids)
+            | Q(song_id__in=song_ids, related_id__in=remaining)
+            | Q(song_id__in=remaining, related_id__in=song_ids)
+        ).update(shared_albums=F('shared_albums') - 1)
+    song_ids = set().union(*removed.values())
+    relations.filter(Q(song_id__in=song_ids) | Q(related_id__in=song_ids), shared_albums=0).delete()
+
+
+def close_track_gaps(album_id, deleted_numbers, using=DEFAULT_DB_ALIAS):
+    """
+    Shifts the tracks that followed ``deleted_numbers`` down so that the album
+    is numbered 1..n again.
+
+    Runs as set-based UPDATEs whatever the album size: the affected rows are
+    first moved past TRACK_NUMBER_SHIFT, so that no intermediate state collides
+    on the (album, _track_number) unique constraint, and then moved back down by
+    the number of deleted tracks preceding them.
+    """
+    deleted_numbers = sorted(deleted_numbers)
+    tracks = AlbumSong.objects.using(using).filter(album_id=album_id)
+    now = timezone.now()
+    with transaction.atomic(using=using, savepoint=False):
+        # Updating the counter first locks the album row, which serializes the
+        # shift with concurrent allocate_track_numbers() calls.
+        Album.objects.using(using).filter(pk=album_id).update(
+            track_count=F('track_count') - len(deleted_numbers), updated_at=now
+        )
+        Artist.objects.using(using).filter(albums=album_id).update(
+            song_count=F('song_count') - len(deleted_numbers), updated_at=now
+        )
+        moved = tracks.filter(_track_number__gt=deleted_numbers[0]).update(
+            _track_number=F('_track_number') + TRACK_NUMBER_SHIFT
+        )
+        if not moved:
+            return
+        # The renumbered tracks show up in the change feed.
+        tracks.filter(_track_number__gt=TRACK_NUMBER_SHIFT).update(
+            updated_at=now,
+            _track_number=Case(*[
+                When(
+                    _track_number__gt=TRACK_NUMBER_SHIFT + number,
+                    then=F('_track_number') - TRACK_NUMBER_SHIFT - preceding,
+                )
+                for preceding, number in reversed(list(enumerate(deleted_numbers, start=1)))
+            ]),
+        )
+    tracklist_changed.send(sender=AlbumSong, album_id=album_id, song_ids=(), using=using)
+
+
+def deletes_whole_album(origin):
+    """Whether the delete() call that started the collection removes whole albums."""
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return issubclass(model, (Album, Artist))
+
+
+class _TrackDeletion:
+    """
+    Tracks removed by a single delete() call, so that every album is
+    renumbered once and the song relations are updated once after the whole
+    batch has been deleted.
+    """
+
+    def __init__(self, origin):
+        self.origin = origin
+        # Cascades from Album/Artist remove the whole tracklist: nothing to renumber.
+        self.renumber = not deletes_whole_album(origin)
+        self.pending = 0
+        self.numbers = defaultdict(list)
+        self.tracks = []
+
+    def add(self, track):
+        self.pending += 1
+        self.numbers[track.album_id].append(track._track_number)
+        self.tracks.append((track.album_id, track.song_id))
+
+
+_deletions = threading.local()
+
+
+@receiver(pre_delete, sender=Album)
+def update_artist_counters(sender, instance, using, origin=None, **kwargs):
+    """
+    Subtracts an album about to be deleted and its tracks from the counters of
+    its artist. The counts are read from the album row, not from the instance,
+    which may have been loaded before tracks were added.
+    """
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if issubclass(model, Artist):
+        # The artist is deleted too.
+        return
+    album = Album.objects.using(using).filter(pk=instance.pk)
+    Artist.objects.using(using).filter(albums=instance.pk).update(
+        album_count=F('album_count') - 1,
+        song_count=F('song_count') - Subquery(album.values('track_count')),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(pre_delete, sender=AlbumSong)
+def collect_deleted_track(sender, instance, origin=None, **kwargs):
+    """Remembers a track that is about to be deleted."""
+    if origin is None:
+        return
+    deletion = getattr(_deletions, 'current', None)
+    if deletion is None or deletion.origin is not origin:
+        deletion = _deletions.current = _TrackDeletion(origin)
+    deletion.add(instance)
+
+
+@receiver(post_delete, sender=AlbumSong)
+def update_track_numbering(sender, instance, using, origin=None, **kwargs):
+    """
+    Updates the track numbering and the song relations after the last track
+    of a delete() call is deleted.
+    """
+    if origin is None:
+        close_track_gaps(instance.album_id, [instance._track_number], using)
+        remove_song_relations([(instance.album_id, instance.song_id)], using)
+        return
+    deletion = getattr(_deletions, 'current', None)
+    if deletion is None or deletion.origin is not origin:
+        return
+    deletion.pending -= 1
+    if deletion.pending:
+        return
+    _deletions.current = None
+    if deletion.renumber:
+        for album_id, numbers in deletion.numbers.items():
+            close_track_gaps(album_id, numbers, using)
+    remove_song_relations(deletion.tracks, using)
+
+
+@receiver(post_delete, sender=Artist)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Song)
 @receiver(post_delete, sender=AlbumSong)
-def update_track_numbering(sender, instance, **kwargs):
-    """Updates the track numbering after a track is deleted."""
-    # Retrieve all tracks of the album that come after the deleted one, and update their numbering
-    tracks_after_deleted = AlbumSong.objects.filter(album=instance.album, _track_number__gt=instance._track_number)
-    for track in tracks_after_deleted:
-        track._track_number -= 1
-        track.save()
\ No newline at end of file
+def record_tombstone(sender, instance, using, **kwargs):
+    """Records the deletion of a catalog row for the change feed."""
+    Tombstone.objects.using(using).create(model=sender._meta.model_name, object_id=instance.pk)
@@ -0,0 +1,45 @@
+"""
+Batch build of the song co-occurrence table.
+
+The table is kept current by the track writes themselves (see
+add_song_relations() and remove_song_relations()); a rebuild is only needed
+to fill it the first time or to repair it. The rebuild aggregates the pairs
+in the database with one INSERT ... SELECT ... GROUP BY per chunk of songs,
+so no row goes through Python and each statement stays bounded.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+
+from .models import AlbumSong, SongRelation
+
+
+def build_song_relations(chunk_size=10000, using=DEFAULT_DB_ALIAS, progress=None):
+    """
+    Recomputes the whole song co-occurrence table in one transaction, ``chunk_size``
+    song ids at a time. ``progress`` is called with the last song id of every chunk.
+    On PostgreSQL the track table is locked against writes for the duration.
+    Returns the number of rows written.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    relations, album_songs = quote(SongRelation._meta.db_table), quote(AlbumSong._meta.db_table)
+    written = 0
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Track writes would update the pairs being rebuilt.
+            cursor.execute(f'LOCK TABLE {album_songs} IN SHARE MODE')
+        SongRelation.objects.using(using).all().delete()
+        last = AlbumSong.objects.using(using).aggregate(last=Max('song_id'))['last'] or 0
+        for start in range(0, last, chunk_size):
+            cursor.execute(
+                f'INSERT INTO {relations} (song_id, related_id, shared_albums) '
+                f'SELECT a.song_id, b.song_id, COUNT(*) FROM {album_songs} a '
+                f'JOIN {album_songs} b ON b.album_id = a.album_id AND b.song_id <> a.song_id '
+                f'WHERE a.song_id > %s AND a.song_id <= %s '
+                f'GROUP BY a.song_id, b.song_id',
+                [start, start + chunk_size],
+            )
+            written += cursor.rowcount
+            if progress is not None:
+                progress(min(start + chunk_size, last))
+    return written
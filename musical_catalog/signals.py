@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# Sent when tracks of an album are written or renumbered in bulk, bypassing the
+# per-instance post_save/post_delete signals. Arguments: ``album_id``,
+# ``song_ids`` (songs added to the album, if any) and ``using``.
+tracklist_changed = Signal()
+
+# Sent after rows were bulk loaded into the catalog (imports, synthetic data)
+# without per-instance signals. Arguments: ``using``.
+catalog_loaded = Signal()
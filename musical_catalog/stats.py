@@ -0,0 +1,92 @@
+"""
+Aggregate statistics of the catalog for dashboards.
+
+Each statistic is a single aggregate query whose result is a few hundred
+rows at most, whatever the size of the catalog. The track and song numbers
+come from the denormalized counters (``Album.track_count``,
+``Artist.song_count``), so no statistic reads the track table: albums per
+track count is a GROUP BY over the albums and the top artists an ORDER BY
+over the artists.
+
+On very large catalogs even those scans can be moved out of the request:
+with STATS_FROM_SNAPSHOT on, the statistics are read from the latest
+StatsSnapshot, which ``manage.py build_stats_snapshot`` writes.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Album, Artist, StatsSnapshot
+
+# Artists kept in a snapshot; the API serves at most this many.
+TOP_ARTISTS_LIMIT = 100
+
+
+def albums_per_year(using=DEFAULT_DB_ALIAS):
+    return list(
+        Album.objects.using(using).values('release_year').annotate(albums=Count('pk')).order_by(
+            'release_year'
+        )
+    )
+
+
+def tracks_per_album(using=DEFAULT_DB_ALIAS):
+    return [
+        {'tracks': tracks, 'albums': albums}
+        for tracks, albums in Album.objects.using(using).values_list('track_count').annotate(
+            albums=Count('pk')
+        ).order_by('track_count')
+    ]
+
+
+def top_artists(using=DEFAULT_DB_ALIAS):
+    return list(
+        Artist.objects.using(using).order_by('-song_count', 'pk').values(
+            'id', 'name', 'album_count', 'song_count'
+        )[:TOP_ARTISTS_LIMIT]
+    )
+
+
+STATISTICS = {
+    'albums_per_year': albums_per_year,
+    'tracks_per_album': tracks_per_album,
+    'top_artists': top_artists,
+}
+
+
+def compute_stats(names=None, using=DEFAULT_DB_ALIAS):
+    """
+    Computes the ``names`` statistics, all of them by default, from the
+    catalog. Returns them as a dict, with the time they were computed at
+    under ``computed_at``.
+    """
+    return {
+        'computed_at': timezone.now(),
+        **{name: STATISTICS[name](using) for name in names or STATISTICS},
+    }
+
+
+def build_snapshot(using=DEFAULT_DB_ALIAS):
+    """Computes every statistic into a new StatsSnapshot and drops the older ones."""
+    stats = compute_stats(using=using)
+    computed_at = stats.pop('computed_at')
+    with transaction.atomic(using=using):
+        snapshot = StatsSnapshot.objects.using(using).create(data=stats, computed_at=computed_at)
+        StatsSnapshot.objects.using(using).exclude(pk=snapshot.pk).delete()
+    return snapshot
+
+
+def get_stats(names=None, using=DEFAULT_DB_ALIAS):
+    """
+    Returns the ``names`` statistics as compute_stats() does, from the latest
+    snapshot if STATS_FROM_SNAPSHOT is on and one was built, live otherwise.
+    """
+    if settings.STATS_FROM_SNAPSHOT:
+        snapshot = StatsSnapshot.objects.using(using).order_by('-computed_at').first()
+        if snapshot is not None:
+            return {
+                'computed_at': snapshot.computed_at,
+                **{name: snapshot.data[name] for name in names or STATISTICS},
+            }
+    return compute_stats(names, using)
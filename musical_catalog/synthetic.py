@@ -0,0 +1,107 @@
+"""
+Deterministic synthetic catalog used by the benchmarks.
+
+The same arguments always produce the same artists, albums, songs and
+tracklists, so runs on different machines or branches are comparable.
+"""
+import random
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Album, AlbumSong, Artist, Song, add_song_relations
+from .signals import catalog_loaded
+
+ADJECTIVES = (
+    'Amber', 'Black', 'Blue', 'Broken', 'Burning', 'Silent', 'Crimson', 'Electric',
+    'Endless', 'Fading', 'Frozen', 'Golden', 'Hidden', 'Hollow', 'Velvet', 'Lonely',
+    'Lost', 'Midnight', 'Neon', 'Northern', 'Paper', 'Purple', 'Restless', 'Scarlet',
+    'Secret', 'Shining', 'Silver', 'Sleeping', 'Southern', 'Stolen', 'Wild', 'Wooden',
+)
+NOUNS = (
+    'Anthem', 'Avenue', 'Ballad', 'Bridge', 'Canyon', 'City', 'Dream', 'Echo',
+    'Engine', 'Fire', 'Garden', 'Harbor', 'Heart', 'Highway', 'Horizon', 'Island',
+    'Kingdom', 'Lights', 'Machine', 'Mirror', 'Mountain', 'Ocean', 'Parade', 'Radio',
+    'River', 'Road', 'Shadow', 'Signal', 'Sky', 'Storm', 'Summer', 'Thunder',
+    'Tide', 'Valley', 'Voices', 'Wave', 'Window', 'Winter', 'Wolves', 'Youth',
+)
+
+
+def make_title(rng, words=2):
+    return ' '.join([rng.choice(ADJECTIVES)] + [rng.choice(NOUNS) for _ in range(words - 1)])
+
+
+def generate_catalog(artists=1000, albums_per_artist=10, tracks_per_album=12,
+                     shared_songs=0.1, seed=0, chunk_size=100,
+                     using=DEFAULT_DB_ALIAS, progress=None):
+    """
+    Bulk inserts ``artists`` artists with ``albums_per_artist`` albums each and
+    about ``tracks_per_album`` tracks per album. A ``shared_songs`` share of the
+    tracks reuse a song that is already on another album (compilations, live
+    albums), the rest are new songs.
+
+    Artists are written ``chunk_size`` at a time in one transaction per chunk,
+    so memory stays bounded whatever the scale. ``progress`` is called with the
+    number of artists written so far. Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    counts = {'artists': 0, 'albums': 0, 'songs': 0, 'album_songs': 0}
+    recent_songs = []
+    for start in range(0, artists, chunk_size):
+        size = min(chunk_size, artists - start)
+        with transaction.atomic(using=using):
+            artist_rows = [Artist(name=f'{make_title(rng)} {start + i + 1}') for i in range(size)]
+            album_rows, lengths = [], []
+            for artist in artist_rows:
+                titles = set()
+                for _ in range(albums_per_artist):
+                    title = make_title(rng, rng.randint(1, 3))
+                    while title in titles:
+                        title = f'{title} II'
+                    titles.add(title)
+                    length = rng.randint(max(1, tracks_per_album // 2), tracks_per_album * 3 // 2)
+                    album_rows.append(Album(
+                        title=title,
+                        artist=artist,
+                        release_year=rng.randint(1960, 2023),
+                        track_count=length,
+                    ))
+                    lengths.append(length)
+                    # Artists are inserted with their final counters.
+                    artist.album_count += 1
+                    artist.song_count += length
+            Artist.objects.using(using).bulk_create(artist_rows)
+            album_rows = Album.objects.using(using).bulk_create(album_rows)
+
+            tracklists, new_songs = [], []
+            for album, length in zip(album_rows, lengths):
+                tracklist = []
+                for _ in range(length):
+                    if recent_songs and rng.random() < shared_songs:
+                        song = rng.choice(recent_songs)
+                        if song not in tracklist:
+                            tracklist.append(song)
+                            continue
+                    song = Song(title=make_title(rng, rng.randint(1, 3)))
+                    new_songs.append(song)
+                    tracklist.append(song)
+                tracklists.append((album, tracklist))
+            Song.objects.using(using).bulk_create(new_songs)
+
+            track_rows = []
+            for album, tracklist in tracklists:
+                track_rows.extend(
+                    AlbumSong(album=album, song=song, _track_number=number)
+                    for number, song in enumerate(tracklist, start=1)
+                )
+            AlbumSong.objects.using(using).bulk_create(track_rows)
+            add_song_relations([(track.album_id, track.song_id) for track in track_rows], using)
+
+        recent_songs = (recent_songs + new_songs)[-10000:]
+        counts['artists'] += len(artist_rows)
+        counts['albums'] += len(album_rows)
+        counts['songs'] += len(new_songs)
+        counts['album_songs'] += len(track_rows)
+        if progress is not None:
+            progress(start + size)
+    catalog_loaded.send(sender=Album, using=using)
+    return counts
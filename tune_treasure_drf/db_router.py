@@ -0,0 +1,69 @@
+"""
+Routing of catalog reads to read replicas.
+
+Reads go to a replica only inside ``use_replicas()``, which the API enters for
+GET requests that are allowed to see slightly stale data. Everything else,
+including every write and the reads made while writing (track number
+allocation, renumbering, validation), uses the primary ``default`` database.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_primary_pinned = ContextVar('primary_pinned', default=False)
+
+
+@contextmanager
+def use_replicas():
+    """Lets the reads made in the block go to a replica, if any is configured."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def pin_primary():
+    """
+    Keeps every read of the block on the primary, even inside use_replicas(),
+    for code that must see the writes of its own open transaction.
+    """
+    token = _primary_pinned.set(True)
+    try:
+        yield
+    finally:
+        _primary_pinned.reset(token)
+
+
+def replicas_in_use():
+    return _replica_reads.get() and not _primary_pinned.get() and bool(settings.DATABASE_REPLICAS)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads inside use_replicas() to a random replica from
+    ``DATABASE_REPLICAS`` and all writes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects are read from the database the instance came from.
+            return instance._state.db
+        if replicas_in_use():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,89 @@
+"""
+Documentation routes: the OpenAPI schema, Swagger UI and ReDoc.
+
+Generating the schema introspects every viewset and serializer of the API,
+which costs hundreds of milliseconds of CPU. It is built once instead, by
+``manage.py build_schema`` into OPENAPI_SCHEMA_PATH, or on the first request
+when that file does not exist, and then served from memory with an ETag.
+This module is only imported when API_DOCS is set, so workers that serve the
+API alone never load drf_yasg.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import re_path
+from django.utils.http import parse_etags
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, yaml_sane_dump
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+INFO = openapi.Info(
+    title='TuneTreasure API',
+    default_version='v1',
+    description='Документация для приложения cats проекта TuneTreasureDRF',
+    contact=openapi.Contact(email='admin@tune.com'),
+    license=openapi.License(name='BSD License'),
+)
+
+schema_view = get_schema_view(
+    INFO,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+
+def generate_schema():
+    """Introspects the API and returns its schema as indented JSON bytes."""
+    schema = schema_view.generator_class(INFO).get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[], pretty=True).encode(schema)
+
+
+@lru_cache(maxsize=None)
+def get_schema(format='json'):
+    """
+    The schema in ``format`` ('json' or 'yaml') and its ETag. The JSON comes
+    from the built file, or is generated on the first call without it.
+    """
+    if format == 'yaml':
+        data = json.loads(get_schema('json')[0], object_pairs_hook=OrderedDict)
+        content = yaml_sane_dump(data, binary=True)
+    elif Path(settings.OPENAPI_SCHEMA_PATH).exists():
+        content = Path(settings.OPENAPI_SCHEMA_PATH).read_bytes()
+    else:
+        content = generate_schema()
+    return content, '"%s"' % hashlib.sha256(content).hexdigest()
+
+
+class SchemaView(schema_view):
+    """
+    Serves the precomputed schema to the JSON and YAML renderers; the UI
+    pages themselves are rendered by drf_yasg without generating it.
+    """
+
+    def get(self, request, version='', format=None):
+        renderer = request.accepted_renderer
+        if renderer.media_type == 'text/html':
+            return super().get(request, version, format)
+        content, etag = get_schema('yaml' if renderer.format == '.yaml' else 'json')
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=f'{renderer.media_type}; charset=utf-8')
+        response['ETag'] = etag
+        return response
+
+
+urlpatterns = [
+    re_path(r'^swagger(?P<format>\.json|\.yaml)$',
+            SchemaView.without_ui(), name='schema-json'),
+    re_path(r'^swagger/$', SchemaView.with_ui('swagger'),
+            name='schema-swagger-ui'),
+    re_path(r'^redoc/$', SchemaView.with_ui('redoc'),
+            name='schema-redoc'),
+]
@@ -13,6 +13,12 @@ DEBUG = bool(os.getenv('DEBUG'))
 
 ALLOWED_HOSTS = []
 
+# API_DOCS=0 leaves out the Swagger and ReDoc routes and drf_yasg, for API-only workers.
+API_DOCS = os.getenv('API_DOCS', '1') == '1'
+
+# OpenAPI schema built by `manage.py build_schema`, served by the docs routes.
+OPENAPI_SCHEMA_PATH = BASE_DIR / 'api' / 'v1' / 'openapi.json'
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -20,13 +26,17 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
-    'drf_yasg',
     'api.apps.ApiConfig',
     'musical_catalog.apps.MusicalCatalogConfig',
 ]
 
+if API_DOCS:
+    INSTALLED_APPS.append('drf_yasg')
+
 MIDDLEWARE = [
+    'api.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,6 +83,77 @@ DATABASES = {
     }
 }
 
+# Read replicas: REPLICA_DB_HOSTS=replica1,replica2 adds one connection per
+# host with the credentials of the primary. GET requests of the catalog API
+# read from a random replica, except for clients that wrote in the last
+# REPLICA_STICKY_SECONDS, which read from the primary.
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.getenv('REPLICA_DB_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['tune_treasure_drf.db_router.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    } if os.getenv('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache alias and lifetime (seconds) of rendered catalog API responses.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 600))
+
+# The change feed holds back changes younger than this (seconds): rows are
+# stamped when written, not when committed, so a cursor past a transaction
+# still in flight would skip its rows. On PostgreSQL the feed also stops
+# this long before the oldest open write transaction, and the delay only has
+# to cover the clock skew between the application servers and the database.
+CHANGES_SETTLE_SECONDS = int(os.getenv('CHANGES_SETTLE_SECONDS', 5))
+
+# /api/stats/ responses are cached for at most this long (seconds), even
+# without writes; with STATS_FROM_SNAPSHOT=1 they are read from the snapshot
+# written by manage.py build_stats_snapshot instead of computed live.
+STATS_CACHE_TIMEOUT = int(os.getenv('STATS_CACHE_TIMEOUT', 300))
+STATS_FROM_SNAPSHOT = os.getenv('STATS_FROM_SNAPSHOT', '0') == '1'
+
+# Background jobs (manage.py run_worker): attempts per job, delay (seconds)
+# before the first retry, doubled on every further one, how often a worker
+# signals it is still running a job, and the time without that signal after
+# which the job is considered abandoned by its worker and run again.
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_DELAY_SECONDS = int(os.getenv('JOB_RETRY_DELAY_SECONDS', 10))
+JOB_HEARTBEAT_SECONDS = int(os.getenv('JOB_HEARTBEAT_SECONDS', 10))
+JOB_TIMEOUT_SECONDS = int(os.getenv('JOB_TIMEOUT_SECONDS', 60))
+
+# Queries slower than this (milliseconds) are logged with the view that made them.
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 200))
+
+# API_LOG_LEVEL=INFO logs the timing of every request, the default only slow queries.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': os.getenv('API_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -0,0 +1,22 @@
+"""
+Two SQLite databases: the primary and a replica that never receives the
+writes, i.e. a replica with unbounded lag. Used to run the replica routing
+tests locally:
+
+    python manage.py test api.tests.ReplicaRoutingTests api.tests.ReplicaCacheTests --settings=tune_treasure_drf.settings_replica_sqlite
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+    },
+}
+
+DATABASE_REPLICAS = ['replica']